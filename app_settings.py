@@ -1,9 +1,11 @@
 from __future__ import annotations
 from typing import Any, Dict
-import json
 import os
 
+from config.settings_service import QtAppSettings, SettingsService
+
 _SETTINGS_FILENAME = 'settings.json'
+_services: Dict[str, SettingsService] = {}
 
 
 def _settings_path(base_appdata: str) -> str:
@@ -12,29 +14,22 @@ def _settings_path(base_appdata: str) -> str:
     return os.path.join(folder, _SETTINGS_FILENAME)
 
 
-def load_settings(base_appdata: str) -> Dict[str, Any]:
+def settings_service(base_appdata: str) -> SettingsService:
+    """Servizio unico per cartella: tutti i componenti condividono lo stesso modello."""
     path = _settings_path(base_appdata)
-    if not os.path.exists(path):
-        return {
-            'preferred_device_id': None,
-            'calibrations': {},
-        }
-    try:
-        with open(path, 'r', encoding='utf-8') as handle:
-            data = json.load(handle)
-    except (OSError, json.JSONDecodeError):
-        return {
-            'preferred_device_id': None,
-            'calibrations': {},
-        }
-    data.setdefault('preferred_device_id', None)
-    data.setdefault('calibrations', {})
-    return data
+    service = _services.get(path)
+    if service is None:
+        service = _services[path] = SettingsService(path, QtAppSettings)
+    return service
+
+
+def load_settings(base_appdata: str) -> QtAppSettings:
+    return settings_service(base_appdata).model
 
 
 def save_settings(base_appdata: str, settings: Dict[str, Any]) -> None:
-    path = _settings_path(base_appdata)
-    tmp_path = f"{path}.tmp"
-    with open(tmp_path, 'w', encoding='utf-8') as handle:
-        json.dump(settings, handle, ensure_ascii=False, indent=2)
-    os.replace(tmp_path, path)
+    service = settings_service(base_appdata)
+    if settings is not service.model:
+        service.model.update(settings)
+    # i dizionari annidati (calibrations) si modificano in place senza notifica
+    service.save()
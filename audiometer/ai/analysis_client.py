@@ -1,28 +1,25 @@
 from __future__ import annotations
 import os
 import json
-from typing import Dict, List, Optional, Sequence
+from typing import Dict, List, Optional, Sequence, Union
 import base64
 
 import requests
 
 from .prompt_loader import load_prompt_text
+from audiometry.audiogram import Audiogram
 
 
-def _compose_prompt(patient: Dict, results_map: Dict[str, Dict[int, float]], freqs: List[int]) -> str:
+def _compose_prompt(patient: Dict, results_map: Union[Audiogram, Dict[str, Dict[int, float]]], freqs: List[int]) -> str:
     base = load_prompt_text() or "Analizza il seguente audiogramma e scrivi una sintesi non diagnostica."
     name = (patient.get('cognome','') + ' ' + patient.get('nome','')).strip()
     sex = patient.get('sex') or ''
     dob = patient.get('birth_date') or ''
     lines = [base.strip(), "", "[DATI ASSISTITO]", f"ID: {patient.get('id','')}", f"Nome: {name}", f"Data nascita: {dob}", f"Sesso: {sex}"]
     lines += ["", "[SOGLIE dB HL]"]
+    ag = results_map if isinstance(results_map, Audiogram) else Audiogram.from_maps(results_map)
     def row_for(ear):
-        out: List[str] = []
-        em = results_map.get(ear, {}) or {}
-        for f in freqs:
-            v = em.get(f)
-            out.append(str(v) if v is not None else '-')
-        return out
+        return [str(v) for v in ag.table_cells(ear, freqs)]
     header = "Hz," + ",".join(str(f) for f in freqs)
     rrow = "OD (R)," + ",".join(row_for('R'))
     lrow = "OS (L)," + ",".join(row_for('L'))
@@ -60,7 +57,7 @@ def _openai_chat_payload(prompt: str, images_png: Optional[Sequence[bytes]], mod
 
 def generate_analysis_via_prompt(
     patient: Dict,
-    results_map: Dict[str, Dict[int, float]],
+    results_map: Union[Audiogram, Dict[str, Dict[int, float]]],
     freqs: List[int],
     images_png: Optional[Sequence[bytes]] = None,
 ) -> str:
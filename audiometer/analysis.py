@@ -1,5 +1,10 @@
 from __future__ import annotations
-from typing import Dict, List
+from dataclasses import dataclass
+from typing import Dict, List, Sequence, Union
+
+import numpy as np
+
+from audiometry.audiogram import Audiogram
 
 
 SEVERITY = [
@@ -19,52 +24,156 @@ def _classify(db: float) -> str:
     return SEVERITY[-1][2]
 
 
-def _pta(map_: Dict[int, float], bands=(500, 1000, 2000)) -> float:
-    vals = [map_.get(f) for f in bands if f in map_]
-    if not vals:
-        return 0.0
-    return sum(vals) / len(vals)
+SLOPE_NONE = 0
+SLOPE_DOWN = 1
+SLOPE_UP = 2
+SLOPE_FLAT = 3
+_SLOPE_TEXT = {
+    SLOPE_NONE: "",
+    SLOPE_DOWN: " andamento discendente alle alte frequenze",
+    SLOPE_UP: " andamento ascendente verso le alte frequenze",
+    SLOPE_FLAT: " andamento relativamente piatto",
+}
+_ASYMMETRY_TEXT = " asimmetria significativa (>=15 dB su >=3 frequenze)"
 
+# Limiti delle classi per la ricerca binaria (np.searchsorted)
+_SEV_LOW = np.array([lo for lo, _, _ in SEVERITY], dtype=np.float64)
+_SEV_HIGH = np.array([hi for _, hi, _ in SEVERITY], dtype=np.float64)
+
+
+def _slope_code(low, high) -> int:
+    if low is None or high is None:
+        return SLOPE_NONE
+    delta = high - low
+    if delta >= 20:
+        return SLOPE_DOWN
+    if delta <= -20:
+        return SLOPE_UP
+    return SLOPE_FLAT
+
+
+def _asymmetry(ag: Audiogram, freqs: List[int]) -> bool:
+    consec = 0
+    for f in freqs:
+        r = ag.get('R', f)
+        l = ag.get('L', f)
+        if r is not None and l is not None:
+            if abs(r - l) >= 15:
+                consec += 1
+                if consec >= 3:
+                    return True
+            else:
+                consec = 0
+    return False
 
-def generate_analysis_text(results_map: Dict[str, Dict[int, float]], freqs: List[int]) -> str:
-    """Crea una breve analisi descrittiva dell'audiogramma (non diagnostica)."""
-    L = results_map.get('L', {}) or {}
-    R = results_map.get('R', {}) or {}
-    pta_L = _pta(L)
-    pta_R = _pta(R)
-    sev_L = _classify(pta_L)
-    sev_R = _classify(pta_R)
-
-    def slope(m: Dict[int, float]) -> str:
-        low = m.get(500)
-        high = m.get(4000)
-        if low is None or high is None:
-            return ""
-        delta = high - low
-        if delta >= 20:
-            return " andamento discendente alle alte frequenze"
-        if delta <= -20:
-            return " andamento ascendente verso le alte frequenze"
-        return " andamento relativamente piatto"
-
-    def asymmetry(a: Dict[int, float], b: Dict[int, float]) -> str:
-        consec = 0
-        for f in freqs:
-            if f in a and f in b:
-                if abs(a[f] - b[f]) >= 15:
-                    consec += 1
-                    if consec >= 3:
-                        return " asimmetria significativa (>=15 dB su >=3 frequenze)"
-                else:
-                    consec = 0
-        return ""
 
+def _compose_text(pta_R: float, pta_L: float, slope_R: int, slope_L: int, asymmetric: bool,
+                  sev_R: str | None = None, sev_L: str | None = None) -> str:
+    sev_R = sev_R if sev_R is not None else _classify(pta_R)
+    sev_L = sev_L if sev_L is not None else _classify(pta_L)
     text = []
     text.append(f"Sintesi non clinica: PTA OD {pta_R:.0f} dB HL ({sev_R}), PTA OS {pta_L:.0f} dB HL ({sev_L}).")
-    text.append(f"OD:{slope(R)}; OS:{slope(L)}.")
-    asy = asymmetry(R, L)
-    if asy:
-        text.append(asy.strip())
+    text.append(f"OD:{_SLOPE_TEXT[slope_R]}; OS:{_SLOPE_TEXT[slope_L]}.")
+    if asymmetric:
+        text.append(_ASYMMETRY_TEXT.strip())
     text.append("Nota: risultato non diagnostico; per valutazione clinica rivolgersi a professionista e strumenti certificati.")
     return " ".join(text)
 
+
+def generate_analysis_text(results: Union[Audiogram, Dict[str, Dict[int, float]]], freqs: List[int]) -> str:
+    """Crea una breve analisi descrittiva dell'audiogramma (non diagnostica)."""
+    ag = results if isinstance(results, Audiogram) else Audiogram.from_maps(results)
+    return _compose_text(
+        ag.pta('R'),
+        ag.pta('L'),
+        _slope_code(ag.get('R', 500), ag.get('R', 4000)),
+        _slope_code(ag.get('L', 500), ag.get('L', 4000)),
+        _asymmetry(ag, freqs),
+    )
+
+
+# ----- versione batch (N esami alla volta) -----
+
+def classify_batch(pta: np.ndarray) -> np.ndarray:
+    """Indice in SEVERITY per ogni valore; i valori fuori dalle classi (anche nei buchi) vanno in 'profonda'."""
+    pta = np.asarray(pta, dtype=np.float64)
+    idx = np.searchsorted(_SEV_LOW, pta, side='right') - 1
+    safe = np.clip(idx, 0, len(SEVERITY) - 1)
+    inside = (idx >= 0) & (pta <= _SEV_HIGH[safe])
+    return np.where(inside, safe, len(SEVERITY) - 1).astype(np.int8)
+
+
+@dataclass
+class BatchAnalysis:
+    """Risultati per N esami; orecchio 0 = destro (OD), 1 = sinistro (OS)."""
+
+    pta: np.ndarray        # float64 (N, 2)
+    severity: np.ndarray   # int8 (N, 2), indice in SEVERITY
+    slope: np.ndarray      # int8 (N, 2), SLOPE_*
+    asymmetry: np.ndarray  # bool (N,)
+
+    def __len__(self) -> int:
+        return int(self.pta.shape[0])
+
+    def severity_labels(self) -> np.ndarray:
+        return np.array([lab for _, _, lab in SEVERITY], dtype=object)[self.severity]
+
+    def text(self, i: int) -> str:
+        return _compose_text(
+            float(self.pta[i, 0]), float(self.pta[i, 1]),
+            int(self.slope[i, 0]), int(self.slope[i, 1]), bool(self.asymmetry[i]),
+            SEVERITY[self.severity[i, 0]][2], SEVERITY[self.severity[i, 1]][2],
+        )
+
+    def texts(self) -> List[str]:
+        return [self.text(i) for i in range(len(self))]
+
+
+def analyze_batch(thresholds: np.ndarray, axis_freqs: Sequence[int], freqs: Sequence[int] | None = None,
+                  bands: Sequence[int] = (500, 1000, 2000)) -> BatchAnalysis:
+    """
+    Analisi di N audiogrammi in forma vettoriale.
+    `thresholds` ha forma (N, 2, len(axis_freqs)) con NaN per i punti mancanti;
+    `freqs` e' l'elenco (ordinato) su cui cercare l'asimmetria, come in generate_analysis_text.
+    """
+    thr = np.asarray(thresholds, dtype=np.float64)
+    if thr.ndim != 3 or thr.shape[1] != 2 or thr.shape[2] != len(axis_freqs):
+        raise ValueError("thresholds deve avere forma (N, 2, len(axis_freqs))")
+    slot = {int(f): j for j, f in enumerate(axis_freqs)}
+    n = thr.shape[0]
+
+    def column(f: int) -> np.ndarray:
+        j = slot.get(int(f))
+        return thr[:, :, j] if j is not None else np.full((n, 2), np.nan)
+
+    cols = [slot[f] for f in bands if f in slot]
+    if cols:
+        band_vals = thr[:, :, cols]
+        measured = ~np.isnan(band_vals)
+        count = measured.sum(axis=2)
+        total = np.where(measured, band_vals, 0.0).sum(axis=2)
+        pta = np.where(count > 0, total / np.maximum(count, 1), 0.0)
+    else:
+        pta = np.zeros((n, 2))
+
+    with np.errstate(invalid='ignore'):
+        delta = column(4000) - column(500)
+        slope = np.where(np.isnan(delta), SLOPE_NONE,
+                         np.where(delta >= 20, SLOPE_DOWN, np.where(delta <= -20, SLOPE_UP, SLOPE_FLAT)))
+
+    consec = np.zeros(n, dtype=np.int32)
+    asym = np.zeros(n, dtype=bool)
+    for f in (freqs if freqs is not None else axis_freqs):
+        c = column(f)
+        both = ~np.isnan(c).any(axis=1)
+        with np.errstate(invalid='ignore'):
+            hit = np.abs(c[:, 0] - c[:, 1]) >= 15
+        consec = np.where(both, np.where(hit, consec + 1, 0), consec)
+        asym |= consec >= 3
+
+    return BatchAnalysis(pta, classify_batch(pta), slope.astype(np.int8), asym)
+
+
+def generate_analysis_texts(thresholds: np.ndarray, axis_freqs: Sequence[int], freqs: Sequence[int]) -> List[str]:
+    """Come generate_analysis_text, per N esami: stesse frasi."""
+    return analyze_batch(thresholds, axis_freqs, freqs).texts()
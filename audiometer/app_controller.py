@@ -1,4 +1,4 @@
-import json
+import logging
 import os
 
 from .params import get_patient_params
@@ -9,14 +9,22 @@ from .screening.manual_test import ManualTest
 from .audio.device_manager import AudioDeviceManager
 from .audio.calibration import CalibrationStore
 from .audio.calibration import HeadphoneCalibration, CombinedCalibration
-from .plotting.audiogram_plot import render_audiogram_image
-from .storage import save_exam, patient_dir, list_patients, load_patient_index, create_patient, load_patient_profile, suggest_next_patient_id, update_patient_profile
-from .paths import path_settings, path_calibrations, ensure_default_file
+from .plotting.audiogram_plot import render_audiogram_png
+from .storage import save_exam, list_patients, load_patient_index, create_patient, load_patient_profile, suggest_next_patient_id, update_patient_profile
+from .paths import path_settings, path_calibrations, ensure_default_file, get_app_data_dir
 from .version import __version__
 from .audio.calibration import HP_DIR
 from .analysis import generate_analysis_text
+from audiometry.journal import SessionJournal, journal_dir, find_pending
+from audiometry.exam_loader import load_exam
+from audiometry.audiogram import Audiogram
+from results.longitudinal import ShiftTracker
+from patient.search import PatientSearchIndex
+from results.image_store import ImageStore
+from config.settings_service import AudiometerSettings, SettingsService
 
 BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+_log = logging.getLogger(__name__)
 
 class AppController:
     def __init__(self, ui_callbacks):
@@ -25,16 +33,11 @@ class AppController:
         ensure_default_file(path_settings(), "settings.json")
         ensure_default_file(path_calibrations(), "calibrations.json")
 
-        self.settings = self._load_settings()
+        # modello tipizzato: le modifiche vengono salvate in differita e accorpate
+        self._settings_service = SettingsService(path_settings(), AudiometerSettings)
+        self.settings = self._settings_service.model
         # attach version into settings (read-only usage)
         self.settings.setdefault("__version__", __version__)
-        # enable UI debug events by default (can be disabled by setting to False)
-        if 'debug_ui_events' not in self.settings:
-            self.settings['debug_ui_events'] = True
-            try:
-                self._save_settings()
-            except Exception:
-                pass
 
         self.patient = get_patient_params()
         if "id" in self.patient:
@@ -66,8 +69,20 @@ class AppController:
             except Exception:
                 pass
 
-        self._results = ResultsStore()
+        self._journal_dir = journal_dir(get_app_data_dir(True))
+        self._shift_tracker = ShiftTracker(os.path.join(get_app_data_dir(True), "longitudinal.json"))
+        self._patient_index = PatientSearchIndex(loader=list_patients)
+        self._patient_index.warm()
+        self._image_store = ImageStore(
+            os.path.join(get_app_data_dir(True), "images"),
+            recompress=self.settings.recompress_images,
+        )
+        self._results = ResultsStore(journal_factory=self._open_journal)
         self._preview_rows = None  # for archive preview
+        try:
+            self._offer_journal_resume()
+        except Exception:
+            pass
 
         if self.settings.get("default_output_device"):
             try:
@@ -86,15 +101,37 @@ class AppController:
         self._calib_results_store = ResultsStore()
         self.manual_cal = ManualTest(self.settings, self.audio_mgr, self.calibration, self._calib_results_store, self.ui)
 
-    def _load_settings(self):
-        path = path_settings()
-        with open(path, "r", encoding="utf-8") as f:
-            return json.load(f)
+    # Write-ahead log esame in corso
+    def _open_journal(self):
+        return SessionJournal.create(self._journal_dir, {'patient': dict(self.patient)})
+
+    def _set_patient(self, patient):
+        """Cambio assistito: il log dell'esame in corso apparteneva al precedente."""
+        if (patient or {}).get("id") != (self.patient or {}).get("id"):
+            self._results.discard_journal()
+        self.patient = patient
+
+    def _offer_journal_resume(self):
+        """Se un esame precedente non e' stato salvato (crash), propone di ripristinarlo."""
+        pending = find_pending(self._journal_dir)
+        if not pending:
+            return False
+        last = pending[0]
+        patient = last.meta.get('patient') or {}
+        label = f"{patient.get('cognome','')} {patient.get('nome','')}".strip() or patient.get('id', '?')
+        if not self.ui.ask_yes_no(f"Trovato esame non salvato ({label}, {len(last.points)} punti). Vuoi riprenderlo?"):
+            last.remove()
+            return False
+        if patient.get('id'):
+            self._set_patient(dict(patient))
+        for ear, freq, dbhl in last.points:
+            self._results.add_result(ear, freq, dbhl)
+        last.remove()
+        return True
 
-    def _save_settings(self):
-        path = path_settings()
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump(self.settings, f, indent=2)
+    def save_settings(self):
+        """Scrive subito le impostazioni (es. conferma esplicita dall'utente)."""
+        self._settings_service.flush()
 
     # Dispositivi
     def list_output_devices(self):
@@ -103,9 +140,8 @@ class AppController:
     def set_output_device(self, device_name):
         self.audio_mgr.set_output_device_by_name(device_name)
         self._after_device_selected(device_name)
-        # Persist choice
-        self.settings["default_output_device"] = device_name
-        self._save_settings()
+        # Persist choice (salvataggio differito solo se cambiata)
+        self.settings.default_output_device = device_name
 
     def _after_device_selected(self, device_name):
         if self.calibration.has_profile_for(device_name):
@@ -216,18 +252,34 @@ class AppController:
 
     def save_results_local(self):
         from datetime import datetime as dt
-        payload = self._results.to_payload(self.patient)
+        payload = self._results.to_payload(self.patient, self.get_headphone_id())
         ts = dt.now().strftime("%Y%m%d_%H%M%S")
-        pdir = patient_dir(self.patient["id"])
-        img_dir = os.path.join(pdir, "screenings")
-        img_path = os.path.join(img_dir, f"{ts}.png")
         rows = self._results.rows
-        render_audiogram_image(rows, self.patient, self.get_active_device(), self.settings["frequencies_hz"], out_path=img_path)
-        path = save_exam(self.patient, payload, ts=ts, image_path=img_path)
+        png = render_audiogram_png(rows, self.patient, self.get_active_device(), self.settings["frequencies_hz"])
+        # immagine nel blob store: grafici identici occupano spazio una volta sola
+        digest, img_path = self._image_store.store(png)
+        path = save_exam(self.patient, payload, ts=ts, image_path=img_path, image_sha256=digest)
+        self._results.complete_journal()
+        self._patient_index.update(self.patient["id"], last_ts=ts)
+        self._check_threshold_shift(path)
         return path, img_path
 
+    def _check_threshold_shift(self, path):
+        """Confronta l'esame appena salvato con la baseline dell'assistito (STS 2-3-4 kHz)."""
+        try:
+            events = self._shift_tracker.update(load_exam(path))
+        except Exception:
+            return []
+        if events:
+            msg = "Rispetto all'esame di riferimento:\n" + "\n".join(ev.describe() for ev in events)
+            try:
+                self.ui.show_info(msg + "\n\nSi consiglia un controllo.")
+            except Exception:
+                pass
+        return events
+
     def export_results(self, webapp_url, auth_token):
-        payload = self._results.to_payload(self.patient)
+        payload = self._results.to_payload(self.patient, self.get_headphone_id())
         return export_results_to_webapp(webapp_url, auth_token, payload)
 
     def get_patient_display(self):
@@ -252,16 +304,24 @@ class AppController:
     def list_saved_patients(self):
         return list_patients()
 
+    def search_patients(self, query, limit=200):
+        """Ricerca per cognome, nome, ID o data di nascita sull'indice in memoria."""
+        return self._patient_index.search(query, limit=limit)
+
+    def patient_index_loading(self):
+        """True finche' l'indice degli assistiti si sta costruendo in background."""
+        return self._patient_index.loading
+
     def load_patient_archive(self, patient_id):
         prof = load_patient_profile(patient_id)
         # Keep optional fields if present (birth_date, sex)
-        self.patient = {
+        self._set_patient({
             "id": prof["id"],
             "nome": prof.get("nome",""),
             "cognome": prof.get("cognome",""),
             "birth_date": prof.get("birth_date"),
             "sex": prof.get("sex"),
-        }
+        })
         idx = load_patient_index(self.patient["id"])
         self.ui.on_patient_loaded(idx)
         return idx
@@ -269,23 +329,15 @@ class AppController:
     # Archivio: anteprima screening
     def preview_rows_from_exam_path(self, json_path):
         try:
-            with open(json_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
+            exam = load_exam(json_path)
         except Exception as e:
             return False, f"Errore lettura file: {e}"
 
-        soglie = data.get("soglie") or data.get("thresholds") or []
+        data = exam.raw
         pat = data.get("patient") or self.patient
         display_name = ((pat.get("cognome","") + " " + pat.get("nome","")).strip())
         pid = pat.get("id") or self.patient.get("id")
-        rows = []
-        for s in soglie:
-            ear = s.get("ear") or s.get("orecchio") or s.get("side") or "?"
-            freq = s.get("freq") or s.get("frequency") or s.get("hz")
-            dbhl = s.get("dbhl") or s.get("level") or s.get("db")
-            if freq is None or dbhl is None or ear not in ("R","L"):
-                continue
-            rows.append((pid, display_name, ear, int(freq), float(dbhl)))
+        rows = exam.rows(pid, display_name)
 
         # Carica eventuali note/analisi
         notes = data.get('analysis') or ((data.get('screening') or {}).get('note') if isinstance(data.get('screening'), dict) else None)
@@ -306,14 +358,20 @@ class AppController:
 
     def create_patient(self, patient_id, nome, cognome):
         prof = create_patient(patient_id, nome, cognome)
-        self.patient = {"id": prof["id"], "nome": prof.get("nome",""), "cognome": prof.get("cognome","")}
+        self._patient_index.add({
+            "id": prof["id"], "cognome": prof.get("cognome",""), "nome": prof.get("nome",""),
+            "name": f"{prof.get('cognome','')} {prof.get('nome','')}".strip(),
+            "birth_date": prof.get("birth_date") or "", "last_ts": "",
+        })
+        self._set_patient({"id": prof["id"], "nome": prof.get("nome",""), "cognome": prof.get("cognome","")})
         self.ui.on_patient_created(self.patient)
         return self.patient
 
 
     def set_headphone_id(self, hp_id: str):
-        """Imposta cuffia corrente e carica bias salvati."""
+        """Imposta cuffia corrente (ricordata nelle impostazioni) e carica bias salvati."""
         self._headphone_id = hp_id or "default"
+        self.settings.last_hp_id = hp_id
         return self.calibration.set_headphone(self._headphone_id)
 
 
@@ -549,8 +607,7 @@ class AppController:
         return self._results.get_notes()
 
     def generate_exam_analysis(self) -> str:
-        m = self._results.to_map_by_ear()
-        text = generate_analysis_text(m, self.settings.get('frequencies_hz', []))
+        text = generate_analysis_text(self._results.audiogram, self.settings.get('frequencies_hz', []))
         self._results.set_notes(text)
         return text
 
@@ -562,43 +619,20 @@ class AppController:
         except Exception:
             return None
 
-    def set_headphone_id(self, hp_id: str):
-        self.settings["last_hp_id"] = hp_id
-        self._save_settings()
-        return self.calibration.set_headphone(hp_id)
-
     def results_map_current(self):
         """Mappa ear->freq->db dai risultati correnti."""
         return self._results.to_map_by_ear()
 
     def results_map_from_rows(self, rows):
-        m = {'L': {}, 'R': {}}
-        for r in rows:
-            if isinstance(r, dict):
-                ear, f, db = r.get('ear'), int(r.get('freq')), float(r.get('dbhl'))
-            else:
-                ear, f, db = r[2], int(r[3]), float(r[4])
-            if ear in ('L','R'):
-                m[ear][f] = db
-        return m
+        return Audiogram.from_rows(rows).to_maps()
 
     def load_app_results_from_archive(self, json_path):
         """Carica un esame JSON dall'archivio e restituisce mappa ear->freq->db."""
         try:
-            import json
-            with open(json_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            exam = load_exam(json_path)
         except Exception as e:
             raise RuntimeError(f"Errore lettura esame: {e}")
-        soglie = data.get('soglie') or []
-        rows = []
-        for s in soglie:
-            ear = s.get('ear') or s.get('orecchio') or s.get('side')
-            freq = s.get('hz') or s.get('freq')
-            dbhl = s.get('dbhl') or s.get('level')
-            if ear in ('L','R') and freq is not None and dbhl is not None:
-                rows.append((None, None, ear, int(freq), float(dbhl)))
-        return self.results_map_from_rows(rows)
+        return exam.to_rl()
 
     def _sessions_dir(self, hp_id: str):
         import os
@@ -635,7 +669,8 @@ class AppController:
                 data['__path'] = p
                 data['__name'] = name
                 out.append(data)
-            except Exception:
+            except Exception as exc:
+                _log.warning("Sessione di calibrazione illeggibile ignorata %s: %s", p, exc)
                 continue
         return out
 
@@ -3,6 +3,7 @@ import os, json
 from typing import Dict, Any
 
 from ..paths import get_app_data_dir
+from ..data_store.locking import save_merged
 
 HP_DIR = os.path.join(get_app_data_dir(True), "headphones")
 os.makedirs(HP_DIR, exist_ok=True)
@@ -96,10 +97,12 @@ class HeadphoneCalibration:
     def __init__(self):
         self.hp_id: str | None = None
         self.bias: Dict[str, Dict[int, float]] = { 'L': {}, 'R': {} }
+        self._saved: Dict[str, Dict[str, float]] = self._bias_to_json(self.bias)
 
     def set_headphone(self, hp_id: str) -> Dict[str, Dict[int, float]]:
         self.hp_id = hp_id or "default"
         self.bias = self._load_bias(self.hp_id)
+        self._saved = self._bias_to_json(self.bias)
         return self.bias
 
     def get_bias_db(self, ear: str, freq: int) -> float:
@@ -119,8 +122,10 @@ class HeadphoneCalibration:
     def save(self) -> str:
         assert self.hp_id, "Headphone ID non impostato"
         path = self._file_for(self.hp_id)
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump(self.bias, f, ensure_ascii=False, indent=2)
+        # un'altra istanza puo' aver salvato nel frattempo: si fondono le sole frequenze modificate
+        merged, _rev = save_merged(path, self._saved, self._bias_to_json(self.bias), {})
+        self._saved = merged
+        self.set_bias_map(merged)
         return path
 
     # ---- Calibrazione normoudente ----
@@ -137,6 +142,10 @@ class HeadphoneCalibration:
         return bias
 
     # ---- I/O helpers ----
+    @staticmethod
+    def _bias_to_json(bias: Dict[str, Dict[int, float]]) -> Dict[str, Dict[str, float]]:
+        return {ear: {str(int(f)): float(v) for f, v in (bias.get(ear, {}) or {}).items()} for ear in ('L', 'R')}
+
     @staticmethod
     def _file_for(hp_id: str) -> str:
         return os.path.join(HP_DIR, f"{hp_id}.json")
@@ -0,0 +1,15 @@
+"""Compattazione offline dei log JSONL: python -m audiometer.data_store.compact"""
+
+from __future__ import annotations
+from . import patients_store, results_store
+
+
+def main() -> int:
+    n_pat = patients_store.compact()
+    n_res = results_store.compact()
+    print(f"Pazienti: {n_pat} - Risultati: {n_res}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
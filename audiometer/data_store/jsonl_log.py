@@ -0,0 +1,82 @@
+"""Log JSONL in sola aggiunta, con copia in memoria caricata al primo accesso."""
+
+from __future__ import annotations
+import json, os, threading
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+
+class JsonlLog:
+    """
+    Un record JSON per riga, solo in aggiunta.
+
+    Il file si legge una volta per processo (al primo accesso); poi ogni
+    scrittura aggiunge una riga e aggiorna i record in memoria: O(1) qualunque
+    sia il numero di record. Un vecchio file array JSON viene migrato al primo
+    caricamento; `compact` riscrive il log con i soli record restituiti da `reduce`.
+    """
+
+    def __init__(self, path: str, legacy_path: Optional[str] = None) -> None:
+        self.path = path
+        self.legacy_path = legacy_path
+        self._lock = threading.RLock()
+        self._records: Optional[List[Dict[str, Any]]] = None
+
+    def _read(self) -> List[Dict[str, Any]]:
+        records: List[Dict[str, Any]] = []
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        records.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        # riga troncata da un crash: ignorata
+                        continue
+        elif self.legacy_path and os.path.exists(self.legacy_path):
+            with open(self.legacy_path, "r", encoding="utf-8") as f:
+                records = list(json.load(f) or [])
+            self._rewrite(records)
+            os.replace(self.legacy_path, self.legacy_path + ".migrated")
+        return records
+
+    def records(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            if self._records is None:
+                self._records = self._read()
+            return self._records
+
+    def append(self, record: Dict[str, Any]) -> None:
+        with self._lock:
+            records = self.records()
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "ab+") as f:
+                if f.seek(0, os.SEEK_END) > 0:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b"\n":
+                        # riga finale troncata da un crash: va chiusa, o il nuovo record le si attacca
+                        f.write(b"\n")
+                f.write((json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8"))
+            records.append(record)
+
+    def _rewrite(self, records: Iterable[Dict[str, Any]]) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            for rec in records:
+                f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+        os.replace(tmp, self.path)
+
+    def compact(self, reduce: Callable[[List[Dict[str, Any]]], List[Dict[str, Any]]] = list) -> int:
+        """Riscrive il log con i soli record restituiti da `reduce`; ritorna quanti ne restano."""
+        with self._lock:
+            kept = list(reduce(list(self.records())))
+            self._rewrite(kept)
+            self._records = kept
+            return len(kept)
+
+    def reset(self) -> None:
+        """Dimentica la copia in memoria (il file verra' riletto al prossimo accesso)."""
+        with self._lock:
+            self._records = None
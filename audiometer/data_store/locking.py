@@ -0,0 +1,180 @@
+"""
+File JSON condivisi tra piu' processi (due istanze dell'app, postazioni su cartella di rete).
+
+- le scritture sono atomiche (file temporaneo + os.replace): chi legge vede sempre
+  un file completo e non deve prendere alcun lock;
+- ogni file porta un numero di revisione `_rev`, incrementato a ogni scrittura;
+- `compare_and_swap` scrive solo se la revisione su disco e' quella attesa,
+  tenendo il lock consultivo `<file>.lock` per il solo tempo del confronto e
+  della scrittura;
+- `update_json` rilegge e riapplica la modifica finche' il CAS non riesce, cosi'
+  scrittori concorrenti si sommano invece di sovrascriversi;
+- `merge_changes` fonde a tre vie (base letta, versione locale, versione su disco)
+  per chi modifica una copia in memoria, come le impostazioni.
+"""
+
+from __future__ import annotations
+import copy, json, os, time
+from typing import Any, Callable, Optional, Tuple
+
+try:
+    import msvcrt
+    _HAVE_MSVCRT = True
+except ImportError:  # POSIX
+    import fcntl
+    _HAVE_MSVCRT = False
+
+REV_KEY = "_rev"
+_MISSING = object()
+
+
+class LockTimeout(TimeoutError):
+    pass
+
+
+class VersionConflict(RuntimeError):
+    def __init__(self, path: str, expected: int, found: int) -> None:
+        super().__init__(f"{path}: revisione {found}, attesa {expected}")
+        self.path = path
+        self.expected = expected
+        self.found = found
+
+
+class FileLock:
+    """Lock consultivo su `<path>.lock` (msvcrt su Windows, flock altrove), rientrante no."""
+
+    def __init__(self, path: str, timeout: float = 10.0, poll: float = 0.02) -> None:
+        self.lock_path = path + ".lock"
+        self.timeout = timeout
+        self.poll = poll
+        self._fd: Optional[int] = None
+
+    def _try_lock(self, fd: int) -> bool:
+        try:
+            if _HAVE_MSVCRT:
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+            else:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except OSError:
+            return False
+
+    def acquire(self) -> None:
+        os.makedirs(os.path.dirname(self.lock_path) or ".", exist_ok=True)
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o666)
+        deadline = time.monotonic() + self.timeout
+        while not self._try_lock(fd):
+            if time.monotonic() >= deadline:
+                os.close(fd)
+                raise LockTimeout(f"Lock non ottenuto: {self.lock_path}")
+            time.sleep(self.poll)
+        self._fd = fd
+
+    def release(self) -> None:
+        fd, self._fd = self._fd, None
+        if fd is None:
+            return
+        try:
+            if _HAVE_MSVCRT:
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
+
+    def __enter__(self) -> "FileLock":
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.release()
+
+
+def read_json(path: str, default: Any = None) -> Tuple[Any, int]:
+    """(contenuto senza `_rev`, revisione); `default` e revisione 0 se il file non esiste."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return copy.deepcopy(default), 0
+    rev = 0
+    if isinstance(data, dict):
+        rev = int(data.pop(REV_KEY, 0) or 0)
+    return data, rev
+
+
+def _current_rev(path: str) -> int:
+    try:
+        return read_json(path)[1]
+    except ValueError:
+        return 0  # file illeggibile: verra' sovrascritto
+
+
+def _write(path: str, data: Any, rev: int) -> None:
+    if isinstance(data, dict):
+        data = dict(data)
+        data[REV_KEY] = rev
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def compare_and_swap(path: str, expected_rev: int, data: Any, timeout: float = 10.0) -> int:
+    """Scrive `data` se la revisione su disco e' `expected_rev`; ritorna la nuova revisione."""
+    with FileLock(path, timeout):
+        found = _current_rev(path)
+        if found != expected_rev:
+            raise VersionConflict(path, expected_rev, found)
+        _write(path, data, found + 1)
+        return found + 1
+
+
+def update_json(
+    path: str,
+    mutate: Callable[[Any], Any],
+    default: Any = None,
+    retries: int = 20,
+    timeout: float = 10.0,
+) -> Tuple[Any, int]:
+    """
+    Legge, applica `mutate` (che riceve una copia e ritorna il nuovo contenuto) e
+    scrive con CAS; in caso di conflitto riparte dalla versione aggiornata.
+    """
+    for _ in range(max(1, retries)):
+        data, rev = read_json(path, default)
+        new = mutate(data)
+        try:
+            return new, compare_and_swap(path, rev, new, timeout)
+        except VersionConflict:
+            continue
+    with FileLock(path, timeout):  # contesa persistente: applica sotto lock
+        data, rev = read_json(path, default)
+        new = mutate(data)
+        _write(path, new, rev + 1)
+        return new, rev + 1
+
+
+def merge_changes(base: Any, mine: Any, theirs: Any) -> Any:
+    """Fusione a tre vie: le chiavi cambiate rispetto a `base` in `mine` vincono su `theirs`."""
+    if not (isinstance(base, dict) and isinstance(mine, dict) and isinstance(theirs, dict)):
+        return copy.deepcopy(mine) if mine != base else copy.deepcopy(theirs)
+    out = copy.deepcopy(theirs)
+    for key in set(base) | set(mine):
+        old, new = base.get(key, _MISSING), mine.get(key, _MISSING)
+        if old == new:
+            continue
+        if new is _MISSING:
+            out.pop(key, None)
+        elif isinstance(old, dict) and isinstance(new, dict) and isinstance(out.get(key), dict):
+            out[key] = merge_changes(old, new, out[key])
+        else:
+            out[key] = copy.deepcopy(new)
+    return out
+
+
+def save_merged(path: str, base: Any, mine: Any, default: Any = None) -> Tuple[Any, int]:
+    """Salva `mine` (copia modificata di `base`) fondendola con eventuali scritture altrui."""
+    return update_json(path, lambda theirs: merge_changes(base, mine, theirs), default)
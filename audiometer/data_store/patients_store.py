@@ -1,35 +1,50 @@
 from __future__ import annotations
-import json, os
-from typing import List, Optional
+import os, threading
+from typing import Dict, List, Optional
 from ..models.patient import Patient
+from .jsonl_log import JsonlLog
 
 DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
 os.makedirs(DATA_DIR, exist_ok=True)
-PATIENTS_FILE = os.path.join(DATA_DIR, "patients.json")
+PATIENTS_FILE = os.path.join(DATA_DIR, "patients.jsonl")
+LEGACY_PATIENTS_FILE = os.path.join(DATA_DIR, "patients.json")
 
-def _load_all() -> List[Patient]:
-    if not os.path.exists(PATIENTS_FILE):
-        return []
-    with open(PATIENTS_FILE, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    return [Patient.from_dict(p) for p in data]
+_log = JsonlLog(PATIENTS_FILE, LEGACY_PATIENTS_FILE)
+_lock = threading.RLock()
+# patient_id -> Patient (last write wins); built once per process
+_index: Optional[Dict[str, Patient]] = None
 
-def _save_all(patients: List[Patient]) -> None:
-    with open(PATIENTS_FILE, "w", encoding="utf-8") as f:
-        json.dump([p.to_dict() for p in patients], f, ensure_ascii=False, indent=2)
+def _get_index() -> Dict[str, Patient]:
+    global _index
+    with _lock:
+        if _index is None:
+            idx: Dict[str, Patient] = {}
+            for rec in _log.records():
+                p = Patient.from_dict(rec)
+                idx[p.patient_id] = p
+            _index = idx
+        return _index
 
 def list_patients() -> List[Patient]:
-    return _load_all()
+    return list(_get_index().values())
 
 def add_or_update_patient(p: Patient) -> None:
-    items = _load_all()
-    by_id = {x.patient_id: x for x in items}
-    by_id[p.patient_id] = p
-    _save_all(list(by_id.values()))
+    with _lock:
+        idx = _get_index()
+        _log.append(p.to_dict())
+        idx[p.patient_id] = p
 
 def get_patient(pid: str) -> Optional[Patient]:
-    for p in _load_all():
-        if p.patient_id == pid:
-            return p
-    return None
+    return _get_index().get(pid)
 
+def compact() -> int:
+    """Riscrive il log con la sola ultima versione di ogni paziente."""
+    with _lock:
+        idx = _get_index()
+        return _log.compact(lambda _records: [p.to_dict() for p in idx.values()])
+
+def _reset() -> None:
+    global _index
+    with _lock:
+        _log.reset()
+        _index = None
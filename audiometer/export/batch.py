@@ -0,0 +1,239 @@
+"""
+Generazione in blocco dei report PDF (layout build_pdf_report_v3) da riga di comando.
+
+Gli esami arrivano da un elenco di file oppure da una ricerca nell'archivio
+(stessi filtri di results.bulk_export). I PDF sono prodotti in un pool di
+processi: ogni processo carica una sola volta font e sfondo dell'audiogramma
+(fast_render) e li riusa per tutti i suoi esami.
+
+- ripresa: un PDF gia' presente e piu' recente dell'esame non viene rifatto
+  (--force per rigenerare); ogni PDF compare solo a scrittura completata;
+- un esame che fallisce non ferma gli altri: gli errori finiscono in
+  `<out>/batch_errors.ndjson` e nel riepilogo.
+
+Uso: python -m audiometer.export.batch --tk-appdata DIR --out DIR [--from 2024-01-01] [--workers 4]
+"""
+from __future__ import annotations
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+import argparse
+import datetime
+import json
+import os
+import sys
+
+from audiometry.exam_loader import Exam, read_exam
+from results.archive import exam_patient_id
+from results.bulk_export import ExportFilter, iter_exams
+
+from ..plotting.audiogram_plot import DEFAULT_FREQS
+
+ERRORS_NAME = "batch_errors.ndjson"
+
+# (esame, pdf di destinazione, logo)
+Job = Tuple[str, str, Optional[str]]
+ProgressFn = Callable[[int, int, str, Optional[str]], None]
+
+
+@dataclass
+class BatchReport:
+    total: int = 0
+    done: int = 0
+    skipped: int = 0
+    failed: List[Tuple[str, str]] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not self.failed
+
+
+def output_path(out_dir: str, exam_path: str) -> str:
+    """<out>/<PID>/<PID>_<nome esame>.pdf"""
+    pid = exam_patient_id(exam_path) or "senza_id"
+    stem = os.path.splitext(os.path.basename(exam_path))[0]
+    return os.path.join(out_dir, pid, f"{pid}_{stem}.pdf")
+
+
+def _up_to_date(src: str, out: str) -> bool:
+    try:
+        return os.path.getmtime(out) >= os.path.getmtime(src)
+    except OSError:
+        return False
+
+
+def plan_jobs(paths: Iterable[str], out_dir: str, force: bool = False, logo_path: Optional[str] = None) -> Tuple[List[Job], int]:
+    """Lavori da eseguire e numero di esami gia' fatti (saltati)."""
+    jobs: List[Job] = []
+    skipped = 0
+    seen = set()
+    for src in paths:
+        src = os.path.abspath(src)
+        if src in seen:
+            continue
+        seen.add(src)
+        out = output_path(out_dir, src)
+        if not force and _up_to_date(src, out):
+            skipped += 1
+        else:
+            jobs.append((src, out, logo_path))
+    return jobs, skipped
+
+
+# ----- lavoro del singolo processo -----
+
+@lru_cache(maxsize=512)
+def _profile(path: str) -> Dict[str, Any]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def _patient_for(exam: Exam) -> Dict[str, Any]:
+    """Anagrafica dell'esame, completata dal profilo dell'assistito se l'esame riporta solo l'ID."""
+    patient = dict(exam.patient)
+    patient.setdefault("id", exam.patient_id)
+    if patient.get("cognome") or patient.get("nome"):
+        return patient
+    parts = os.path.normpath(exam.path).split(os.sep)
+    if len(parts) >= 3 and parts[-2] == "screenings":
+        profile = os.path.join(os.sep.join(parts[:-2]), "profile.json")
+    elif "audiometries" in parts:
+        base = os.sep.join(parts[:len(parts) - parts[::-1].index("audiometries") - 1])
+        profile = os.path.join(base, "patients", f"{exam.patient_id}.json")
+    else:
+        return patient
+    for key, value in _profile(profile).items():
+        patient.setdefault(key, value)
+    return patient
+
+
+def _exam_freqs(exam: Exam) -> List[int]:
+    # asse standard se possibile: lo sfondo in cache resta lo stesso per quasi tutti gli esami
+    return sorted(set(DEFAULT_FREQS) | set(exam.frequencies) | set(exam.right) | set(exam.left))
+
+
+def _init_worker() -> None:
+    import matplotlib
+    matplotlib.use("Agg")
+    from ..plotting.audiogram_plot import render_audiogram_png
+    render_audiogram_png([], {}, "Dispositivo", freqs=DEFAULT_FREQS, dpi=170)  # font e sfondo
+
+
+def render_job(job: Job) -> Tuple[str, Optional[str]]:
+    """Produce un PDF; ritorna (esame, errore o None). Non solleva eccezioni."""
+    from .pdf_report import build_pdf_report_v3
+
+    src, out, logo_path = job
+    tmp = out + ".tmp"
+    try:
+        exam = read_exam(src)
+        rows = [{"ear": ear, "freq": f, "dbhl": db} for ear in ("R", "L") for f, db in sorted(exam.ear(ear).items())]
+        os.makedirs(os.path.dirname(out), exist_ok=True)
+        build_pdf_report_v3(
+            _patient_for(exam), rows, exam.device or None, exam.headphone or None, _exam_freqs(exam),
+            logo_path, tmp, notes=exam.notes or None, exam_date=exam.created_at, operator=exam.operator or None,
+        )
+        os.replace(tmp, out)
+        return src, None
+    except Exception as exc:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        return src, f"{type(exc).__name__}: {exc}"
+
+
+# ----- esecuzione -----
+
+def run_batch(
+    paths: Iterable[str],
+    out_dir: str,
+    workers: Optional[int] = None,
+    force: bool = False,
+    logo_path: Optional[str] = None,
+    progress: Optional[ProgressFn] = None,
+) -> BatchReport:
+    """Genera i PDF mancanti o non aggiornati. `workers=0` lavora nel processo corrente."""
+    jobs, skipped = plan_jobs(paths, out_dir, force, logo_path)
+    report = BatchReport(total=len(jobs) + skipped, skipped=skipped)
+
+    def _record(src: str, error: Optional[str]) -> None:
+        if error is None:
+            report.done += 1
+        else:
+            report.failed.append((src, error))
+        if progress is not None:
+            progress(report.done + len(report.failed), len(jobs), src, error)
+
+    if workers is None:
+        workers = min(len(jobs), os.cpu_count() or 1)
+    if workers <= 0 or len(jobs) <= 1:
+        for job in jobs:
+            _record(*render_job(job))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            for future in as_completed([pool.submit(render_job, job) for job in jobs]):
+                _record(*future.result())
+
+    os.makedirs(out_dir, exist_ok=True)
+    with open(os.path.join(out_dir, ERRORS_NAME), "w", encoding="utf-8") as f:
+        for src, error in sorted(report.failed):
+            f.write(json.dumps({"exam": src, "error": error}, ensure_ascii=False) + "\n")
+    return report
+
+
+def select_exams(
+    qt_appdata: Optional[str] = None,
+    tk_appdata: Optional[str] = None,
+    flt: Optional[ExportFilter] = None,
+) -> List[str]:
+    """Percorsi degli esami dell'archivio che passano il filtro."""
+    return [exam.path for exam in iter_exams(qt_appdata, tk_appdata, flt)]
+
+
+def _print_progress(done: int, total: int, src: str, error: Optional[str]) -> None:
+    if error:
+        print(f"\nERRORE {src}: {error}", file=sys.stderr)
+    print(f"\r[{done}/{total}] {os.path.basename(src)}", end="", file=sys.stderr, flush=True)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Report PDF in blocco per gli esami dell'archivio")
+    parser.add_argument("--out", required=True, help="cartella dei PDF")
+    parser.add_argument("--exam", action="append", default=[], help="file d'esame (ripetibile)")
+    parser.add_argument("--list", dest="list_file", default=None, help="file con un percorso d'esame per riga")
+    parser.add_argument("--qt-appdata", default=None, help="cartella che contiene Farmaudiometria/")
+    parser.add_argument("--tk-appdata", default=None, help="cartella dati dell'app Tk (contiene patients/)")
+    parser.add_argument("--from", dest="date_from", type=datetime.date.fromisoformat, default=None)
+    parser.add_argument("--to", dest="date_to", type=datetime.date.fromisoformat, default=None)
+    parser.add_argument("--patient", action="append", default=[], help="ID assistito (ripetibile)")
+    parser.add_argument("--headphone", action="append", default=[], help="ID o nome cuffia (ripetibile)")
+    parser.add_argument("--logo", default=None, help="logo per l'intestazione")
+    parser.add_argument("--workers", type=int, default=None, help="processi (default: CPU; 0 = sequenziale)")
+    parser.add_argument("--force", action="store_true", help="rigenera anche i PDF gia' aggiornati")
+    args = parser.parse_args(argv)
+
+    paths = list(args.exam)
+    if args.list_file:
+        with open(args.list_file, "r", encoding="utf-8") as f:
+            paths.extend(line.strip() for line in f if line.strip())
+    if args.qt_appdata or args.tk_appdata:
+        flt = ExportFilter(args.date_from, args.date_to, frozenset(args.patient), frozenset(args.headphone))
+        paths.extend(select_exams(args.qt_appdata, args.tk_appdata, flt))
+    if not paths:
+        parser.error("nessun esame: indicare --exam, --list oppure --tk-appdata/--qt-appdata")
+
+    import matplotlib
+    matplotlib.use("Agg")
+    report = run_batch(paths, args.out, args.workers, args.force, args.logo, progress=_print_progress)
+    print(f"\nPDF creati: {report.done}, gia' presenti: {report.skipped}, errori: {len(report.failed)}", file=sys.stderr)
+    return 0 if report.ok else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
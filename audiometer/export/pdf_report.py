@@ -10,7 +10,8 @@ plt.rcParams['font.family'] = 'DejaVu Sans'
 from matplotlib.backends.backend_pdf import PdfPages
 import matplotlib.image as mpimg
 
-from ..plotting.audiogram_plot import render_audiogram_image
+from ..plotting.audiogram_plot import render_audiogram_image, render_audiogram_png
+from audiometry.audiogram import Audiogram
 
 
 DISCLAIMER = (
@@ -93,21 +94,10 @@ def build_pdf_report(
         ax_meta.text(0, 1, '\n'.join(meta_lines), va='top', fontsize=9)
 
         # Build thresholds map
-        def to_map(rows_list):
-            m = {'R': {}, 'L': {}}
-            for r in rows_list:
-                if isinstance(r, dict):
-                    ear, f, db = r.get('ear'), int(r.get('freq')), float(r.get('dbhl'))
-                else:
-                    ear, f, db = r[2], int(r[3]), float(r[4])
-                if ear in ('R', 'L'):
-                    m[ear][f] = db
-            return m
-
-        m_thr = to_map(rows)
+        ag = Audiogram.from_rows(rows, freqs)
         headers = ['Hz'] + [str(f) for f in freqs]
-        rowR = ['OD (R)'] + [m_thr['R'].get(f, '-') for f in freqs]
-        rowL = ['OS (L)'] + [m_thr['L'].get(f, '-') for f in freqs]
+        rowR = ['OD (R)'] + ag.table_cells('R')
+        rowL = ['OS (L)'] + ag.table_cells('L')
         ax_tbl = fig2.add_axes([0.60, 0.36, 0.35, 0.34])
         ax_tbl.axis('off')
         table_data = [headers, rowR, rowL]
@@ -168,8 +158,7 @@ def build_pdf_report_v2(
     with PdfPages(out_pdf_path) as pdf:
         # Page 1: audiogram + notes (no overlap)
         fig = plt.figure(figsize=(8.27, 11.69)); draw_header(fig, 'Audiofarm Audiometer')
-        pfig, _ = render_audiogram_image(rows, patient, device, freqs=freqs, out_path=None, dpi=170)
-        buf = io.BytesIO(); pfig.savefig(buf, format='png', dpi=170, bbox_inches='tight'); plt.close(pfig); buf.seek(0)
+        buf = io.BytesIO(render_audiogram_png(rows, patient, device, freqs=freqs, dpi=170))
         ax_img = fig.add_axes([0.05, 0.42, 0.90, 0.46]); ax_img.axis('off'); ax_img.imshow(mpimg.imread(buf))
         # Notes section
         ax_note = fig.add_axes([0.05, 0.18, 0.90, 0.20]); ax_note.axis('off')
@@ -194,17 +183,10 @@ def build_pdf_report_v2(
         ax_meta = fig2.add_axes([0.05, 0.82, 0.90, 0.12]); ax_meta.axis('off'); ax_meta.text(0,1,'\n'.join(meta_lines), va='top', fontsize=10)
 
         # Tabella soglie
-        def to_map(rows_list):
-            m = {'R': {}, 'L': {}}
-            for r in rows_list:
-                if isinstance(r, dict): ear, f, db = r.get('ear'), int(r.get('freq')), float(r.get('dbhl'))
-                else: ear, f, db = r[2], int(r[3]), float(r[4])
-                if ear in ('R','L'): m[ear][f] = db
-            return m
-        mthr = to_map(rows)
+        ag = Audiogram.from_rows(rows, freqs)
         headers = ['Hz'] + [str(f) for f in freqs]
-        rowR = ['OD (R)'] + [mthr['R'].get(f, '-') for f in freqs]
-        rowL = ['OS (L)'] + [mthr['L'].get(f, '-') for f in freqs]
+        rowR = ['OD (R)'] + ag.table_cells('R')
+        rowL = ['OS (L)'] + ag.table_cells('L')
         ax_tbl = fig2.add_axes([0.05, 0.58, 0.90, 0.18]); ax_tbl.axis('off')
         tbl = ax_tbl.table(cellText=[headers, rowR, rowL], loc='center'); tbl.auto_set_font_size(False); tbl.set_fontsize(9); tbl.scale(1.1,1.3)
 
@@ -226,9 +208,12 @@ def build_pdf_report_v3(
     logo_path: str | None,
     out_pdf_path: str,
     notes: str | None = None,
+    exam_date: dt.datetime | None = None,
+    operator: str | None = None,
 ):
     """Single-page A4 layout: header with small logo, two columns (operatore/paziente),
     audiogram, notes, signature lines, and disclaimer at bottom.
+    `exam_date`/`operator` default to now and the current user (batch uses the exam's own).
     """
     os.makedirs(os.path.dirname(out_pdf_path) or '.', exist_ok=True)
 
@@ -273,8 +258,8 @@ def build_pdf_report_v3(
             age = f"{years} anni"
         except Exception:
             age = ''
-        operator = os.getenv('USERNAME', '')
-        when = dt.datetime.now().strftime('%d/%m/%Y %H:%M')
+        operator = operator or os.getenv('USERNAME', '')
+        when = (exam_date or dt.datetime.now()).strftime('%d/%m/%Y %H:%M')
 
         # Operatore (left) with device info.
         ax_left = fig.add_axes([0.06, 0.75, 0.42, 0.16]); ax_left.axis('off')
@@ -302,8 +287,7 @@ def build_pdf_report_v3(
         ax_right.text(0, 1, '\n'.join(_wrap_line(l) for l in right_lines), va='top', fontsize=11)
 
         # Audiogram
-        pfig, _ = render_audiogram_image(rows, patient, device, freqs=freqs, out_path=None, dpi=170)
-        buf = io.BytesIO(); pfig.savefig(buf, format='png', dpi=170); plt.close(pfig); buf.seek(0)
+        buf = io.BytesIO(render_audiogram_png(rows, patient, device, freqs=freqs, dpi=170))
         ax_img = fig.add_axes([0.05, 0.42, 0.90, 0.36]); ax_img.axis('off'); ax_img.imshow(mpimg.imread(buf))
 
         # Notes
@@ -4,6 +4,8 @@ import matplotlib
 import matplotlib.pyplot as plt
 import matplotlib.ticker as mticker
 
+from audiometry.audiogram import Audiogram
+
 DEFAULT_FREQS = [125, 250, 500, 1000, 2000, 3000, 4000, 6000, 8000]
 
 # Bande qualitative (dB HL)
@@ -19,25 +21,13 @@ BANDS = [
 
 
 def _prep_series(rows, freqs):
-    right = {f: None for f in freqs}
-    left = {f: None for f in freqs}
-    for r in rows:
-        if isinstance(r, dict):
-            ear, f, db = r["ear"], int(r["freq"]), float(r["dbhl"])
-        else:
-            ear, f, db = r[2], int(r[3]), float(r[4])
-        if f in right:
-            if ear == "R":
-                right[f] = db
-            elif ear == "L":
-                left[f] = db
-    return right, left
-
+    """Righe/dict di misure -> Audiogram sull'asse `freqs` (l'ultima misura vince)."""
+    if isinstance(rows, Audiogram):
+        return rows if rows.freqs == tuple(freqs) else rows.with_freqs(freqs)
+    return Audiogram.from_rows(rows, freqs)
 
-def render_audiogram_image(rows, patient, device_name, freqs=DEFAULT_FREQS, out_path=None, dpi=150):
-    right, left = _prep_series(rows, freqs)
 
-    fig, ax = plt.subplots(figsize=(7.5, 7))
+def audiogram_title(patient, device_name):
     # Clean title with patient info (UTF-8 safe)
     title = (
         f"Audiogramma - {patient.get('cognome','')} {patient.get('nome','')}  "
@@ -45,8 +35,11 @@ def render_audiogram_image(rows, patient, device_name, freqs=DEFAULT_FREQS, out_
     )
     if device_name:
         title += f"\nDevice: {device_name}"
-    ax.set_title(title, pad=14)
+    return title
 
+
+def _style_axes(ax, freqs):
+    """Parte statica dell'audiogramma: bande, assi, etichette e griglia."""
     for (y0, y1, label, color) in BANDS:
         ax.axhspan(y0, y1, facecolor=color, alpha=0.9, edgecolor='none')
         ax.text(freqs[0] * 0.9, (y0 + y1) / 2.0, label, va='center', ha='right', fontsize=10, fontweight='bold')
@@ -65,15 +58,22 @@ def render_audiogram_image(rows, patient, device_name, freqs=DEFAULT_FREQS, out_
     ax.grid(True, which='major', linestyle='--', alpha=0.5)
     ax.grid(True, which='minor', linestyle=':', alpha=0.35)
 
-    def _series_plot(data_map, marker, color, label):
-        xs = [f for f in freqs if data_map.get(f) is not None]
-        ys = [data_map[f] for f in xs]
+
+def render_audiogram_image(rows, patient, device_name, freqs=DEFAULT_FREQS, out_path=None, dpi=150):
+    ag = _prep_series(rows, freqs)
+
+    fig, ax = plt.subplots(figsize=(7.5, 7))
+    ax.set_title(audiogram_title(patient, device_name), pad=14)
+    _style_axes(ax, freqs)
+
+    def _series_plot(ear, marker, color, label):
+        xs, ys = ag.series(ear)
         if xs:
             ax.plot(xs, ys, marker=marker, label=label, linewidth=1.5, color=color)
 
     # Conventions: OD=red circle (o), OS=blue cross (x)
-    _series_plot(right, 'o', '#ff0000', 'OD (R)')
-    _series_plot(left, 'x', '#0000ff', 'OS (L)')
+    _series_plot('R', 'o', '#ff0000', 'OD (R)')
+    _series_plot('L', 'x', '#0000ff', 'OS (L)')
 
     ax.legend(loc='lower right')
     fig.tight_layout()
@@ -84,6 +84,12 @@ def render_audiogram_image(rows, patient, device_name, freqs=DEFAULT_FREQS, out_
     return fig, ax
 
 
+def render_audiogram_png(rows, patient, device_name, freqs=DEFAULT_FREQS, dpi=150):
+    """Come render_audiogram_image, ma ritorna i byte PNG (sfondo in cache, vedi fast_render)."""
+    from .fast_render import render_audiogram_png_fast
+    return render_audiogram_png_fast(rows, patient, device_name, freqs=freqs, dpi=dpi)
+
+
 # Convenience: plot into an existing Matplotlib Axes from a results map
 def plot_audiogram_from_results(ax, results_map, freqs=DEFAULT_FREQS, title=None):
     """
@@ -91,18 +97,14 @@ def plot_audiogram_from_results(ax, results_map, freqs=DEFAULT_FREQS, title=None
       { 'R': [(hz, dbhl), ...], 'L': [(hz, dbhl), ...] }
     This mirrors the shape produced by the integration screening and UI storage.
     """
-    # Build rows compatible with _prep_series
-    rows = []
+    ag = Audiogram(freqs)
     for ear in ('R', 'L'):
         for item in (results_map.get(ear) or []):
             try:
-                hz, db = int(item[0]), float(item[1])
-                rows.append({'ear': ear, 'freq': hz, 'dbhl': db})
+                ag.set(ear, int(item[0]), float(item[1]))
             except Exception:
                 continue
 
-    right, left = _prep_series(rows, freqs)
-
     # Initialize axes
     if title:
         ax.set_title(title, pad=14)
@@ -126,14 +128,13 @@ def plot_audiogram_from_results(ax, results_map, freqs=DEFAULT_FREQS, title=None
     ax.grid(True, which='minor', linestyle=':', alpha=0.35)
 
     # Plot series
-    def _series_plot(data_map, marker, color, label):
-        xs = [f for f in freqs if data_map.get(f) is not None]
-        ys = [data_map[f] for f in xs]
+    def _series_plot(ear, marker, color, label):
+        xs, ys = ag.series(ear)
         if xs:
             ax.plot(xs, ys, marker=marker, label=label, linewidth=1.5, color=color)
 
-    _series_plot(right, 'o', '#ff0000', 'OD (R)')
-    _series_plot(left, 'x', '#0000ff', 'OS (L)')
+    _series_plot('R', 'o', '#ff0000', 'OD (R)')
+    _series_plot('L', 'x', '#0000ff', 'OS (L)')
     ax.legend(loc='lower right')
     return ax
 
@@ -141,7 +142,7 @@ def plot_audiogram_from_results(ax, results_map, freqs=DEFAULT_FREQS, title=None
 class LiveAudiogram:
     """Matplotlib figure for dynamic audiogram display (embedded in Tk)."""
 
-    def __init__(self, freqs=DEFAULT_FREQS, title="Audiometria live"):
+    def __init__(self, freqs=DEFAULT_FREQS, title="Audiometria live", blit=False):
         self.freqs = list(freqs)
         self.fig, self.ax = plt.subplots(figsize=(7.5, 7))
         self._init_axes(title)
@@ -164,8 +165,19 @@ class LiveAudiogram:
                                       linewidths=1.5, label='Cursore', zorder=4)
         # Current frequency vertical line
         self.vline = self.ax.axvline(x=self.freqs[0], linestyle='--', color='#555555', alpha=0.6, zorder=1)
-        self.ax.legend(loc='lower right')
+        self.legend = self.ax.legend(loc='lower right')
         self.fig.tight_layout()
+        # Blitting: sfondo (bande, griglia, assi) in cache, ridisegnati solo gli artisti mobili.
+        # La legenda e' tra questi per restare sopra le serie, come nel disegno completo.
+        self.blit = blit
+        self._animated = [self.vline, self.right_ref_line, self.left_ref_line, self.right_line, self.left_line,
+                          self.cursor, self.probe, self.probe_text, self.legend]
+        self._background = None
+        self._canvas = None
+        self._draw_cid = None
+        for artist in self._animated:
+            artist.set_animated(blit)
+        self.attach()
 
     def _init_axes(self, title):
         self.ax.set_title(title, pad=14)
@@ -187,13 +199,9 @@ class LiveAudiogram:
         self.ax.grid(True, which='minor', linestyle=':', alpha=0.35)
 
     def update_rows(self, rows):
-        right_map, left_map = _prep_series(rows, self.freqs)
-        rx = [f for f in self.freqs if right_map.get(f) is not None]
-        ry = [right_map[f] for f in rx]
-        lx = [f for f in self.freqs if left_map.get(f) is not None]
-        ly = [left_map[f] for f in lx]
-        self.right_line.set_data(rx, ry)
-        self.left_line.set_data(lx, ly)
+        ag = _prep_series(rows, self.freqs)
+        self.right_line.set_data(*ag.series('R'))
+        self.left_line.set_data(*ag.series('L'))
 
     def update_reference_map(self, ref_map):
         ref_r = ref_map.get('R', {}) if ref_map else {}
@@ -230,3 +238,44 @@ class LiveAudiogram:
 
     def figure(self):
         return self.fig, self.ax
+
+    def attach(self, canvas=None):
+        """
+        Aggancia il grafico al canvas che lo mostra (es. FigureCanvasTkAgg): da qui ogni
+        disegno completo, anche quelli di Tk (prima visualizzazione, ridimensionamento),
+        aggiorna lo sfondo in cache e include gli artisti mobili.
+        """
+        canvas = canvas or self.fig.canvas
+        if canvas is self._canvas:
+            return
+        if self._canvas is not None and self._draw_cid is not None:
+            self._canvas.mpl_disconnect(self._draw_cid)
+        self._canvas = canvas
+        self._draw_cid = canvas.mpl_connect('draw_event', self._on_draw) if self.blit else None
+        self._background = None
+
+    def _on_draw(self, event):
+        # disegno completo (prima visualizzazione, ridimensionamento): nuovo sfondo
+        canvas = self.fig.canvas
+        if not canvas.supports_blit:
+            return
+        self._background = canvas.copy_from_bbox(self.fig.bbox)
+        self._draw_animated()
+
+    def _draw_animated(self):
+        for artist in self._animated:
+            self.fig.draw_artist(artist)
+
+    def refresh(self):
+        """Aggiorna il grafico: in modo blit solo gli artisti mobili, altrimenti disegno completo."""
+        canvas = self.fig.canvas
+        if not (self.blit and canvas.supports_blit):
+            canvas.draw()
+            return
+        self.attach(canvas)  # nessun effetto se gia' agganciato
+        if self._background is None:
+            canvas.draw()  # _on_draw salva lo sfondo e disegna gli artisti mobili
+            return
+        canvas.restore_region(self._background)
+        self._draw_animated()
+        canvas.blit(self.fig.bbox)
@@ -0,0 +1,98 @@
+"""
+Rendering PNG dell'audiogramma riusando uno sfondo gia' disegnato.
+
+Bande, griglia, assi, etichette e layout sono disegnati una sola volta per
+(frequenze, dpi, dimensione, righe del titolo) e conservati come raster Agg;
+per ogni esame si ripristina il raster e si disegnano soltanto titolo, serie
+OD/OS e legenda (blitting). Il risultato e' lo stesso di render_audiogram_image.
+"""
+from __future__ import annotations
+from functools import lru_cache
+from typing import Sequence, Tuple
+import io
+import threading
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from PIL import Image
+
+from .audiogram_plot import DEFAULT_FREQS, _prep_series, _style_axes, audiogram_title
+
+FIGSIZE = (7.5, 7)
+_LAYOUT_DPI = 100  # dpi di default di pyplot.subplots
+# Stesse convenzioni di render_audiogram_image: OD cerchio rosso, OS croce blu
+_SERIES = (("R", "o", "#ff0000", "OD (R)"), ("L", "x", "#0000ff", "OS (L)"))
+
+
+class AudiogramTemplate:
+    """Figura Agg con sfondo in cache; `render` e' serializzato da un lock."""
+
+    def __init__(self, freqs: Sequence[int], dpi: int = 150, size: Tuple[float, float] = FIGSIZE, title_lines: int = 2):
+        self.freqs = list(freqs)
+        self._lock = threading.Lock()
+        # layout calcolato a 100 dpi come la figura pyplot di render_audiogram_image,
+        # poi disegnato a `dpi` come il suo savefig: stesse posizioni al pixel
+        self.fig = Figure(figsize=size, dpi=_LAYOUT_DPI)
+        self.canvas = FigureCanvasAgg(self.fig)
+        self.ax = self.fig.add_subplot()
+        # segnaposto con la stessa altezza di riga del titolo vero ("(ID ...)"), che conta per tight_layout
+        self._title = self.ax.set_title("\n".join(["(Ag)"] * title_lines), pad=14)
+        _style_axes(self.ax, self.freqs)
+        self._lines = {}
+        for ear, marker, color, label in _SERIES:
+            self._lines[ear], = self.ax.plot([], [], marker=marker, label=label, linewidth=1.5, color=color, animated=True)
+        # una legenda per combinazione di orecchi presenti, come ax.legend() sulle sole serie disegnate
+        self._legends = {}
+        for ears in (("R",), ("L",), ("R", "L")):
+            legend = self.ax.legend([self._lines[e] for e in ears], [l.get_label() for l in map(self._lines.get, ears)],
+                                    loc="lower right")
+            legend.set_animated(True)
+            legend.remove()
+            self._legends[ears] = legend
+        self.fig.tight_layout()
+        self.fig.set_dpi(dpi)
+        self._title.set_animated(True)
+        self.canvas.draw()
+        self._background = self.canvas.copy_from_bbox(self.fig.bbox)
+
+    def render_rgba(self, rows, title: str) -> Image.Image:
+        return self._render(rows, title, "RGBA")
+
+    def _render(self, rows, title: str, mode: str) -> Image.Image:
+        ag = _prep_series(rows, self.freqs)
+        with self._lock:
+            self.canvas.restore_region(self._background)
+            present = []
+            for ear, line in self._lines.items():
+                xs, ys = ag.series(ear)
+                if xs:
+                    line.set_data(xs, ys)
+                    self.ax.draw_artist(line)
+                    present.append(ear)
+            if present:
+                self.ax.draw_artist(self._legends[tuple(present)])
+            self._title.set_text(title)
+            self.ax.draw_artist(self._title)
+            frame = Image.frombuffer("RGBA", self.canvas.get_width_height(), self.canvas.buffer_rgba(), "raw", "RGBA", 0, 1)
+            # copia fuori dal buffer Agg, che verra' riusato dalla prossima chiamata
+            return frame.convert(mode) if mode != "RGBA" else frame.copy()
+
+    def render_png(self, rows, title: str) -> bytes:
+        # la figura e' opaca: RGB e' senza perdita e si comprime prima e meglio di RGBA
+        img = self._render(rows, title, "RGB")
+        buf = io.BytesIO()
+        dpi = self.fig.dpi
+        img.save(buf, format="PNG", dpi=(dpi, dpi), compress_level=6)
+        return buf.getvalue()
+
+
+@lru_cache(maxsize=8)
+def get_template(freqs: Tuple[int, ...], dpi: int = 150, size: Tuple[float, float] = FIGSIZE, title_lines: int = 2) -> AudiogramTemplate:
+    return AudiogramTemplate(freqs, dpi, size, title_lines)
+
+
+def render_audiogram_png_fast(rows, patient, device_name, freqs=DEFAULT_FREQS, dpi=150, size=FIGSIZE) -> bytes:
+    """Byte PNG dell'audiogramma; lo sfondo viene disegnato solo alla prima chiamata per formato."""
+    title = audiogram_title(patient, device_name)
+    template = get_template(tuple(int(f) for f in freqs), int(dpi), tuple(size), title.count("\n") + 1)
+    return template.render_png(rows, title)
@@ -23,17 +23,17 @@ class ManualTest:
         self.results = results_store
         self.ui = ui_callbacks
 
-        self.player = TonePlayer(settings['sample_rate'],
-                                 left_index=settings['left_channel_index'],
-                                 right_index=settings['right_channel_index'])
+        self.player = TonePlayer(settings.sample_rate,
+                                 left_index=settings.left_channel_index,
+                                 right_index=settings.right_channel_index)
 
         self._stop_evt = threading.Event()
         self._loop_thread = None
         self._playing = False
 
-        self.freqs = self.settings['frequencies_hz']
+        self.freqs = self.settings.frequencies_hz
         self.freq_index = 0
-        self.level_db = float(self.settings.get('start_level_dbhl', 40))  # livello iniziale
+        self.level_db = float(self.settings.start_level_dbhl)  # livello iniziale
         self.ear = "R"
 
     # ---------------- Utils ----------------
@@ -62,11 +62,11 @@ class ManualTest:
 
     # ---------------- Audio loop (controllato da toggle) ----------------
     def _play_once(self):
-        dur_ms = self.settings.get('tone_duration_ms', 1500)
-        isi = random.randint(self.settings.get('isi_ms_min', 1200), self.settings.get('isi_ms_max', 2500)) / 1000.0
+        dur_ms = self.settings.tone_duration_ms
+        isi = random.randint(self.settings.isi_ms_min, self.settings.isi_ms_max) / 1000.0
         f = self.current_freq()
         amp = self.amplitude_from_dbhl(self.level_db, f)
-        mono = sine_wave(f, dur_ms/1000.0, self.settings['sample_rate'], amplitude=amp)
+        mono = sine_wave(f, dur_ms/1000.0, self.settings.sample_rate, amplitude=amp)
         self.player.play_stereo_tone(mono, ear=self.ear)
         time.sleep(isi)
 
@@ -141,9 +141,9 @@ class ManualTest:
     def move_level(self, delta_db):
         # cambiare livello interrompe la riproduzione
         self._stop_play()
-        step = self.settings.get('step_db', 5)
+        step = self.settings.step_db
         new_level = self.level_db + delta_db*step
-        new_level = max(self.settings.get('min_level_dbhl', 0), min(self.settings.get('max_level_dbhl', 100), new_level))
+        new_level = max(self.settings.min_level_dbhl, min(self.settings.max_level_dbhl, new_level))
         self.level_db = new_level
         try:
             self.ui._call(self.ui.manual_on_cursor, self.current_freq(), self.level_db, self.ear)
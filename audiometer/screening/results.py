@@ -1,17 +1,50 @@
 import datetime as dt
 import os
 
+from audiometry.audiogram import Audiogram
+
 class ResultsStore:
-    def __init__(self):
+    def __init__(self, journal_factory=None):
         # rows: list of dicts {ear, freq, dbhl}
         self.rows = []
+        # ultima soglia per (orecchio, frequenza), per grafici/analisi/report
+        self.audiogram = Audiogram()
         self.notes = ""
+        # Write-ahead log dell'esame in corso: creato al primo punto se c'e' una factory
+        self.journal_factory = journal_factory
+        self.journal = None
 
     def add_result(self, ear, freq_hz, dbhl):
         self.rows.append({"ear": ear, "freq": int(freq_hz), "dbhl": float(dbhl)})
+        side = 'R' if ear == 'R' else 'L'
+        if not self.audiogram.set(side, freq_hz, dbhl):
+            self.audiogram = self.audiogram.with_freqs(sorted(self.audiogram.freqs + (int(freq_hz),)))
+            self.audiogram.set(side, freq_hz, dbhl)
+        if self.journal is None and self.journal_factory is not None:
+            try:
+                self.journal = self.journal_factory()
+            except OSError:
+                self.journal_factory = None
+        if self.journal is not None:
+            self.journal.append_point(ear, freq_hz, dbhl)
 
     def clear(self):
         self.rows = []
+        self.audiogram.clear()
+        if self.journal is not None:
+            self.journal.append_clear()
+
+    def complete_journal(self):
+        """Esame salvato: chiude e rimuove il write-ahead log."""
+        if self.journal is not None:
+            self.journal.complete()
+            self.journal = None
+
+    def discard_journal(self):
+        """Esame abbandonato (cambio assistito): il log non va riproposto al riavvio."""
+        if self.journal is not None:
+            self.journal.discard()
+            self.journal = None
 
     def to_rows(self, patient):
         # Returns table rows for UI
@@ -20,7 +53,7 @@ class ResultsStore:
             out.append([patient["id"], f"{patient['cognome']} {patient['nome']}", r["ear"], r["freq"], r["dbhl"]])
         return out
 
-    def to_payload(self, patient):
+    def to_payload(self, patient, headphone_id=None):
         # Payload for Apps Script
         return {
             "screening": {
@@ -28,6 +61,7 @@ class ResultsStore:
                 "timestamp": dt.datetime.now().isoformat(),
                 "operator": os.getenv("USERNAME", "Operatore"),
                 "device": "Headphones",
+                "headphoneId": headphone_id or "",
                 "calibrationRef": "ManualRelative",
                 "note": self.notes or ""
             },
@@ -40,11 +74,7 @@ class ResultsStore:
 
     def to_map_by_ear(self):
         """Aggrega risultati in {'L': {freq: db}, 'R': {...}} (ultima misura per freq vince)."""
-        out = {'L': {}, 'R': {}}
-        for r in self.rows:
-            ear = 'R' if r.get('ear') == 'R' else 'L'
-            out[ear][int(r.get('freq'))] = float(r.get('dbhl'))
-        return out
+        return self.audiogram.to_maps()
 
     # Notes API
     def set_notes(self, text: str):
@@ -14,9 +14,9 @@ class TestRunner:
         self.results = results_store
         self.ui = ui_callbacks
 
-        self.player = TonePlayer(settings['sample_rate'],
-                                 left_index=settings['left_channel_index'],
-                                 right_index=settings['right_channel_index'])
+        self.player = TonePlayer(settings.sample_rate,
+                                 left_index=settings.left_channel_index,
+                                 right_index=settings.right_channel_index)
         self._stop_evt = threading.Event()
         self._space_evt = threading.Event()
         self._worker = None
@@ -36,8 +36,8 @@ class TestRunner:
         return float(amp)
 
     def play_single_tone(self, freq_hz, level_dbhl, ear, duration_ms=None):
-        duration_ms = duration_ms or self.settings.get('tone_duration_ms', 1500)
-        mono = sine_wave(freq_hz, duration_ms/1000.0, self.settings['sample_rate'], amplitude=self.amplitude_from_dbhl(level_dbhl, freq_hz, ear))
+        duration_ms = duration_ms or self.settings.tone_duration_ms
+        mono = sine_wave(freq_hz, duration_ms/1000.0, self.settings.sample_rate, amplitude=self.amplitude_from_dbhl(level_dbhl, freq_hz, ear))
         self.player.play_stereo_tone(mono, ear=ear)
 
     def start_test(self, ear):
@@ -69,7 +69,7 @@ class TestRunner:
                 self.ui.on_error(str(e)); return (False, None)
 
             heard = self._space_evt.is_set()
-            isi = random.randint(self.settings.get('isi_ms_min', 1200), self.settings.get('isi_ms_max', 2500)) / 1000.0
+            isi = random.randint(self.settings.isi_ms_min, self.settings.isi_ms_max) / 1000.0
             time.sleep(isi)
             if heard:
                 return (True, level)
@@ -84,7 +84,7 @@ class TestRunner:
 
         while not self._stop_evt.is_set():
             cycles += 1
-            if cycles > int(self.settings.get('verification_max_cycles', 8)):
+            if cycles > self.settings.verification_max_cycles:
                 maxc = max(counts.values())
                 candidates = [lvl for lvl, c in counts.items() if c == maxc]
                 return min(candidates)
@@ -110,11 +110,11 @@ class TestRunner:
         return min(candidates)
 
     def _run_test(self, ear):
-        freqs = self.settings['frequencies_hz']
-        minlv = self.settings['min_level_dbhl']
-        maxlv = self.settings.get('max_level_dbhl', 100)
-        step  = self.settings['step_db']
-        tone_ms = self.settings.get('tone_duration_ms', 1500)
+        freqs = self.settings.frequencies_hz
+        minlv = self.settings.min_level_dbhl
+        maxlv = self.settings.max_level_dbhl
+        step  = self.settings.step_db
+        tone_ms = self.settings.tone_duration_ms
 
         try:
             self.ui._call(self.ui.on_test_started, ear)
@@ -1,7 +1,11 @@
 import os
 import json
+import logging
 from datetime import datetime as dt
 from .paths import get_app_data_dir
+from .data_store.locking import compare_and_swap, read_json, update_json
+
+_log = logging.getLogger(__name__)
 
 # Directory root per i dati pazienti
 def _patients_root():
@@ -27,27 +31,25 @@ def create_patient(patient_id, nome, cognome, eta=None, birth_date=None):
         prof["eta"] = eta
     if birth_date:
         prof["birth_date"] = birth_date
-    with open(_patient_profile_path(patient_id), "w", encoding="utf-8") as f:
-        json.dump(prof, f, indent=2, ensure_ascii=False)
-    # ensure index file
+    update_json(_patient_profile_path(patient_id), lambda _cur: prof)
+    # ensure index file (senza toccare un indice creato nel frattempo da un'altra istanza)
     idx_path = _patient_index_path(patient_id)
     if not os.path.exists(idx_path):
-        with open(idx_path, "w", encoding="utf-8") as f:
-            json.dump({"id": prof["id"], "exams": []}, f, indent=2, ensure_ascii=False)
+        update_json(idx_path, lambda idx: idx or {"id": prof["id"], "exams": []})
     return prof
 
 def load_patient_profile(patient_id):
-    with open(_patient_profile_path(patient_id), "r", encoding="utf-8") as f:
-        return json.load(f)
+    path = _patient_profile_path(patient_id)
+    if not os.path.exists(path):
+        raise FileNotFoundError(path)
+    prof, _rev = read_json(path)
+    return prof
 
 def load_patient_index(patient_id):
-    idx_path = _patient_index_path(patient_id)
-    if not os.path.exists(idx_path):
-        return {"id": str(patient_id).upper(), "exams": []}
-    with open(idx_path, "r", encoding="utf-8") as f:
-        return json.load(f)
+    idx, _rev = read_json(_patient_index_path(patient_id), {"id": str(patient_id).upper(), "exams": []})
+    return idx
 
-def save_exam(patient, payload, ts=None, image_path=None):
+def save_exam(patient, payload, ts=None, image_path=None, image_sha256=None):
     pid = patient["id"]
     if not ts:
         ts = dt.now().strftime("%Y%m%d_%H%M%S")
@@ -56,34 +58,45 @@ def save_exam(patient, payload, ts=None, image_path=None):
     json_path = os.path.join(pdir, "screenings", f"{ts}.json")
     with open(json_path, "w", encoding="utf-8") as f:
         json.dump(payload, f, indent=2, ensure_ascii=False)
-    # Update index
-    idx = load_patient_index(pid)
+    # Update index: append con CAS, gli esami salvati da altre istanze restano
     entry = {"ts": ts, "path": json_path.replace("\\", "/")}
     if image_path:
         entry["image"] = image_path.replace("\\", "/")
-    idx.setdefault("exams", []).append(entry)
-    with open(_patient_index_path(pid), "w", encoding="utf-8") as f:
-        json.dump(idx, f, indent=2, ensure_ascii=False)
+    if image_sha256:
+        entry["image_sha256"] = image_sha256
+
+    def _append(idx):
+        exams = [e for e in idx.get("exams", []) if e.get("ts") != ts]
+        exams.append(entry)
+        exams.sort(key=lambda e: str(e.get("ts", "")))
+        idx["exams"] = exams
+        return idx
+
+    update_json(_patient_index_path(pid), _append, {"id": str(pid).upper(), "exams": []})
     return json_path
 
 def update_patient_profile(patient_id, **fields):
     """Merge provided fields into patient profile and save.
     Creates the profile if missing.
     """
+    path = _patient_profile_path(patient_id)
+    updates = {k: v for k, v in fields.items() if v is not None}
     try:
-        prof = load_patient_profile(patient_id)
-    except Exception:
-        prof = {"id": str(patient_id).upper()}
-    changed = False
-    for k, v in fields.items():
-        if v is None:
-            continue
-        if prof.get(k) != v:
-            prof[k] = v
-            changed = True
-    if changed or not os.path.exists(_patient_profile_path(patient_id)):
-        with open(_patient_profile_path(patient_id), "w", encoding="utf-8") as f:
-            json.dump(prof, f, indent=2, ensure_ascii=False)
+        prof, _rev = read_json(path)
+    except ValueError:
+        # profilo illeggibile: si riparte dai soli campi forniti
+        prof = dict({"id": str(patient_id).upper()}, **updates)
+        compare_and_swap(path, 0, prof)
+        return prof
+    if prof and all(prof.get(k) == v for k, v in updates.items()):
+        return prof
+
+    def _merge(cur):
+        cur = cur if isinstance(cur, dict) else {"id": str(patient_id).upper()}
+        cur.update(updates)
+        return cur
+
+    prof, _rev = update_json(path, _merge)
     return prof
 
 def list_patients():
@@ -97,20 +110,25 @@ def list_patients():
         idx_path = os.path.join(pdir, "index.json")
         name = ""
         last = ""
+        prof = {}
         if os.path.exists(prof_path):
             try:
                 prof = json.load(open(prof_path, "r", encoding="utf-8"))
                 name = f"{prof.get('cognome','')} {prof.get('nome','')}".strip()
-            except Exception:
-                pass
+            except Exception as exc:
+                _log.warning("profile.json illeggibile per %s: %s", pid, exc)
         if os.path.exists(idx_path):
             try:
                 idx = json.load(open(idx_path, "r", encoding="utf-8"))
                 if idx.get("exams"):
                     last = idx["exams"][-1].get("ts","")
-            except Exception:
-                pass
-        out.append({"id": pid, "name": name, "last_ts": last})
+            except Exception as exc:
+                _log.warning("index.json illeggibile per %s: %s", pid, exc)
+        out.append({
+            "id": pid, "name": name, "last_ts": last,
+            "cognome": prof.get("cognome", ""), "nome": prof.get("nome", ""),
+            "birth_date": prof.get("birth_date") or "",
+        })
     return out
 
 def suggest_next_patient_id():
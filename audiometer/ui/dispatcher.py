@@ -0,0 +1,126 @@
+"""
+Aggiornamenti della UI dai thread di test, raggruppati per frame.
+
+- `post(key, fn, ...)`: aggiornamento di stato (cursore, livello, riga di stato):
+  se nello stesso frame arriva un altro aggiornamento con la stessa chiave,
+  vince l'ultimo e prende il posto del precedente nella coda;
+- `send(fn, ...)`: evento da non perdere (soglia memorizzata, fine test), in ordine;
+- `repaint(key, fn)`: ridisegno, eseguito una sola volta a fine frame dopo tutti
+  gli aggiornamenti, cosi' le etichette di stato non aspettano il grafico;
+- una sola chiamata a `schedule` (root.after) per frame, qualunque sia il numero
+  di aggiornamenti; `stats()` riporta profondita' della coda e latenze.
+"""
+from __future__ import annotations
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Optional, Tuple
+import itertools
+import logging
+import threading
+import time
+
+FRAME_MS = 16
+
+Schedule = Callable[[int, Callable[[], None]], Any]
+
+_log = logging.getLogger(__name__)
+
+
+@dataclass
+class DispatcherStats:
+    posted: int = 0            # aggiornamenti ricevuti
+    coalesced: int = 0         # sostituiti da uno piu' recente prima di essere eseguiti
+    executed: int = 0
+    frames: int = 0
+    depth: int = 0             # in coda adesso
+    max_depth: int = 0
+    last_latency_ms: float = 0.0
+    max_latency_ms: float = 0.0
+    total_latency_ms: float = 0.0
+
+    @property
+    def mean_latency_ms(self) -> float:
+        return self.total_latency_ms / self.executed if self.executed else 0.0
+
+
+class UIDispatcher:
+    """Coda thread-safe svuotata sul thread della UI al massimo una volta per frame."""
+
+    def __init__(self, schedule: Optional[Schedule], frame_ms: int = FRAME_MS) -> None:
+        self._schedule = schedule
+        self.frame_ms = frame_ms
+        self._lock = threading.Lock()
+        # chiave -> (istante di invio, fn, args, kwargs)
+        self._pending: "OrderedDict[Any, Tuple[float, Callable, tuple, dict]]" = OrderedDict()
+        self._repaints: "OrderedDict[Any, Tuple[float, Callable, tuple, dict]]" = OrderedDict()
+        self._scheduled = False
+        self._seq = itertools.count()
+        self._stats = DispatcherStats()
+
+    def post(self, key: Any, fn: Callable, *args: Any, **kwargs: Any) -> None:
+        self._enqueue(self._pending, key, fn, args, kwargs)
+
+    def send(self, fn: Callable, *args: Any, **kwargs: Any) -> None:
+        self._enqueue(self._pending, ("evento", next(self._seq)), fn, args, kwargs)
+
+    def repaint(self, key: Any, fn: Callable, *args: Any, **kwargs: Any) -> None:
+        self._enqueue(self._repaints, key, fn, args, kwargs)
+
+    def _enqueue(self, queue: "OrderedDict", key: Any, fn: Callable, args: tuple, kwargs: dict) -> None:
+        if self._schedule is None:
+            self._run(time.perf_counter(), fn, args, kwargs)
+            return
+        with self._lock:
+            self._stats.posted += 1
+            if queue.pop(key, None) is not None:
+                self._stats.coalesced += 1
+            queue[key] = (time.perf_counter(), fn, args, kwargs)
+            depth = len(self._pending) + len(self._repaints)
+            self._stats.depth = depth
+            self._stats.max_depth = max(self._stats.max_depth, depth)
+            if self._scheduled:
+                return
+            self._scheduled = True
+        self._reschedule()
+
+    def _reschedule(self) -> None:
+        try:
+            self._schedule(self.frame_ms, self.flush)
+        except Exception:
+            # loop della UI non disponibile (finestra chiusa): si esegue subito
+            _log.debug("Pianificazione UI non riuscita, esecuzione diretta", exc_info=True)
+            self.flush()
+
+    def flush(self) -> None:
+        """Esegue sul thread della UI quanto accumulato: aggiornamenti e poi ridisegni."""
+        with self._lock:
+            pending, self._pending = self._pending, OrderedDict()
+            self._stats.frames += 1
+        for queued, fn, args, kwargs in pending.values():
+            self._run(queued, fn, args, kwargs)
+        # i ridisegni chiesti dagli aggiornamenti appena eseguiti rientrano in questo frame
+        with self._lock:
+            repaints, self._repaints = self._repaints, OrderedDict()
+        for queued, fn, args, kwargs in repaints.values():
+            self._run(queued, fn, args, kwargs)
+        with self._lock:
+            self._stats.depth = len(self._pending) + len(self._repaints)
+            again = self._scheduled = bool(self._stats.depth)
+        if again:  # arrivati dai thread di test durante l'esecuzione
+            self._reschedule()
+
+    def _run(self, queued: float, fn: Callable, args: tuple, kwargs: dict) -> None:
+        try:
+            fn(*args, **kwargs)
+        except Exception:
+            _log.exception("Errore nell'aggiornamento UI %s", getattr(fn, '__name__', fn))
+        latency = (time.perf_counter() - queued) * 1000.0
+        with self._lock:
+            self._stats.executed += 1
+            self._stats.last_latency_ms = latency
+            self._stats.max_latency_ms = max(self._stats.max_latency_ms, latency)
+            self._stats.total_latency_ms += latency
+
+    def stats(self) -> DispatcherStats:
+        with self._lock:
+            return DispatcherStats(**vars(self._stats))
@@ -7,6 +7,7 @@ import logging
 
 from ..app_controller import AppController
 from ..plotting.audiogram_plot import LiveAudiogram
+from .dispatcher import UIDispatcher
 from .theme import configure_style, get_logo_path, resource_path
 from ..export.pdf_report import build_pdf_report_v3 as build_pdf_report
 from ..version import __version__
@@ -160,9 +161,10 @@ class MainWindow:
         self.lbl_status.pack(pady=4)
 
         from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-        self.live_plot = LiveAudiogram(self.controller.settings["frequencies_hz"], title="Audiogramma LIVE")
+        self.live_plot = LiveAudiogram(self.controller.settings["frequencies_hz"], title="Audiogramma LIVE", blit=True)
         self.live_fig, _ = self.live_plot.figure()
         self.plot_canvas = FigureCanvasTkAgg(self.live_fig, master=self.tab_audio)
+        self.live_plot.attach(self.plot_canvas)
         self.plot_canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True, padx=10, pady=8)
         # Key bindings for manual mode
         self.root.bind("<Up>", lambda e: (self._log_key(e), self._kbd_move_level(+1)))
@@ -348,10 +350,7 @@ class MainWindow:
             self.controller.settings["isi_ms_min"] = int(isi_min*1000)
             self.controller.settings["isi_ms_max"] = int(isi_max*1000)
             # Persist immediatamente
-            import json
-            from ..paths import path_settings
-            with open(path_settings(), "w", encoding="utf-8") as f:
-                json.dump(self.controller.settings, f, indent=2)
+            self.controller.save_settings()
             messagebox.showinfo("OK", "Impostazioni applicate e salvate.")
         except Exception as e:
             messagebox.showerror("Errore", str(e))
@@ -392,15 +391,21 @@ class MainWindow:
         for c, t in [("name","Cognome Nome"),("id","ID"),("last","Ultimo esame")]:
             tree.heading(c, text=t)
         tree.grid(row=1, column=0, columnspan=3, padx=6, pady=6)
-        data = self.controller.list_saved_patients()
+        retry = {"id": None}
+        def retry_refresh():
+            retry["id"] = None
+            if win.winfo_exists():
+                refresh()
         def refresh():
-            q = var_q.get().strip().lower()
             for i in tree.get_children():
                 tree.delete(i)
-            for p in data:
-                label = (p.get("name") or "").lower()
-                if q and q not in label and q not in (p.get("id","").lower()):
-                    continue
+            if self.controller.patient_index_loading():
+                # indice ancora in costruzione: segnaposto e nuovo tentativo, senza bloccare la UI
+                tree.insert("", tk.END, values=("Caricamento indice...", "", ""))
+                if retry["id"] is None:
+                    retry["id"] = win.after(200, retry_refresh)
+                return
+            for p in self.controller.search_patients(var_q.get()):
                 tree.insert("", tk.END, values=(p.get("name") or "", p.get("id"), p.get("last_ts") or ""))
         refresh()
         def on_sel():
@@ -409,6 +414,8 @@ class MainWindow:
                 return
             item = tree.item(sel[0])
             pid = item["values"][1]
+            if not pid:
+                return
             idx = self.controller.load_patient_archive(pid)
             self.lbl_patient.config(text=self.controller.get_patient_display())
             for i in self.tree_arch.get_children():
@@ -637,7 +644,7 @@ class MainWindow:
     def _live_refresh_from_rows(self):
         rows = self.controller.get_results_rows()
         self.live_plot.update_rows(rows)
-        self.plot_canvas.draw()
+        self.live_plot.refresh()
 
     # -------- Helper --------
     def _calib_help_text(self):
@@ -682,9 +689,10 @@ class MainWindow:
 
         # Grafico dedicato alla calibrazione
         from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-        self.cal_live_plot = LiveAudiogram(self.controller.settings["frequencies_hz"], title="Audiogramma calibrazione")
+        self.cal_live_plot = LiveAudiogram(self.controller.settings["frequencies_hz"], title="Audiogramma calibrazione", blit=True)
         self.cal_live_fig, _ = self.cal_live_plot.figure()
         self.cal_plot_canvas = FigureCanvasTkAgg(self.cal_live_fig, master=self.tab_calib)
+        self.cal_live_plot.attach(self.cal_plot_canvas)
         self.cal_plot_canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True, padx=8, pady=6)
 
         frm_app = ttk.LabelFrame(self.tab_calib, text="Audiometria di calibrazione (APP)")
@@ -864,7 +872,7 @@ class MainWindow:
                 for f, db in (m.get(ear) or {}).items():
                     rows.append([self.controller.patient.get('id',''), '', ear, int(f), float(db)])
             self.cal_live_plot.update_rows(rows)
-            self.cal_plot_canvas.draw()
+            self.cal_live_plot.refresh()
         except Exception:
             pass
         finally:
@@ -938,7 +946,7 @@ class MainWindow:
                     rows.append([self.controller.patient.get('id',''), '', ear, int(f), float(db)])
         self.cal_live_plot.update_rows(rows)
         self.cal_live_plot.update_reference_map(self.calib_ref_map)
-        self.cal_plot_canvas.draw()
+        self.cal_live_plot.refresh()
         # Aggiorna tabelle bias
         self._refresh_bias_tables()
 
@@ -1145,31 +1153,37 @@ class MainWindow:
             messagebox.showerror("PDF", str(e))
 
 class UICallbacks:
+    # aggiornamenti di stato: nello stesso frame conta solo l'ultimo
+    COALESCED = frozenset({"manual_on_cursor", "manual_on_status", "on_level_changed", "on_frequency_started"})
+
     def __init__(self, win: 'MainWindow'):
         self.win = win
         try:
             self._after = self.win.root.after
         except Exception:
             self._after = None
+        self._dispatcher = UIDispatcher(self._after)
 
     def _call(self, fn, *args, **kwargs):
         """Schedule a UI update on Tk main thread (safe from worker threads)."""
-        try:
-            if self._after:
-                if getattr(self.win, 'debug_ui', False):
-                    try:
-                        name = getattr(fn, '__name__', '<callable>')
-                        self.win._logger.debug(f"UI dispatch scheduled: {name} args={args} kwargs={kwargs}")
-                    except Exception:
-                        pass
-                self._after(0, lambda: fn(*args, **kwargs))
-                return
-        except Exception:
-            pass
-        try:
-            fn(*args, **kwargs)
-        except Exception:
-            pass
+        name = getattr(fn, '__name__', '<callable>')
+        if self._after and getattr(self.win, 'debug_ui', False):
+            try:
+                self.win._logger.debug(f"UI dispatch scheduled: {name} args={args} kwargs={kwargs}")
+            except Exception:
+                pass
+        if name in self.COALESCED:
+            self._dispatcher.post(name, fn, *args, **kwargs)
+        else:
+            self._dispatcher.send(fn, *args, **kwargs)
+
+    def _repaint(self):
+        # un solo ridisegno per frame, dopo le etichette di stato
+        self._dispatcher.repaint("live_plot", self.win.live_plot.refresh)
+
+    def dispatch_stats(self):
+        """Profondita' della coda UI e latenze (audiometer.ui.dispatcher.DispatcherStats)."""
+        return self._dispatcher.stats()
 
     def ask_yes_no(self, question):
         return messagebox.askyesno("Conferma", question)
@@ -1181,19 +1195,19 @@ class UICallbacks:
     def on_test_started(self, ear):
         self.win.lbl_status.config(text=f"Test {ear}: in corso... (UP-only, verifica non consecutiva)")
         self.win.live_plot.clear_probe()
-        self.win.plot_canvas.draw()
+        self._repaint()
 
     def on_frequency_started(self, ear, freq):
         self.win.lbl_status.config(text=f"Test {ear} â€” Frequenza {freq} Hz")
         self.win.live_plot.set_current_freq(freq)
         self.win.live_plot.clear_probe()
-        self.win.plot_canvas.draw()
+        self._repaint()
 
     def on_level_changed(self, ear, freq, level_dbhl):
         self.win.lbl_status.config(text=f"Ascolta: {ear} {freq} Hz â€” {level_dbhl} dB HL (premi SPAZIO se lo SENTE)")
         self.win.live_plot.set_current_freq(freq)
         self.win.live_plot.set_probe(ear, freq, level_dbhl)
-        self.win.plot_canvas.draw()
+        self._repaint()
 
     def on_threshold_captured(self, ear, freq, level_dbhl):
         self.win.lbl_status.config(text=f"Soglia {ear} {freq} Hz: {level_dbhl} dB HL (2 conferme raggiunte)")
@@ -1202,7 +1216,13 @@ class UICallbacks:
     def on_test_finished(self, ear):
         self.win.lbl_status.config(text=f"Test {ear}: completato.")
         self.win.live_plot.clear_probe()
-        self.win.plot_canvas.draw()
+        self._repaint()
+        if getattr(self.win, 'debug_ui', False):
+            st = self.dispatch_stats()
+            self.win._logger.debug(
+                f"UI dispatch: {st.executed} eseguiti, {st.coalesced} accorpati, {st.frames} frame, "
+                f"coda max {st.max_depth}, latenza media {st.mean_latency_ms:.1f} ms (max {st.max_latency_ms:.1f} ms)"
+            )
 
     # Wizard callbacks rimossi
 
@@ -1211,7 +1231,7 @@ class UICallbacks:
         self.win.lbl_status.config(text=f"Manuale: {ear} {freq} Hz â€” {level} dB HL (loop attivo)")
         self.win.live_plot.set_current_freq(freq)
         self.win.live_plot.set_cursor(ear, freq, level)
-        self.win.plot_canvas.draw()
+        self._repaint()
 
     def manual_on_status(self, freq, level, ear):
         self.win.lbl_status.config(text=f"Manuale loop â€” {ear} {freq} Hz â€” {level} dB HL (SPAZIO: memorizza)")
@@ -0,0 +1,183 @@
+"""
+Audiogramma come array a forma fissa: riga 0 = orecchio destro (OD / R),
+riga 1 = sinistro (OS / L), una colonna per frequenza dell'asse; NaN = non misurata.
+"""
+from __future__ import annotations
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Asse frequenze condiviso (Hz)
+FREQS = [125, 250, 500, 750, 1000, 1500, 2000, 3000, 4000, 6000, 8000]
+
+RIGHT = 0
+LEFT = 1
+_EAR_INDEX = {"R": RIGHT, "OD": RIGHT, "L": LEFT, "OS": LEFT}
+
+
+def ear_index(ear: str) -> int:
+    try:
+        return _EAR_INDEX[str(ear).upper()]
+    except KeyError:
+        raise ValueError(f"Orecchio non valido: {ear!r}") from None
+
+
+@lru_cache(maxsize=32)
+def _slot_map(freqs: Tuple[int, ...]) -> Dict[int, int]:
+    return {f: i for i, f in enumerate(freqs)}
+
+
+def _row_fields(row: Any) -> Tuple[str, int, float]:
+    if isinstance(row, dict):
+        return row.get("ear"), int(row.get("freq")), float(row.get("dbhl"))
+    return row[2], int(row[3]), float(row[4])
+
+
+class Audiogram:
+    """Soglie dB HL di entrambi gli orecchi su un asse di frequenze fisso."""
+
+    __slots__ = ("freqs", "values")
+
+    def __init__(self, freqs: Iterable[int] = FREQS, values: Optional[np.ndarray] = None) -> None:
+        self.freqs: Tuple[int, ...] = tuple(int(f) for f in freqs)
+        if values is None:
+            values = np.full((2, len(self.freqs)), np.nan, dtype=np.float32)
+        elif values.shape != (2, len(self.freqs)):
+            raise ValueError("values deve avere forma (2, n_freqs)")
+        self.values = values
+
+    # ----- costruzione -----
+
+    @classmethod
+    def from_maps(cls, maps: Mapping[str, Mapping[Any, float]], freqs: Optional[Iterable[int]] = None) -> "Audiogram":
+        """Da {'R': {freq: db}, 'L': {...}} (o chiavi 'OD'/'OS', frequenze int o str)."""
+        items = []
+        for ear, values in (maps or {}).items():
+            if ear not in _EAR_INDEX or not values:
+                continue
+            for freq, db in values.items():
+                if db is None:
+                    continue
+                try:
+                    items.append((ear, int(freq), float(db)))
+                except (TypeError, ValueError):
+                    continue
+        return cls._from_items(items, freqs)
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Any], freqs: Optional[Iterable[int]] = None) -> "Audiogram":
+        """Da righe (pid, nome, ear, freq, dbhl) o dict {ear, freq, dbhl}; l'ultima misura vince."""
+        items = []
+        for row in rows or []:
+            try:
+                items.append(_row_fields(row))
+            except (TypeError, ValueError, IndexError):
+                continue
+        return cls._from_items(items, freqs)
+
+    @classmethod
+    def _from_items(cls, items: Sequence[Tuple[str, int, float]], freqs: Optional[Iterable[int]]) -> "Audiogram":
+        if freqs is None:
+            # asse comune esteso con eventuali frequenze fuori standard
+            freqs = sorted(set(FREQS).union(f for _, f, _ in items))
+        out = cls(freqs)
+        slots = out.slots
+        for ear, freq, db in items:
+            j = slots.get(freq)
+            if j is not None and ear in _EAR_INDEX:
+                out.values[_EAR_INDEX[ear], j] = db
+        return out
+
+    # ----- accesso -----
+
+    @property
+    def slots(self) -> Dict[int, int]:
+        return _slot_map(self.freqs)
+
+    @property
+    def mask(self) -> np.ndarray:
+        """True dove la soglia e' misurata."""
+        return ~np.isnan(self.values)
+
+    @property
+    def n_points(self) -> int:
+        return int(np.count_nonzero(self.mask))
+
+    def __bool__(self) -> bool:
+        return self.n_points > 0
+
+    def ear(self, ear: str) -> np.ndarray:
+        """Vista (senza copia) delle soglie di un orecchio."""
+        return self.values[ear_index(ear)]
+
+    def get(self, ear: str, freq: int) -> Optional[float]:
+        j = self.slots.get(int(freq))
+        if j is None:
+            return None
+        value = self.values[ear_index(ear), j]
+        return None if np.isnan(value) else float(value)
+
+    def set(self, ear: str, freq: int, db_hl: float) -> bool:
+        """Imposta una soglia; ritorna False se la frequenza non e' sull'asse."""
+        j = self.slots.get(int(freq))
+        if j is None:
+            return False
+        self.values[ear_index(ear), j] = db_hl
+        return True
+
+    def clear(self, ear: Optional[str] = None) -> None:
+        if ear is None:
+            self.values.fill(np.nan)
+        else:
+            self.values[ear_index(ear)].fill(np.nan)
+
+    def with_freqs(self, freqs: Iterable[int]) -> "Audiogram":
+        """Copia riportata su un altro asse (le frequenze assenti nel nuovo asse si perdono)."""
+        out = Audiogram(freqs)
+        src = self.slots
+        for j, f in enumerate(out.freqs):
+            i = src.get(f)
+            if i is not None:
+                out.values[:, j] = self.values[:, i]
+        return out
+
+    def copy(self) -> "Audiogram":
+        return Audiogram(self.freqs, self.values.copy())
+
+    # ----- viste per grafici, analisi, tabelle -----
+
+    def series(self, ear: str) -> Tuple[List[int], List[float]]:
+        """Punti misurati (frequenze, soglie) in ordine di asse, pronti per il plot."""
+        row = self.ear(ear)
+        idx = np.flatnonzero(~np.isnan(row))
+        return [self.freqs[j] for j in idx], row[idx].tolist()
+
+    def to_map(self, ear: str) -> Dict[int, float]:
+        xs, ys = self.series(ear)
+        return dict(zip(xs, ys))
+
+    def to_maps(self, keys: Tuple[str, str] = ("R", "L")) -> Dict[str, Dict[int, float]]:
+        return {keys[0]: self.to_map("R"), keys[1]: self.to_map("L")}
+
+    def rows(self, patient_id: Any = None, display_name: Any = None) -> List[Tuple[Any, Any, str, int, float]]:
+        out = []
+        for ear in ("R", "L"):
+            xs, ys = self.series(ear)
+            out.extend((patient_id, display_name, ear, f, db) for f, db in zip(xs, ys))
+        return out
+
+    def table_cells(self, ear: str, freqs: Optional[Iterable[int]] = None, missing: Any = "-") -> List[Any]:
+        """Valori per una riga di tabella (PDF, prompt): soglia o `missing` per ogni frequenza."""
+        out = []
+        for f in (self.freqs if freqs is None else freqs):
+            value = self.get(ear, f)
+            out.append(missing if value is None else value)
+        return out
+
+    def pta(self, ear: str, bands: Iterable[int] = (500, 1000, 2000)) -> float:
+        """Media delle soglie misurate nelle bande indicate (0.0 se nessuna)."""
+        vals = [v for v in (self.get(ear, f) for f in bands) if v is not None]
+        if not vals:
+            return 0.0
+        return sum(vals) / len(vals)
@@ -0,0 +1,259 @@
+"""
+Caricamento unico degli esami salvati, qualunque sia lo schema:
+
+- ``audiometry.v1`` (app Qt): mappe ``OD``/``OS`` con chiavi stringa;
+- payload Apps Script (app Tk): ``screening`` + ``soglie`` con ear R/L e ``hz``/``dbhl``;
+- payload integrazione legacy e varianti: ``thresholds``, ``orecchio``/``side``,
+  ``freq``/``frequency``, ``level``/``db``.
+
+Gli esami letti da disco passano per una cache LRU condivisa, con chiave
+path + mtime + dimensione: un file modificato viene riletto automaticamente.
+"""
+from __future__ import annotations
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+import datetime
+import json
+import os
+import threading
+
+# Incrementare quando cambia la normalizzazione (invalida le cache persistenti derivate)
+LOADER_VERSION = 1
+
+SCHEMA_V1 = "audiometry.v1"
+SCHEMA_APPS_SCRIPT = "apps_script"
+SCHEMA_LEGACY = "legacy"
+
+
+def parse_datetime(value: Any) -> Optional[datetime.datetime]:
+    if not value or not isinstance(value, str):
+        return None
+    try:
+        return datetime.datetime.fromisoformat(value)
+    except ValueError:
+        pass
+    try:
+        return datetime.datetime.strptime(value[:15], "%Y%m%d_%H%M%S")
+    except ValueError:
+        return None
+
+
+def _ear_key(value: Any) -> Optional[str]:
+    v = str(value or "").upper()
+    if v in ("R", "OD", "RIGHT", "DX"):
+        return "R"
+    if v in ("L", "OS", "LEFT", "SX"):
+        return "L"
+    return None
+
+
+def _first(d: Dict[str, Any], *keys: str) -> Any:
+    for key in keys:
+        value = d.get(key)
+        if value is not None:
+            return value
+    return None
+
+
+class Exam:
+    """Esame normalizzato. Le istanze sono condivise dalla cache: trattarle come immutabili."""
+
+    __slots__ = (
+        "path", "schema", "patient_id", "patient", "created_at", "device",
+        "headphone", "operator", "notes", "frequencies", "right", "left", "masked", "raw",
+    )
+
+    def __init__(self, path: str = "", schema: str = SCHEMA_LEGACY) -> None:
+        self.path = path
+        self.schema = schema
+        self.patient_id = ""
+        self.patient: Dict[str, Any] = {}
+        self.created_at: Optional[datetime.datetime] = None
+        self.device = ""
+        self.headphone = ""
+        self.operator = ""
+        self.notes = ""
+        self.frequencies: Tuple[int, ...] = ()
+        self.right: Dict[int, float] = {}
+        self.left: Dict[int, float] = {}
+        self.masked: Dict[str, frozenset] = {"R": frozenset(), "L": frozenset()}
+        # JSON originale, per chi deve riscriverlo o passarlo ai report
+        self.raw: Dict[str, Any] = {}
+
+    def ear(self, ear: str) -> Dict[int, float]:
+        """Soglie di un orecchio ('R'/'OD' oppure 'L'/'OS')."""
+        return self.right if _ear_key(ear) == "R" else self.left
+
+    @property
+    def label(self) -> str:
+        if self.created_at is not None:
+            return self.created_at.isoformat(timespec="seconds")
+        return os.path.splitext(os.path.basename(self.path))[0] or "Esame"
+
+    @property
+    def n_points(self) -> int:
+        return len(self.right) + len(self.left)
+
+    def to_od_os(self) -> Dict[str, Dict[int, float]]:
+        return {"OD": dict(self.right), "OS": dict(self.left)}
+
+    def to_rl(self) -> Dict[str, Dict[int, float]]:
+        return {"R": dict(self.right), "L": dict(self.left)}
+
+    def rows(self, patient_id: Any = None, display_name: Any = None) -> List[Tuple[Any, Any, str, int, float]]:
+        """Righe (pid, nome, ear, freq, dbhl) come le usa l'anteprima dell'app Tk."""
+        out = []
+        for ear, values in (("R", self.right), ("L", self.left)):
+            for freq in sorted(values):
+                out.append((patient_id, display_name, ear, freq, values[freq]))
+        return out
+
+
+def parse_exam(data: Dict[str, Any], path: str = "") -> Exam:
+    """Normalizza il contenuto JSON di un esame."""
+    screening = data.get("screening") if isinstance(data.get("screening"), dict) else None
+    if data.get("schema") == SCHEMA_V1 or (screening is None and isinstance(data.get("OD"), dict)):
+        schema = SCHEMA_V1
+    elif screening is not None and "soglie" in data:
+        schema = SCHEMA_APPS_SCRIPT
+    else:
+        schema = SCHEMA_LEGACY
+    exam = Exam(path, schema)
+    exam.raw = data
+
+    patient = data.get("patient") if isinstance(data.get("patient"), dict) else {}
+    exam.patient = dict(patient)
+    if screening is not None:
+        exam.patient_id = str(_first(screening, "patientId", "patient_id") or patient.get("id") or "")
+        exam.created_at = parse_datetime(screening.get("timestamp"))
+        exam.device = str(screening.get("device") or "")
+        exam.headphone = str(screening.get("headphoneId") or "")
+        exam.operator = str(screening.get("operator") or "")
+        exam.notes = str(data.get("analysis") or screening.get("note") or "")
+    else:
+        exam.patient_id = str(patient.get("id") or patient.get("patient_id") or "")
+        exam.created_at = parse_datetime(data.get("created_at"))
+        device = data.get("device")
+        headphone = data.get("headphone_id")
+        if isinstance(device, dict):
+            headphone = headphone or device.get("wasapi_id") or device.get("id")
+            device = device.get("name") or device.get("id")
+        exam.device = str(device or "")
+        exam.headphone = str(headphone or "")
+        exam.notes = str(data.get("notes") or data.get("analysis") or "")
+    if not exam.patient_id and path:
+        # .../<PID>/screenings/<ts>.json oppure .../audiometries/<PID>/YYYY/MM/<ts>.json
+        parts = os.path.normpath(path).split(os.sep)
+        if len(parts) >= 3 and parts[-2] == "screenings":
+            exam.patient_id = parts[-3]
+        elif len(parts) >= 4:
+            exam.patient_id = parts[-4]
+    if exam.created_at is None and path:
+        exam.created_at = parse_datetime(os.path.splitext(os.path.basename(path))[0])
+
+    right: Dict[int, float] = {}
+    left: Dict[int, float] = {}
+    masked: Dict[str, set] = {"R": set(), "L": set()}
+    for key, target in (("OD", right), ("OS", left)):
+        values = data.get(key)
+        if isinstance(values, dict):
+            for freq, db in values.items():
+                try:
+                    target[int(freq)] = float(db)
+                except (TypeError, ValueError):
+                    continue
+    for s in data.get("soglie") or data.get("thresholds") or []:
+        if not isinstance(s, dict):
+            continue
+        ear = _ear_key(_first(s, "ear", "orecchio", "side"))
+        freq = _first(s, "hz", "freq", "frequency")
+        db = _first(s, "dbhl", "level", "db")
+        if ear is None or freq is None or db is None:
+            continue
+        try:
+            freq, db = int(freq), float(db)
+        except (TypeError, ValueError):
+            continue
+        (right if ear == "R" else left)[freq] = db
+        if s.get("masked"):
+            masked[ear].add(freq)
+    exam.right, exam.left = right, left
+    exam.masked = {"R": frozenset(masked["R"]), "L": frozenset(masked["L"])}
+
+    freqs = data.get("frequencies_hz")
+    try:
+        exam.frequencies = tuple(int(f) for f in freqs) if freqs else tuple(sorted(set(right) | set(left)))
+    except (TypeError, ValueError):
+        exam.frequencies = tuple(sorted(set(right) | set(left)))
+    return exam
+
+
+def read_exam(path: str) -> Exam:
+    """Legge e normalizza un esame da disco senza cache. Solleva OSError/ValueError."""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if not isinstance(data, dict):
+        raise ValueError(f"{path}: formato esame non riconosciuto")
+    return parse_exam(data, path)
+
+
+class ExamCache:
+    """Cache LRU degli esami letti, con chiave path + (mtime_ns, size)."""
+
+    def __init__(self, maxsize: int = 256) -> None:
+        self.maxsize = maxsize
+        self._items: "OrderedDict[str, Tuple[Tuple[int, int], Exam]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, path: str) -> Exam:
+        key = os.path.abspath(path)
+        st = os.stat(key)
+        stamp = (st.st_mtime_ns, st.st_size)
+        with self._lock:
+            cached = self._items.get(key)
+            if cached is not None and cached[0] == stamp:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return cached[1]
+        exam = read_exam(path)
+        with self._lock:
+            self.misses += 1
+            self._items[key] = (stamp, exam)
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+        return exam
+
+    def peek(self, path: str) -> Optional[Exam]:
+        """Esame in cache se ancora valido, senza leggere il file."""
+        key = os.path.abspath(path)
+        with self._lock:
+            cached = self._items.get(key)
+        if cached is None:
+            return None
+        try:
+            st = os.stat(key)
+        except OSError:
+            return None
+        return cached[1] if cached[0] == (st.st_mtime_ns, st.st_size) else None
+
+    def invalidate(self, path: Optional[str] = None) -> None:
+        with self._lock:
+            if path is None:
+                self._items.clear()
+            else:
+                self._items.pop(os.path.abspath(path), None)
+
+
+_shared_cache = ExamCache()
+
+
+def shared_cache() -> ExamCache:
+    return _shared_cache
+
+
+def load_exam(path: str) -> Exam:
+    """Esame normalizzato da `path`, tramite la cache condivisa fra app Qt e Tk."""
+    return _shared_cache.get(path)
@@ -0,0 +1,146 @@
+from __future__ import annotations
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+import json
+import os
+import time
+import uuid
+
+JOURNAL_SUFFIX = ".wal"
+
+
+def journal_dir(base_dir: str) -> str:
+    """Cartella dei write-ahead log degli esami in corso (creata se manca)."""
+    folder = os.path.join(base_dir, "journal")
+    os.makedirs(folder, exist_ok=True)
+    return folder
+
+
+def _now_us() -> int:
+    return time.time_ns() // 1000
+
+
+class SessionJournal:
+    """
+    Write-ahead log append-only di un esame in corso.
+
+    Ogni punto memorizzato diventa una riga JSON scritta e sincronizzata su disco
+    prima di tornare al chiamante: dopo un crash l'esame si ricostruisce
+    rileggendo il file con `replay`. Il file viene rimosso quando l'esame e'
+    salvato (`complete`) o abbandonato volontariamente (`discard`).
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._handle = open(path, "a", encoding="utf-8")
+
+    @classmethod
+    def create(cls, folder: str, meta: Optional[Dict[str, Any]] = None) -> "SessionJournal":
+        os.makedirs(folder, exist_ok=True)
+        session_id = f"{time.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+        journal = cls(os.path.join(folder, f"{session_id}{JOURNAL_SUFFIX}"))
+        journal._write({"k": "begin", "session": session_id, "meta": meta or {}})
+        return journal
+
+    @property
+    def closed(self) -> bool:
+        return self._handle is None
+
+    def _write(self, record: Dict[str, Any]) -> None:
+        if self._handle is None:
+            return
+        record["t"] = _now_us()
+        self._handle.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+        self._handle.flush()
+        os.fsync(self._handle.fileno())
+
+    def append_point(self, ear: str, freq: int, db_hl: float) -> None:
+        self._write({"k": "pt", "ear": ear, "freq": int(freq), "db": float(db_hl)})
+
+    def append_clear(self) -> None:
+        self._write({"k": "clear"})
+
+    def close(self) -> None:
+        if self._handle is not None:
+            try:
+                self._handle.close()
+            finally:
+                self._handle = None
+
+    def complete(self) -> None:
+        """Esame salvato: il log non serve piu'."""
+        self.close()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+    discard = complete
+
+
+@dataclass
+class PendingSession:
+    """Esame non concluso ricostruito da un write-ahead log."""
+
+    path: str
+    session_id: str
+    meta: Dict[str, Any]
+    points: List[Tuple[str, int, float]] = field(default_factory=list)
+    started_us: int = 0
+    last_us: int = 0
+
+    def remove(self) -> None:
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+def replay(path: str) -> PendingSession:
+    """Rilegge un log; una riga finale troncata (crash durante la scrittura) viene ignorata."""
+    session = PendingSession(path=path, session_id=os.path.basename(path)[: -len(JOURNAL_SUFFIX)], meta={})
+    with open(path, "r", encoding="utf-8") as handle:
+        for line in handle:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            kind = record.get("k")
+            ts = int(record.get("t", 0))
+            if kind == "begin":
+                session.session_id = record.get("session") or session.session_id
+                session.meta = record.get("meta") or {}
+                session.started_us = ts
+            elif kind == "pt":
+                try:
+                    session.points.append((str(record["ear"]), int(record["freq"]), float(record["db"])))
+                except (KeyError, TypeError, ValueError):
+                    continue
+            elif kind == "clear":
+                session.points.clear()
+            session.last_us = max(session.last_us, ts)
+    return session
+
+
+def find_pending(folder: str) -> List[PendingSession]:
+    """
+    Elenca gli esami non salvati presenti in `folder`, dal piu' recente.
+    I log senza punti vengono eliminati.
+    """
+    if not os.path.isdir(folder):
+        return []
+    out: List[PendingSession] = []
+    for fn in os.listdir(folder):
+        if not fn.endswith(JOURNAL_SUFFIX):
+            continue
+        path = os.path.join(folder, fn)
+        try:
+            session = replay(path)
+        except OSError:
+            continue
+        if not session.points:
+            session.remove()
+            continue
+        out.append(session)
+    out.sort(key=lambda s: s.last_us, reverse=True)
+    return out
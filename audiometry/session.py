@@ -1,29 +1,45 @@
 from __future__ import annotations
-from typing import Dict
+from typing import Dict, Optional
 from datetime import datetime
 
 from calibration_loader.profiles import profile_hash
-
-FREQS = [125, 250, 500, 750, 1000, 1500, 2000, 3000, 4000, 6000, 8000]
+from audiometry.audiogram import Audiogram, FREQS
+from audiometry.journal import SessionJournal
 
 
 class AudiometrySession:
     """Tiene lo stato dell'esame corrente (punti OD/OS)."""
 
     def __init__(self) -> None:
-        self.points_od: Dict[int, float] = {}
-        self.points_os: Dict[int, float] = {}
+        self.audiogram = Audiogram(FREQS)
         self.notes: str = ""
+        self.journal: Optional[SessionJournal] = None
+        # mappe {freq: dB} per orecchio, ricostruite solo dopo un nuovo punto (sola lettura)
+        self._maps: Dict[str, Dict[int, float]] = {}
+
+    def _map(self, ear: str) -> Dict[int, float]:
+        cached = self._maps.get(ear)
+        if cached is None:
+            cached = self._maps[ear] = self.audiogram.to_map(ear)
+        return cached
+
+    @property
+    def points_od(self) -> Dict[int, float]:
+        return self._map("OD")
+
+    @property
+    def points_os(self) -> Dict[int, float]:
+        return self._map("OS")
 
     def add_point(self, ear: str, freq: int, db_hl: float) -> None:
         if freq not in FREQS:
             raise ValueError(f"Frequenza {freq} Hz non supportata.")
-        if ear == "OD":
-            self.points_od[freq] = float(db_hl)
-        elif ear == "OS":
-            self.points_os[freq] = float(db_hl)
-        else:
+        if ear not in ("OD", "OS"):
             raise ValueError("Ear deve essere 'OD' o 'OS'.")
+        self.audiogram.set(ear, freq, float(db_hl))
+        self._maps.pop(ear, None)
+        if self.journal is not None:
+            self.journal.append_point(ear, freq, db_hl)
 
     def to_dict(self, patient: Dict, device: Dict, profile: Dict) -> Dict:
         timestamp = datetime.utcnow().isoformat(timespec="seconds")
@@ -34,7 +50,7 @@ class AudiometrySession:
             "device": device,
             "calibration_profile": {"hash": profile_hash(profile)},
             "frequencies_hz": FREQS,
-            "OD": {str(k): v for k, v in sorted(self.points_od.items())},
-            "OS": {str(k): v for k, v in sorted(self.points_os.items())},
+            "OD": {str(k): v for k, v in self.points_od.items()},
+            "OS": {str(k): v for k, v in self.points_os.items()},
             "notes": self.notes,
         }
@@ -0,0 +1,399 @@
+"""
+Backup incrementale dei dati dell'applicazione (app Tk e Farmaudiometria/).
+
+Layout della cartella di backup:
+  snapshots/<YYYYmmdd_HHMMSS>.json  stato completo: per ogni file size, mtime_ns,
+                                    sha256 e il pacchetto che ne contiene il contenuto
+  chunks/<snapshot>_<nnn>.tar.zst   solo i contenuti nuovi, membri nominati per sha256
+                                    (.tar.gz se il modulo zstandard non e' installato)
+
+Ad ogni passaggio si confronta lo stato con l'ultimo snapshot: i file con size e
+mtime invariati non vengono riletti, quelli cambiati vengono firmati in un pool
+di thread e, se il contenuto non e' gia' presente in un pacchetto, impacchettati
+in pacchetti da circa `chunk_size` byte compressi in parallelo.
+Il ripristino verifica lo SHA-256 di ogni file prima di scriverlo.
+
+Uso: python -m backup.incremental create|restore|verify --dest DIR [--target DIR] [--snapshot NOME]
+"""
+from __future__ import annotations
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import IO, Any, Dict, Iterator, List, Optional, Tuple
+import argparse
+import datetime
+import hashlib
+import io
+import json
+import os
+import tarfile
+
+try:
+    import zstandard
+    _ZSTD_AVAILABLE = True
+except Exception:  # pragma: no cover - zstandard opzionale
+    _ZSTD_AVAILABLE = False
+
+SNAPSHOT_VERSION = 1
+SNAPSHOTS_DIR = "snapshots"
+CHUNKS_DIR = "chunks"
+DEFAULT_CHUNK_SIZE = 32 << 20
+_SKIP_SUFFIXES = (".tmp", ".lock")
+
+
+@dataclass
+class BackupReport:
+    snapshot: str = ""
+    files: int = 0
+    hashed: int = 0
+    packed: int = 0
+    packed_bytes: int = 0
+    chunks: List[str] = field(default_factory=list)
+
+
+@dataclass
+class RestoreReport:
+    restored: int = 0
+    errors: List[Tuple[str, str]] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+
+def default_sources(tk_appdata: Optional[str] = None, qt_appdata: Optional[str] = None) -> Dict[str, str]:
+    """Radici da salvare, per etichetta: 'tk' (dati app Tk) e 'qt' (Farmaudiometria/)."""
+    if tk_appdata is None:
+        from audiometer.paths import get_app_data_dir
+        tk_appdata = get_app_data_dir(False)
+    if qt_appdata is None:
+        qt_appdata = os.getenv("APPDATA") or os.path.expanduser("~")
+    return {"tk": tk_appdata, "qt": os.path.join(qt_appdata, "Farmaudiometria")}
+
+
+# ----- scansione e firma -----
+
+def _sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _sha256_or_none(path: str) -> Optional[str]:
+    try:
+        return _sha256(path)
+    except OSError:
+        return None
+
+
+def _scan(sources: Dict[str, str], exclude: str) -> Iterator[Tuple[str, str, os.stat_result]]:
+    """(chiave 'etichetta/percorso relativo', percorso, stat) di ogni file da salvare."""
+    exclude = os.path.abspath(exclude)
+    for label, root in sorted(sources.items()):
+        if not os.path.isdir(root):
+            continue
+        for dirpath, dirnames, files in os.walk(root):
+            dirnames[:] = sorted(d for d in dirnames if os.path.abspath(os.path.join(dirpath, d)) != exclude)
+            for fn in sorted(files):
+                if fn.endswith(_SKIP_SUFFIXES):
+                    continue
+                path = os.path.join(dirpath, fn)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                rel = os.path.relpath(path, root).replace(os.sep, "/")
+                yield f"{label}/{rel}", path, st
+
+
+# ----- snapshot -----
+
+def list_snapshots(dest: str) -> List[str]:
+    folder = os.path.join(dest, SNAPSHOTS_DIR)
+    if not os.path.isdir(folder):
+        return []
+    return sorted(fn[:-5] for fn in os.listdir(folder) if fn.endswith(".json"))
+
+
+def load_snapshot(dest: str, name: Optional[str] = None) -> Dict[str, Any]:
+    """Snapshot `name` (default: l'ultimo); vuoto se non ce ne sono."""
+    if name is None:
+        names = list_snapshots(dest)
+        if not names:
+            return {"version": SNAPSHOT_VERSION, "files": {}}
+        name = names[-1]
+    with open(os.path.join(dest, SNAPSHOTS_DIR, name + ".json"), "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if data.get("version") != SNAPSHOT_VERSION:
+        raise ValueError(f"Versione snapshot non supportata: {data.get('version')}")
+    return data
+
+
+def _write_json_atomic(path: str, data: Any) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, sort_keys=True)
+    os.replace(tmp, path)
+
+
+# ----- pacchetti -----
+
+def _chunk_suffix() -> str:
+    return ".tar.zst" if _ZSTD_AVAILABLE else ".tar.gz"
+
+
+def _open_chunk_writer(path: str) -> Tuple[IO[bytes], tarfile.TarFile]:
+    raw = open(path, "wb")
+    if path.endswith(".zst"):
+        stream = zstandard.ZstdCompressor(level=10).stream_writer(raw)
+        return stream, tarfile.open(fileobj=stream, mode="w|")
+    return raw, tarfile.open(fileobj=raw, mode="w:gz", compresslevel=6)
+
+
+def _open_chunk_reader(path: str) -> Tuple[IO[bytes], tarfile.TarFile]:
+    raw = open(path, "rb")
+    if path.endswith(".zst"):
+        if not _ZSTD_AVAILABLE:
+            raw.close()
+            raise RuntimeError("Pacchetto zstd: installare il modulo zstandard")
+        stream = zstandard.ZstdDecompressor().stream_reader(raw)
+        return stream, tarfile.open(fileobj=stream, mode="r|")
+    return raw, tarfile.open(fileobj=raw, mode="r:gz")
+
+
+def _pack_chunk(job: Tuple[str, List[Tuple[str, str]]]) -> Dict[str, str]:
+    """Scrive un pacchetto; ritorna {chiave: sha256} del contenuto effettivamente salvato."""
+    path, members = job
+    saved: Dict[str, str] = {}
+    seen = set()
+    tmp = path + ".tmp"
+    stream, tar = _open_chunk_writer(tmp)
+    try:
+        for key, src in members:
+            try:
+                with open(src, "rb") as f:
+                    data = f.read()
+            except OSError:
+                continue  # sparito nel frattempo: non entra nello snapshot
+            digest = hashlib.sha256(data).hexdigest()
+            saved[key] = digest
+            if digest in seen:
+                continue
+            seen.add(digest)
+            info = tarfile.TarInfo(digest)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+    finally:
+        tar.close()
+        stream.close()
+    os.replace(tmp, path)
+    return saved
+
+
+def create_backup(
+    dest: str,
+    sources: Optional[Dict[str, str]] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    workers: int = 4,
+    now: Optional[datetime.datetime] = None,
+) -> BackupReport:
+    """Nuovo snapshot in `dest`; impacchetta solo i contenuti non gia' presenti."""
+    sources = sources or default_sources()
+    now = now or datetime.datetime.now()
+    name = now.strftime("%Y%m%d_%H%M%S")
+    if name in list_snapshots(dest):
+        raise ValueError(f"Snapshot gia' esistente: {name}")
+    previous = load_snapshot(dest)["files"]
+    stored = {e["sha256"]: e["chunk"] for e in previous.values()}
+    report = BackupReport(snapshot=name)
+
+    files: Dict[str, Dict[str, Any]] = {}
+    to_hash: List[Tuple[str, str, os.stat_result]] = []
+    for key, path, st in _scan(sources, dest):
+        old = previous.get(key)
+        if old and old["size"] == st.st_size and old["mtime_ns"] == st.st_mtime_ns:
+            files[key] = dict(old)
+        else:
+            to_hash.append((key, path, st))
+
+    pool = ThreadPoolExecutor(max_workers=workers) if workers > 0 else None
+    try:
+        digests = list(pool.map(_sha256_or_none, (p for _, p, _ in to_hash)) if pool
+                       else map(_sha256_or_none, (p for _, p, _ in to_hash)))
+        report.hashed = len(to_hash)
+        pending: List[Tuple[str, str, os.stat_result]] = []
+        for (key, path, st), digest in zip(to_hash, digests):
+            if digest is None:
+                continue
+            entry = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": digest}
+            if digest in stored:
+                files[key] = dict(entry, chunk=stored[digest])
+            else:
+                files[key] = entry
+                pending.append((key, path, st))
+
+        jobs: List[Tuple[str, List[Tuple[str, str]]]] = []
+        size = 0
+        for key, path, st in pending:
+            if not jobs or size >= chunk_size:
+                chunk = f"{name}_{len(jobs):03d}{_chunk_suffix()}"
+                jobs.append((os.path.join(dest, CHUNKS_DIR, chunk), []))
+                size = 0
+            jobs[-1][1].append((key, path))
+            size += st.st_size
+        if jobs:
+            os.makedirs(os.path.join(dest, CHUNKS_DIR), exist_ok=True)
+        results = list(pool.map(_pack_chunk, jobs) if pool else map(_pack_chunk, jobs))
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    for (path, members), saved in zip(jobs, results):
+        chunk = os.path.basename(path)
+        report.chunks.append(chunk)
+        for key, _ in members:
+            if key not in saved:
+                files.pop(key, None)
+                continue
+            files[key]["sha256"] = saved[key]  # il file puo' essere cambiato dopo la firma
+            files[key]["chunk"] = chunk
+            report.packed += 1
+            report.packed_bytes += files[key]["size"]
+
+    _write_json_atomic(os.path.join(dest, SNAPSHOTS_DIR, name + ".json"), {
+        "version": SNAPSHOT_VERSION,
+        "created_at": now.isoformat(timespec="seconds"),
+        "sources": sources,
+        "files": files,
+    })
+    report.files = len(files)
+    return report
+
+
+# ----- ripristino e verifica -----
+
+def _read_chunk(job: Tuple[str, frozenset]) -> Tuple[Dict[str, bytes], Optional[str]]:
+    """Contenuti richiesti di un pacchetto, per sha256, gia' verificati."""
+    path, wanted = job
+    blobs: Dict[str, bytes] = {}
+    try:
+        stream, tar = _open_chunk_reader(path)
+        try:
+            for info in tar:
+                if info.name not in wanted:
+                    continue
+                data = tar.extractfile(info).read()
+                if hashlib.sha256(data).hexdigest() == info.name:
+                    blobs[info.name] = data
+        finally:
+            tar.close()
+            stream.close()
+    except Exception as exc:  # I/O, tar o decompressione: il pacchetto e' inutilizzabile da qui in poi
+        return blobs, str(exc)
+    return blobs, None
+
+
+def _iter_chunk_contents(dest: str, files: Dict[str, Dict[str, Any]], workers: int):
+    by_chunk: Dict[str, set] = {}
+    for entry in files.values():
+        by_chunk.setdefault(entry["chunk"], set()).add(entry["sha256"])
+    jobs = [(os.path.join(dest, CHUNKS_DIR, c), frozenset(w)) for c, w in sorted(by_chunk.items())]
+    if workers <= 0:
+        for job in jobs:
+            yield os.path.basename(job[0]), _read_chunk(job)
+        return
+    # al piu' workers*2 pacchetti in lettura o letti e non ancora consumati:
+    # la memoria resta limitata anche con migliaia di pacchetti
+    pending = iter(jobs)
+    in_flight: Dict[Any, str] = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        try:
+            while True:
+                for job in pending:
+                    in_flight[pool.submit(_read_chunk, job)] = os.path.basename(job[0])
+                    if len(in_flight) >= workers * 2:
+                        break
+                if not in_flight:
+                    return
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield in_flight.pop(future), future.result()
+        finally:
+            for future in in_flight:  # consumatore interrotto: niente letture inutili
+                future.cancel()
+
+
+def restore_backup(
+    dest: str,
+    target: Optional[str],
+    snapshot: Optional[str] = None,
+    workers: int = 4,
+) -> RestoreReport:
+    """
+    Ripristina lo snapshot in `target/<etichetta>/...`, scrivendo solo i file verificati.
+    Con `target=None` controlla soltanto che ogni file sia recuperabile.
+    """
+    files = load_snapshot(dest, snapshot)["files"]
+    report = RestoreReport()
+    keys_by_chunk: Dict[str, List[str]] = {}
+    for key, entry in files.items():
+        keys_by_chunk.setdefault(entry["chunk"], []).append(key)
+    for chunk, (blobs, error) in _iter_chunk_contents(dest, files, workers):
+        for key in sorted(keys_by_chunk[chunk]):
+            entry = files[key]
+            data = blobs.get(entry["sha256"])
+            if data is None:
+                report.errors.append((key, error or "contenuto mancante o alterato"))
+                continue
+            if target is None:
+                report.restored += 1
+                continue
+            out = os.path.join(target, *key.split("/"))
+            os.makedirs(os.path.dirname(out), exist_ok=True)
+            tmp = out + ".tmp"
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, out)
+            os.utime(out, ns=(entry["mtime_ns"], entry["mtime_ns"]))
+            report.restored += 1
+    return report
+
+
+def verify_backup(dest: str, snapshot: Optional[str] = None, workers: int = 4) -> RestoreReport:
+    """Come il ripristino ma senza scrivere: controlla che ogni file sia recuperabile."""
+    return restore_backup(dest, None, snapshot, workers)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Backup incrementale dei dati dell'applicazione")
+    parser.add_argument("command", choices=("create", "restore", "verify"))
+    parser.add_argument("--dest", required=True, help="cartella del backup")
+    parser.add_argument("--tk-appdata", default=None, help="cartella dati dell'app Tk (default: quella in uso)")
+    parser.add_argument("--qt-appdata", default=None, help="cartella che contiene Farmaudiometria/")
+    parser.add_argument("--target", default=None, help="cartella in cui ripristinare")
+    parser.add_argument("--snapshot", default=None, help="snapshot da ripristinare (default: l'ultimo)")
+    parser.add_argument("--chunk-mb", type=int, default=DEFAULT_CHUNK_SIZE >> 20)
+    parser.add_argument("--workers", type=int, default=4, help="thread (0 = sequenziale)")
+    args = parser.parse_args(argv)
+    if args.command == "create":
+        sources = default_sources(args.tk_appdata, args.qt_appdata)
+        rep = create_backup(args.dest, sources, chunk_size=args.chunk_mb << 20, workers=args.workers)
+        print(f"Snapshot {rep.snapshot}: {rep.files} file, {rep.hashed} firmati, "
+              f"{rep.packed} salvati ({rep.packed_bytes} byte) in {len(rep.chunks)} pacchetti")
+        return 0
+    if args.command == "restore":
+        if not args.target:
+            parser.error("--target e' obbligatorio per restore")
+        rep = restore_backup(args.dest, args.target, args.snapshot, workers=args.workers)
+    else:
+        rep = verify_backup(args.dest, args.snapshot, workers=args.workers)
+    for key, error in rep.errors:
+        print(f"ERRORE {key}: {error}")
+    print(f"File verificati: {rep.restored}, errori: {len(rep.errors)}")
+    return 0 if rep.ok else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,250 @@
+"""
+Impostazioni condivise dalle due app: modello tipizzato in memoria + servizio di persistenza.
+
+- il modello espone le impostazioni come attributi tipizzati (letture senza
+  dizionari nei percorsi caldi) e resta usabile come dict per il codice esistente;
+  le chiavi sconosciute sono conservate in `extra`;
+- ogni modifica notifica gli ascoltatori e pianifica una scrittura: le modifiche
+  ravvicinate vengono accorpate in un'unica scrittura dopo `delay` secondi;
+- la scrittura e' atomica (os.replace) e si fonde con quanto salvato nel
+  frattempo da altre istanze (audiometer.data_store.locking.save_merged);
+- modifiche e serializzazione passano per lo stesso lock: la scrittura
+  differita gira su un thread timer mentre la UI cambia le impostazioni;
+- un valore non convertibile (es. `"step_db": null`) lascia il predefinito.
+"""
+from __future__ import annotations
+from dataclasses import MISSING, dataclass, field, fields
+from typing import Any, Callable, Dict, Iterator, List, Optional
+import atexit
+import copy
+import logging
+import threading
+
+from audiometer.data_store.locking import read_json, save_merged
+
+DEFAULT_DELAY = 0.5
+
+_log = logging.getLogger(__name__)
+_MISSING = object()
+
+
+def _to_bool(value: Any) -> bool:
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes", "si", "on")
+    return bool(value)
+
+
+def _to_opt_str(value: Any) -> Optional[str]:
+    return None if value is None else str(value)
+
+
+_CASTS: Dict[str, Callable[[Any], Any]] = {
+    "int": int,
+    "float": float,
+    "bool": _to_bool,
+    "str": str,
+    "Optional[str]": _to_opt_str,
+    "List[int]": lambda v: [int(x) for x in v],
+    "Dict[str, Any]": dict,
+}
+
+
+@dataclass
+class SettingsModel:
+    """Base dei modelli: attributi tipizzati, accesso anche come dict, chiavi extra preservate."""
+
+    extra: Dict[str, Any] = field(default_factory=dict)
+
+    @classmethod
+    def _names(cls) -> Dict[str, str]:
+        names = cls.__dict__.get("_names_cache")
+        if names is None:
+            names = {f.name: str(f.type) for f in fields(cls) if f.name != "extra"}
+            cls._names_cache = names
+        return names
+
+    @classmethod
+    def _default(cls, key: str) -> Any:
+        for f in fields(cls):
+            if f.name == key:
+                return f.default_factory() if f.default is MISSING else f.default
+        raise KeyError(key)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "SettingsModel":
+        model = cls()
+        for key, value in (data or {}).items():
+            model._set(key, value)
+        return model
+
+    def _coerce(self, key: str, value: Any) -> Any:
+        type_name = self._names()[key]
+        if value is None:
+            return value if type_name.startswith("Optional") else self._default(key)
+        cast = _CASTS.get(type_name)
+        if cast is None:
+            return value
+        try:
+            return cast(value)
+        except (TypeError, ValueError) as exc:
+            _log.warning("Impostazione %s non valida (%r), uso il predefinito: %s", key, value, exc)
+            return self._default(key)
+
+    def _set(self, key: str, value: Any) -> bool:
+        """Assegna senza notificare; ritorna True se il valore e' cambiato."""
+        if key in self._names():
+            value = self._coerce(key, value)
+            old = getattr(self, key, _MISSING)
+            object.__setattr__(self, key, value)
+        else:
+            old = self.extra.get(key, _MISSING)
+            self.extra[key] = value
+        return old != value
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        if name in self._names():
+            self[name] = value
+        else:
+            object.__setattr__(self, name, value)
+
+    # ----- interfaccia dict -----
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self._names():
+            return getattr(self, key)
+        return self.extra[key]
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        lock = self.__dict__.get("_lock")
+        if lock is None:
+            changed = self._set(key, value)
+        else:
+            with lock:
+                changed = self._set(key, value)
+        if changed:
+            notify = self.__dict__.get("_on_change")
+            if notify is not None:
+                notify(key, self[key])
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._names() or key in self.extra
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.keys())
+
+    def keys(self) -> List[str]:
+        return list(self._names()) + list(self.extra)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        try:
+            value = self[key]
+        except KeyError:
+            return default
+        return default if value is None else value
+
+    def setdefault(self, key: str, default: Any = None) -> Any:
+        if key not in self or self[key] is None:
+            self[key] = default
+        return self[key]
+
+    def update(self, data: Dict[str, Any]) -> None:
+        for key, value in data.items():
+            self[key] = value
+
+    def to_dict(self) -> Dict[str, Any]:
+        out = {key: copy.deepcopy(getattr(self, key)) for key in self._names()}
+        out.update(copy.deepcopy(self.extra))
+        return out
+
+
+@dataclass
+class AudiometerSettings(SettingsModel):
+    """settings.json dell'app Tk (default come in audiometer/settings.json)."""
+
+    sample_rate: int = 48000
+    left_channel_index: int = 0
+    right_channel_index: int = 1
+    frequencies_hz: List[int] = field(default_factory=lambda: [125, 250, 500, 1000, 2000, 3000, 4000, 6000, 8000])
+    step_db: int = 5
+    min_level_dbhl: int = 0
+    start_level_dbhl: int = 40
+    max_level_dbhl: int = 100
+    tone_duration_ms: int = 1500
+    isi_ms_min: int = 1200
+    isi_ms_max: int = 2500
+    verification_max_cycles: int = 8
+    default_output_device: Optional[str] = None
+    enable_calibration: bool = True
+    debug_ui_events: bool = True
+    last_hp_id: Optional[str] = None
+    recompress_images: bool = False
+
+
+@dataclass
+class QtAppSettings(SettingsModel):
+    """Farmaudiometria/settings.json dell'app Qt."""
+
+    preferred_device_id: Optional[str] = None
+    calibrations: Dict[str, Any] = field(default_factory=dict)
+
+
+class SettingsService:
+    """Carica il modello da `path`, notifica le modifiche e le salva in differita."""
+
+    def __init__(self, path: str, model_cls: type = AudiometerSettings, delay: float = DEFAULT_DELAY) -> None:
+        self.path = path
+        self.delay = delay
+        self._lock = threading.RLock()
+        self._timer: Optional[threading.Timer] = None
+        self._listeners: List[Callable[[str, Any], None]] = []
+        try:
+            data, _rev = read_json(path, {})
+        except ValueError as exc:
+            _log.warning("%s illeggibile, uso i valori predefiniti: %s", path, exc)
+            data = {}
+        self.model = model_cls.from_dict(data)
+        # base della fusione: i valori predefiniti non contano come modifiche locali
+        self._base = self.model.to_dict()
+        self.model._on_change = self._changed
+        self.model._lock = self._lock  # condiviso con flush, che serializza da un altro thread
+        atexit.register(self.flush)
+
+    def subscribe(self, callback: Callable[[str, Any], None]) -> Callable[[], None]:
+        """callback(chiave, valore) a ogni modifica; ritorna la funzione per disiscriversi."""
+        self._listeners.append(callback)
+        return lambda: self._listeners.remove(callback) if callback in self._listeners else None
+
+    def _changed(self, key: str, value: Any) -> None:
+        for callback in list(self._listeners):
+            try:
+                callback(key, value)
+            except Exception:
+                _log.exception("Errore nell'ascoltatore delle impostazioni (%s)", key)
+        self.save()
+
+    def save(self) -> None:
+        """Pianifica la scrittura; le richieste entro `delay` secondi diventano una sola."""
+        if self.delay <= 0:
+            self.flush()
+            return
+        with self._lock:
+            if self._timer is not None:
+                return
+            self._timer = threading.Timer(self.delay, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self) -> bool:
+        """Scrive subito le modifiche in sospeso; ritorna True se il file e' stato scritto."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            data = self.model.to_dict()
+            if data == self._base:
+                return False
+            merged, _rev = save_merged(self.path, self._base, data, {})
+            for key, value in merged.items():  # chiavi salvate nel frattempo da altre istanze
+                self.model._set(key, value)
+            self._base = self.model.to_dict()
+            return True
@@ -0,0 +1,164 @@
+"""
+Audiogramma disegnato come grafica vettoriale ReportLab.
+
+Stesso aspetto di ui.audiogram_view (bande di perdita, griglia 10/5 dB, asse
+frequenze a passo costante, OD cerchio rosso, OS croce blu) ma senza Qt:
+nessun rendering raster, nessun file temporaneo, utilizzabile anche senza
+QApplication.
+"""
+from __future__ import annotations
+from typing import Dict, Mapping, Optional, Sequence
+
+from audiometry.audiogram import FREQS
+
+try:
+    from reportlab.lib.colors import HexColor, white
+    from reportlab.pdfgen import canvas
+except Exception:  # pragma: no cover - opzionale
+    pass
+
+DB_MIN = -10
+DB_MAX = 120
+# (da, a, colore, etichetta) come LOSS_REGIONS di ui.audiogram_view
+LOSS_REGIONS = [
+    (-10, 20, '#e8f5e9', 'Normale'),
+    (20, 40, '#fffde7', 'Lieve'),
+    (40, 70, '#ffe0b2', 'Moderata'),
+    (70, 90, '#ffcdd2', 'Grave'),
+    (90, 120, '#ef9a9a', 'Profonda'),
+]
+LOSS_REGION_OPACITY = 0.45
+AXIS_TEXT_COLOR = '#333333'
+AXIS_LINE_COLOR = '#b0bec5'
+GRID_ALPHA = 0.3
+EAR_COLORS = {'OD': '#d43f3a', 'OS': '#1f77b4'}
+
+_LEFT = 30      # spazio per le etichette dB
+_BOTTOM = 24    # spazio per le etichette di frequenza
+_TOP = 6
+_RIGHT = 6
+_MARKER = 3.5
+
+
+def _clean(mapping: Optional[Mapping], freqs: Sequence[int]) -> Dict[int, float]:
+    out: Dict[int, float] = {}
+    for freq, level in (mapping or {}).items():
+        try:
+            freq, level = int(freq), float(level)
+        except (TypeError, ValueError):
+            continue
+        if freq in freqs:
+            out[freq] = min(max(level, DB_MIN), DB_MAX)
+    return out
+
+
+def draw_audiogram(
+    c: "canvas.Canvas",
+    x: float,
+    y: float,
+    width: float,
+    height: float,
+    od_map: Optional[Mapping[int, float]] = None,
+    os_map: Optional[Mapping[int, float]] = None,
+    freqs: Optional[Sequence[int]] = None,
+) -> None:
+    """Disegna l'audiogramma nel riquadro con angolo in basso a sinistra (x, y)."""
+    freq_list = [int(f) for f in (freqs or FREQS)]
+    plot_x = x + _LEFT
+    plot_y = y + _BOTTOM
+    plot_w = max(width - _LEFT - _RIGHT, 1)
+    plot_h = max(height - _BOTTOM - _TOP, 1)
+    step = plot_w / len(freq_list)
+
+    def px(idx: int) -> float:
+        return plot_x + (idx + 0.5) * step
+
+    def py(db: float) -> float:
+        # asse invertito: DB_MIN in alto
+        return plot_y + plot_h * (DB_MAX - db) / (DB_MAX - DB_MIN)
+
+    c.saveState()
+
+    c.setFillAlpha(LOSS_REGION_OPACITY)
+    for low, high, color, _label in LOSS_REGIONS:
+        c.setFillColor(HexColor(color))
+        c.rect(plot_x, py(high), plot_w, py(low) - py(high), stroke=0, fill=1)
+    c.setFillAlpha(1)
+
+    grid = HexColor(AXIS_TEXT_COLOR)
+    c.setStrokeColor(grid)
+    c.setStrokeAlpha(GRID_ALPHA)
+    c.setLineWidth(0.4)
+    for db in range(DB_MIN, DB_MAX + 1, 10):
+        c.line(plot_x, py(db), plot_x + plot_w, py(db))
+    for idx in range(len(freq_list)):
+        c.line(px(idx), plot_y, px(idx), plot_y + plot_h)
+    c.setStrokeAlpha(1)
+
+    c.setStrokeColor(HexColor(AXIS_LINE_COLOR))
+    c.setLineWidth(0.8)
+    c.rect(plot_x, plot_y, plot_w, plot_h, stroke=1, fill=0)
+    c.setFillColor(HexColor(AXIS_TEXT_COLOR))
+    c.setFont("Helvetica", 7)
+    for db in range(DB_MIN, DB_MAX + 1, 5):
+        tick = 3 if db % 10 == 0 else 1.5
+        c.line(plot_x - tick, py(db), plot_x, py(db))
+        if db % 10 == 0:
+            c.drawRightString(plot_x - 4, py(db) - 2.5, str(db))
+    for idx, freq in enumerate(freq_list):
+        c.line(px(idx), plot_y - 3, px(idx), plot_y)
+        c.drawCentredString(px(idx), plot_y - 11, str(freq))
+    c.setFont("Helvetica", 8)
+    c.drawCentredString(plot_x + plot_w / 2, y + 2, "Frequenza (Hz)")
+    c.saveState()
+    c.translate(x + 8, plot_y + plot_h / 2)
+    c.rotate(90)
+    c.drawCentredString(0, 0, "Soglia (dB HL)")
+    c.restoreState()
+
+    legend = []
+    for ear, mapping in (('OD', od_map), ('OS', os_map)):
+        points = _clean(mapping, freq_list)
+        if not points:
+            continue
+        color = HexColor(EAR_COLORS[ear])
+        coords = [(px(freq_list.index(f)), py(points[f])) for f in sorted(points)]
+        c.setStrokeColor(color)
+        c.setLineWidth(1.4)
+        if len(coords) > 1:
+            path = c.beginPath()
+            path.moveTo(*coords[0])
+            for cx, cy in coords[1:]:
+                path.lineTo(cx, cy)
+            c.drawPath(path, stroke=1, fill=0)
+        for cx, cy in coords:
+            _draw_marker(c, ear, cx, cy)
+        legend.append(ear)
+
+    if legend:
+        lx = plot_x + 6
+        ly = plot_y + plot_h - 12
+        c.setFillColor(white)
+        c.setStrokeColor(HexColor(AXIS_LINE_COLOR))
+        c.setLineWidth(0.5)
+        c.rect(lx - 3, ly - 11 * (len(legend) - 1) - 4, 56, 11 * len(legend) + 2, stroke=1, fill=1)
+        c.setFont("Helvetica", 7)
+        for ear in legend:
+            c.setStrokeColor(HexColor(EAR_COLORS[ear]))
+            c.setLineWidth(1.4)
+            c.line(lx, ly, lx + 16, ly)
+            _draw_marker(c, ear, lx + 8, ly)
+            c.setFillColor(HexColor(AXIS_TEXT_COLOR))
+            c.drawString(lx + 21, ly - 2.5, 'OD (O)' if ear == 'OD' else 'OS (X)')
+            ly -= 11
+
+    c.restoreState()
+
+
+def _draw_marker(c: "canvas.Canvas", ear: str, cx: float, cy: float) -> None:
+    if ear == 'OD':
+        c.setFillColor(white)
+        c.circle(cx, cy, _MARKER, stroke=1, fill=1)
+    else:
+        c.line(cx - _MARKER, cy - _MARKER, cx + _MARKER, cy + _MARKER)
+        c.line(cx - _MARKER, cy + _MARKER, cx + _MARKER, cy - _MARKER)
@@ -1,5 +1,6 @@
 from __future__ import annotations
-from typing import Dict
+from typing import Dict, Mapping, Optional, Sequence, Union
+import io
 
 _REPORTLAB_AVAILABLE = True
 
@@ -11,12 +12,21 @@ try:
 except Exception:  # pragma: no cover - opzionale
     _REPORTLAB_AVAILABLE = False
 
+from .audiogram_vector import draw_audiogram
+
 
 def _ensure_reportlab() -> None:
     if not _REPORTLAB_AVAILABLE:
         raise RuntimeError("ReportLab non disponibile: installa il pacchetto 'reportlab'.")
 
 
+def _image_reader(png: Union[str, bytes]) -> "ImageReader":
+    """ImageReader da percorso o da byte PNG in memoria."""
+    if isinstance(png, (bytes, bytearray, memoryview)):
+        return ImageReader(io.BytesIO(bytes(png)))
+    return ImageReader(png)
+
+
 def _draw_box(c: "canvas.Canvas", title: str, text: str, x: float, y: float, width: float, height: float) -> None:
     c.rect(x, y - height, width, height, stroke=1, fill=0)
     c.setFont("Helvetica-Bold", 11)
@@ -38,11 +48,17 @@ def build_pdf_report_v3(
     exam: Dict,
     notes: str,
     esito_ai: str,
-    png_graph_path: str,
+    png_graph_path: Optional[Union[str, bytes]],
     table_text: str,
     ai_prompt: str,
+    od_map: Optional[Mapping[int, float]] = None,
+    os_map: Optional[Mapping[int, float]] = None,
+    freqs: Optional[Sequence[int]] = None,
 ) -> None:
-    """Genera un report PDF con grafico e note."""
+    """Genera un report PDF con grafico e note.
+
+    `png_graph_path` puo' essere un percorso o i byte PNG; senza, l'audiogramma e' disegnato in vettoriale da `od_map`/`os_map`.
+    """
     _ensure_reportlab()
 
     c = canvas.Canvas(out_pdf_path, pagesize=A4)
@@ -67,7 +83,10 @@ def build_pdf_report_v3(
 
     graph_height = 100 * mm
     graph_width = width - 2 * margin
-    c.drawImage(ImageReader(png_graph_path), margin, y - graph_height, graph_width, graph_height, preserveAspectRatio=True)
+    if png_graph_path:
+        c.drawImage(_image_reader(png_graph_path), margin, y - graph_height, graph_width, graph_height, preserveAspectRatio=True)
+    else:
+        draw_audiogram(c, margin, y - graph_height, graph_width, graph_height, od_map, os_map, freqs)
     y -= graph_height + 16
 
     table_height = 40 * mm
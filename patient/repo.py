@@ -2,6 +2,8 @@ from __future__ import annotations
 from typing import Optional, Dict, Any, List
 import os, json
 
+from .search import PatientSearchIndex
+
 class PatientRepo:
     """
     Gestisce persistenza degli assistiti in %APPDATA%/Farmaudiometria/patients/
@@ -9,11 +11,25 @@ class PatientRepo:
     def __init__(self, base_appdata: str) -> None:
         self.base = os.path.join(base_appdata, "Farmaudiometria", "patients")
         os.makedirs(self.base, exist_ok=True)
+        # costruito in background con warm(), poi aggiornato a ogni save
+        self.index = PatientSearchIndex(loader=self.list_all)
+
+    def warm(self) -> None:
+        self.index.warm()
+
+    @property
+    def index_loading(self) -> bool:
+        return self.index.loading
 
     def save(self, patient: Dict[str, Any]) -> None:
         path = os.path.join(self.base, f"{patient['id']}.json")
         with open(path, "w", encoding="utf-8") as f:
             json.dump(patient, f, ensure_ascii=False, indent=2)
+        self.index.add(patient)
+
+    def search(self, query: str, limit: int = 50) -> List[Dict[str, Any]]:
+        """Assistiti per cognome, nome, ID o data di nascita (anche con errori di battitura)."""
+        return self.index.search(query, limit=limit)
 
     def list_all(self) -> List[Dict[str, Any]]:
         items = []
@@ -0,0 +1,370 @@
+"""
+Indice di ricerca in memoria sugli assistiti (cognome, nome, ID, data di nascita).
+
+- ricerca per prefisso: array ordinato di (token, cognome, nome, id) + bisect:
+  un intervallo di prefisso e' gia' nell'ordine dei risultati;
+- ricerca approssimata: trigrammi dei token di cognome e nome (liste di
+  posting + conteggio vettoriale), usata quando i prefissi non bastano
+  (errori di battitura, lettere scambiate).
+
+L'indice si costruisce tramite `loader` in background con `warm` (o al piu'
+tardi alla prima ricerca) e poi viene aggiornato un assistito alla volta con
+`add` / `update` / `remove`.
+"""
+from __future__ import annotations
+from bisect import bisect_left, insort
+import heapq
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+import re
+import threading
+import unicodedata
+
+import numpy as np
+
+PatientRecord = Dict[str, Any]
+
+_NAME_FIELDS = ("cognome", "nome", "id", "birth_date")
+# somiglianza minima (Dice sui trigrammi) per i risultati approssimati
+_FUZZY_MIN_SCORE = 0.5
+
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+
+
+def normalize(text: Any) -> str:
+    """Minuscolo, senza accenti, solo lettere e cifre."""
+    value = str(text or "").lower()
+    if value.isascii():
+        return _NON_ALNUM.sub("", value)
+    value = unicodedata.normalize("NFKD", value)
+    return "".join(ch for ch in value if ch.isalnum())
+
+
+def _name_tokens(patient: PatientRecord) -> Set[str]:
+    out: Set[str] = set()
+    for key in ("cognome", "nome"):
+        value = str(patient.get(key) or "")
+        for word in value.replace("'", " ").split():
+            tok = normalize(word)
+            if tok:
+                out.add(tok)
+        whole = normalize(value)  # "De Luca" si trova anche come "deluca"
+        if whole:
+            out.add(whole)
+    return out
+
+
+def _tokens(patient: PatientRecord, names: Optional[Set[str]] = None) -> Set[str]:
+    out = set(_name_tokens(patient) if names is None else names)
+    pid = normalize(patient.get("id"))
+    if pid:
+        out.add(pid)
+    dob = str(patient.get("birth_date") or "")
+    if dob:
+        digits = normalize(dob)  # 1990-06-01 -> 19900601
+        if digits:
+            out.add(digits)
+            if len(digits) == 8 and "-" in dob:
+                out.add(digits[6:8] + digits[4:6] + digits[0:4])  # 01061990 (gg/mm/aaaa)
+    return out
+
+
+def _trigrams(token: str) -> Set[str]:
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _order_key(patient: PatientRecord, pid: str) -> Tuple[str, str, str]:
+    return normalize(patient.get("cognome")), normalize(patient.get("nome")), pid
+
+
+class PatientSearchIndex:
+    def __init__(self, loader: Optional[Callable[[], Iterable[PatientRecord]]] = None) -> None:
+        self._loader = loader
+        self._lock = threading.RLock()
+        self._built = False
+        self._warm_lock = threading.Lock()  # separato da _lock, tenuto durante la costruzione
+        self._warm_thread: Optional[threading.Thread] = None
+        self.records: Dict[str, PatientRecord] = {}
+        self._keys: List[Tuple[str, str, str, str]] = []    # (token, cognome, nome, id) ordinati
+        self._tokens_of: Dict[str, Set[str]] = {}
+        self._order: Dict[str, Tuple[str, str, str]] = {}   # id -> chiave di ordinamento
+        self._by_name: List[Tuple[Tuple[str, str, str], str]] = []  # elenco ordinato per cognome/nome
+        # ricerca approssimata: token di cognome/nome numerati, trigramma -> numeri dei token
+        self._name_ids: Dict[str, Set[str]] = {}
+        self._tok_index: Dict[str, int] = {}
+        self._tok_text: List[str] = []
+        self._tok_grams: List[int] = []
+        self._postings: Dict[str, List[int]] = {}
+        self._posting_arrays: Dict[str, np.ndarray] = {}
+        self._gram_sizes: Optional[np.ndarray] = None
+
+    # ----- costruzione / aggiornamento -----
+
+    @property
+    def built(self) -> bool:
+        return self._built
+
+    @property
+    def loading(self) -> bool:
+        """Costruzione in corso nel thread di `warm`: una ricerca adesso resterebbe in attesa."""
+        thread = self._warm_thread
+        return not self._built and thread is not None and thread.is_alive()
+
+    def warm(self) -> threading.Thread:
+        """Costruisce l'indice in un thread in background, per non pesare sulla prima ricerca."""
+        with self._warm_lock:
+            if self._warm_thread is None:
+                self._warm_thread = threading.Thread(
+                    target=self._ensure_built, name="patient-search-index", daemon=True
+                )
+                self._warm_thread.start()
+            return self._warm_thread
+
+    def _ensure_built(self) -> None:
+        if self._built:
+            return
+        with self._lock:
+            if self._built:
+                return
+            patients = list(self._loader()) if self._loader is not None else []
+            keys: List[Tuple[str, str, str, str]] = []
+            for patient in patients:
+                pid = str(patient.get("id") or "")
+                if not pid:
+                    continue
+                self.records[pid] = dict(patient)
+                names = _name_tokens(patient)
+                toks = _tokens(patient, names)
+                self._tokens_of[pid] = toks
+                order = self._order[pid] = _order_key(patient, pid)
+                keys.extend((tok,) + order for tok in toks)
+                self._add_names(pid, names)
+            keys.sort()
+            self._keys = keys
+            self._by_name = sorted((key, pid) for pid, key in self._order.items())
+            self._built = True
+
+    def _add_names(self, pid: str, names: Iterable[str]) -> None:
+        for tok in names:
+            ids = self._name_ids.get(tok)
+            if ids is None:
+                self._name_ids[tok] = ids = set()
+                if tok not in self._tok_index:
+                    self._register_token(tok)
+            ids.add(pid)
+
+    def _register_token(self, tok: str) -> None:
+        # i token non vengono mai rinumerati: quelli rimasti senza assistiti restano inerti
+        tid = len(self._tok_text)
+        self._tok_index[tok] = tid
+        self._tok_text.append(tok)
+        grams = _trigrams(tok)
+        self._tok_grams.append(len(grams))
+        cached = self._posting_arrays
+        for g in grams:
+            posting = self._postings.get(g)
+            if posting is None:
+                self._postings[g] = [tid]
+            else:
+                posting.append(tid)
+                if cached:
+                    cached.pop(g, None)
+
+    def _unindex(self, pid: str) -> None:
+        patient = self.records.get(pid)
+        order = self._order.pop(pid, None)
+        if order is not None:
+            for tok in self._tokens_of.pop(pid, ()):
+                key = (tok,) + order
+                i = bisect_left(self._keys, key)
+                if i < len(self._keys) and self._keys[i] == key:
+                    del self._keys[i]
+            i = bisect_left(self._by_name, (order, pid))
+            if i < len(self._by_name) and self._by_name[i] == (order, pid):
+                del self._by_name[i]
+        if patient is not None:
+            for tok in _name_tokens(patient):
+                ids = self._name_ids.get(tok)
+                if ids is not None:
+                    ids.discard(pid)
+                    if not ids:
+                        del self._name_ids[tok]
+
+    def add(self, patient: PatientRecord) -> None:
+        """
+        Inserisce o sostituisce un assistito. Prima della costruzione non fa nulla (lo leggera'
+        il loader); durante la costruzione in background attende che finisca.
+        """
+        pid = str(patient.get("id") or "")
+        if not pid:
+            return
+        with self._lock:
+            if not self._built:
+                return
+            self._unindex(pid)
+            self.records[pid] = dict(patient)
+            names = _name_tokens(patient)
+            toks = _tokens(patient, names)
+            self._tokens_of[pid] = toks
+            order = self._order[pid] = _order_key(patient, pid)
+            for tok in toks:
+                insort(self._keys, (tok,) + order)
+            insort(self._by_name, (order, pid))
+            self._add_names(pid, names)
+
+    def update(self, pid: str, **fields: Any) -> None:
+        """
+        Aggiorna campi di un assistito gia' indicizzato (reindicizza solo se cambiano i campi
+        cercabili). Un id sconosciuto viene ignorato: senza cognome e nome non sarebbe cercabile.
+        """
+        with self._lock:
+            if not self._built:
+                return
+            current = self.records.get(pid)
+            if current is None:
+                return
+            merged = dict(current, **fields)
+            if any(merged.get(k) != current.get(k) for k in _NAME_FIELDS):
+                self.add(merged)
+            else:
+                self.records[pid] = merged
+
+    def remove(self, pid: str) -> None:
+        with self._lock:
+            if not self._built:
+                return
+            self._unindex(pid)
+            self.records.pop(pid, None)
+
+    # ----- ricerca -----
+
+    def _range(self, term: str) -> Tuple[int, int]:
+        lo = bisect_left(self._keys, (term,))
+        return lo, bisect_left(self._keys, (term + "\uffff",), lo)
+
+    def _has_prefix(self, pid: str, term: str) -> bool:
+        return any(tok.startswith(term) for tok in self._tokens_of.get(pid, ()))
+
+    def _exact(self, terms: List[str], limit: int) -> List[str]:
+        """
+        Assistiti con un token che inizia per ciascun termine. Si scorre l'intervallo
+        del termine piu' selettivo, gia' ordinato per token trovato e poi cognome/nome.
+        """
+        ranges = {t: self._range(t) for t in terms}
+        driver = min(terms, key=lambda t: ranges[t][1] - ranges[t][0])
+        others = [t for t in terms if t != driver]
+        lo, hi = ranges[driver]
+        out: List[str] = []
+        seen: Set[str] = set()
+        keys = self._keys
+        for i in range(lo, hi):
+            pid = keys[i][3]
+            if pid in seen:
+                continue
+            seen.add(pid)
+            if all(self._has_prefix(pid, t) for t in others):
+                out.append(pid)
+                if len(out) >= limit:
+                    break
+        return out
+
+    def _posting_array(self, gram: str) -> Optional[np.ndarray]:
+        arr = self._posting_arrays.get(gram)
+        if arr is None:
+            posting = self._postings.get(gram)
+            if posting is None:
+                return None
+            arr = self._posting_arrays[gram] = np.asarray(posting, dtype=np.int32)
+        return arr
+
+    def _fuzzy_tokens(self, term: str) -> Iterator[Tuple[float, str]]:
+        """
+        Token di cognome/nome simili a `term` (coefficiente di Dice sui trigrammi),
+        dal piu' simile; a parita' di punteggio in ordine alfabetico.
+        """
+        grams = _trigrams(term)
+        arrays = [a for a in (self._posting_array(g) for g in grams) if a is not None]
+        if not arrays:
+            return
+        n_tok = len(self._tok_text)
+        if self._gram_sizes is None or len(self._gram_sizes) != n_tok:
+            self._gram_sizes = np.asarray(self._tok_grams, dtype=np.float32)
+        common = np.bincount(np.concatenate(arrays), minlength=n_tok)
+        dice = 2.0 * common / (len(grams) + self._gram_sizes)
+        hits = np.flatnonzero(dice >= _FUZZY_MIN_SCORE)
+        if not hits.size:
+            return
+        hits = hits[np.argsort(-dice[hits], kind="stable")]
+        scores = dice[hits]
+        # gruppi a pari punteggio: ordinati solo quando servono
+        bounds = np.flatnonzero(np.diff(scores)) + 1
+        text = self._tok_text
+        for group in np.split(hits, bounds):
+            score = float(dice[group[0]])
+            for tok in sorted(text[tid] for tid in group.tolist()):
+                yield score, tok
+
+    def _approximate(self, terms: List[str], limit: int, exclude: Set[str]) -> List[str]:
+        """Tutti i termini devono corrispondere, per prefisso o per somiglianza; ordinati per punteggio."""
+        order = self._order
+        fuzzy_terms = [t for t in terms if len(t) >= 3]
+        if not fuzzy_terms:
+            return []
+        if len(terms) == 1:
+            # un solo termine: i token arrivano gia' in ordine di risultato, ci si ferma a `limit`
+            out: List[str] = []
+            seen = set(exclude)
+            for _, tok in self._fuzzy_tokens(terms[0]):
+                ids = [pid for pid in self._name_ids.get(tok, ()) if pid not in seen]
+                ids = heapq.nsmallest(limit - len(out), ids, key=order.__getitem__)
+                seen.update(ids)
+                out.extend(ids)
+                if len(out) >= limit:
+                    break
+            return out
+        # piu' termini: quelli con corrispondenze per prefisso restano esatti, si cercano
+        # per somiglianza solo gli altri (le parole scritte male)
+        ranges = {t: self._range(t) for t in terms}
+        missing = [t for t in terms if ranges[t][0] == ranges[t][1]]
+        if not missing or any(t not in fuzzy_terms for t in missing):
+            return []
+        candidates: Optional[Set[str]] = None
+        for t in sorted((t for t in terms if t not in missing), key=lambda t: ranges[t][1] - ranges[t][0]):
+            lo, hi = ranges[t]
+            ids = {key[3] for key in self._keys[lo:hi]}
+            candidates = ids if candidates is None else candidates & ids
+            if not candidates:
+                return []
+        similar: Dict[str, Dict[str, float]] = {}
+        for t in missing:
+            scores = similar[t] = {tok: score for score, tok in self._fuzzy_tokens(t)}
+            ids = set()
+            for tok in scores:
+                ids.update(self._name_ids.get(tok, ()))
+            candidates = ids if candidates is None else candidates & ids
+            if not candidates:
+                return []
+        totals: Dict[str, float] = {}
+        for pid in candidates - exclude:
+            toks = self._tokens_of[pid]
+            totals[pid] = len(terms) - len(similar) + sum(
+                max(scores.get(x, 0.0) for x in toks) for scores in similar.values()
+            )
+        return heapq.nsmallest(limit, totals, key=lambda pid: (-totals[pid], order[pid]))
+
+    def search(self, query: str, limit: int = 50, fuzzy: bool = True) -> List[PatientRecord]:
+        """
+        Assistiti che corrispondono a tutte le parole di `query` (per prefisso);
+        se non bastano a riempire `limit`, aggiunge i risultati approssimati.
+        """
+        self._ensure_built()
+        # le date si scrivono senza spazi: 01/06/1990 -> 01061990, 1990-06-01 -> 19900601
+        terms = [normalize(t) for t in str(query or "").split()]
+        terms = list(dict.fromkeys(t for t in terms if t))
+        with self._lock:
+            if not terms:
+                return [self.records[pid] for _, pid in self._by_name[:limit]]
+            ranked = self._exact(terms, limit)
+            if fuzzy and len(ranked) < limit:
+                ranked.extend(self._approximate(terms, limit - len(ranked), set(ranked)))
+            return [self.records[pid] for pid in ranked]
@@ -0,0 +1,59 @@
+from __future__ import annotations
+from typing import Iterator, Optional
+import datetime
+import os
+
+from audiometry.exam_loader import Exam, parse_datetime, read_exam
+
+
+def qt_exam_files(base_appdata: str) -> Iterator[str]:
+    """Esami dell'app Qt: <appdata>/Farmaudiometria/audiometries/<id>/YYYY/MM/*.json"""
+    root = os.path.join(base_appdata, "Farmaudiometria", "audiometries")
+    if not os.path.isdir(root):
+        return
+    for dirpath, _, files in os.walk(root):
+        for fn in sorted(files):
+            if fn.endswith(".json"):
+                yield os.path.join(dirpath, fn)
+
+
+def tk_exam_files(app_data_dir: str) -> Iterator[str]:
+    """Esami dell'app Tk: <app_data_dir>/patients/<PID>/screenings/*.json"""
+    root = os.path.join(app_data_dir, "patients")
+    if not os.path.isdir(root):
+        return
+    for pid in sorted(os.listdir(root)):
+        folder = os.path.join(root, pid, "screenings")
+        if not os.path.isdir(folder):
+            continue
+        for fn in sorted(os.listdir(folder)):
+            if fn.endswith(".json"):
+                yield os.path.join(folder, fn)
+
+
+def exam_patient_id(path: str) -> str:
+    """ID assistito ricavato dal percorso del file, senza leggerlo."""
+    parts = os.path.normpath(path).split(os.sep)
+    if len(parts) >= 3 and parts[-2] == "screenings":
+        return parts[-3]
+    return parts[-4] if len(parts) >= 4 else ""
+
+
+def exam_file_date(path: str) -> Optional[datetime.datetime]:
+    """Data dal nome del file (YYYYMMDD_HHMMSS.json, ora locale del salvataggio)."""
+    return parse_datetime(os.path.splitext(os.path.basename(path))[0])
+
+
+def iter_archive_exams(qt_appdata: Optional[str] = None, tk_appdata: Optional[str] = None) -> Iterator[Exam]:
+    """Scorre gli esami di entrambi gli archivi, normalizzati dal loader comune (file illeggibili saltati)."""
+    sources = []
+    if qt_appdata:
+        sources.append(qt_exam_files(qt_appdata))
+    if tk_appdata:
+        sources.append(tk_exam_files(tk_appdata))
+    for files in sources:
+        for path in files:
+            try:
+                yield read_exam(path)
+            except (OSError, ValueError):
+                continue
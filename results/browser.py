@@ -3,6 +3,9 @@ from typing import List, Dict, Optional
 import os
 import json
 import datetime
+import logging
+
+_log = logging.getLogger(__name__)
 
 
 def _parse_created_at(value: Optional[str]) -> float:
@@ -31,7 +34,8 @@ def list_patient_exams(base_appdata: str, patient_id: str) -> List[Dict]:
             try:
                 with open(path, "r", encoding="utf-8") as f:
                     data = json.load(f)
-            except (OSError, json.JSONDecodeError):
+            except (OSError, json.JSONDecodeError) as exc:
+                _log.warning("Esame illeggibile ignorato %s: %s (verifica con python -m results.integrity)", path, exc)
                 continue
             entry = {
                 "path": path,
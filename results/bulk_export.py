@@ -0,0 +1,250 @@
+"""
+Esportazione in blocco dell'archivio esami (app Qt e Tk) in NDJSON oppure in
+CSV "largo", con una colonna per orecchio x frequenza.
+
+Lavora in streaming con memoria costante, come catena di generatori:
+elenco file -> filtro sul percorso (assistito, data nel nome file) ->
+lettura con read-ahead su thread, a finestra limitata -> filtro sull'esame
+-> scrittura. Con gzip l'uscita viene compressa al volo.
+
+Uso: python -m results.bulk_export --tk-appdata DIR --format csv --out esami.csv.gz --from 2024-01-01
+"""
+from __future__ import annotations
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import IO, Any, Dict, FrozenSet, Iterable, Iterator, List, Optional, Sequence
+import argparse
+import csv
+import datetime
+import gzip
+import json
+import os
+import sys
+
+from audiometry.audiogram import FREQS
+from audiometry.exam_loader import Exam, read_exam
+from results.archive import exam_file_date, exam_patient_id, qt_exam_files, tk_exam_files
+
+FORMATS = ("ndjson", "csv")
+BASE_COLUMNS = ("patient_id", "created_at", "device", "headphone", "operator", "schema", "path")
+# il nome file e' in ora locale, created_at puo' essere UTC: il prefiltro sul percorso tiene un margine
+_PATH_DATE_SLACK = datetime.timedelta(days=1)
+
+
+@dataclass
+class ExportFilter:
+    """Filtri dell'esportazione; date incluse, assistiti e cuffie senza distinzione maiuscole/minuscole."""
+
+    date_from: Optional[datetime.date] = None
+    date_to: Optional[datetime.date] = None
+    patients: FrozenSet[str] = field(default_factory=frozenset)
+    headphones: FrozenSet[str] = field(default_factory=frozenset)
+
+    def __post_init__(self) -> None:
+        self.patients = frozenset(str(p).upper() for p in self.patients)
+        self.headphones = frozenset(str(h).lower() for h in self.headphones)
+
+    def _in_range(self, day: datetime.date, slack: datetime.timedelta = datetime.timedelta(0)) -> bool:
+        if self.date_from is not None and day < self.date_from - slack:
+            return False
+        if self.date_to is not None and day > self.date_to + slack:
+            return False
+        return True
+
+    def accepts_path(self, path: str) -> bool:
+        """Scarta senza aprire il file cio' che il percorso basta a escludere."""
+        if self.patients and exam_patient_id(path).upper() not in self.patients:
+            return False
+        stamp = exam_file_date(path)
+        return stamp is None or self._in_range(stamp.date(), _PATH_DATE_SLACK)
+
+    def accepts(self, exam: Exam) -> bool:
+        if self.patients and exam.patient_id.upper() not in self.patients:
+            return False
+        if self.headphones and not ({exam.headphone.lower(), exam.device.lower()} & self.headphones):
+            return False
+        if self.date_from is not None or self.date_to is not None:
+            if exam.created_at is None or not self._in_range(exam.created_at.date()):
+                return False
+        return True
+
+
+# ----- lettura -----
+
+def iter_exam_paths(qt_appdata: Optional[str] = None, tk_appdata: Optional[str] = None) -> Iterator[str]:
+    if qt_appdata:
+        yield from qt_exam_files(qt_appdata)
+    if tk_appdata:
+        yield from tk_exam_files(tk_appdata)
+
+
+def _read(path: str) -> Optional[Exam]:
+    try:
+        return read_exam(path)
+    except (OSError, ValueError):
+        return None
+
+
+def _read_ahead(paths: Iterable[str], workers: int, window: int) -> Iterator[Optional[Exam]]:
+    """Legge in parallelo mantenendo l'ordine, con al massimo `window` file in volo."""
+    if workers <= 0:
+        yield from map(_read, paths)
+        return
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending: deque = deque()
+        for path in paths:
+            pending.append(pool.submit(_read, path))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def iter_exams(
+    qt_appdata: Optional[str] = None,
+    tk_appdata: Optional[str] = None,
+    flt: Optional[ExportFilter] = None,
+    workers: int = 4,
+    window: int = 64,
+) -> Iterator[Exam]:
+    """Esami di entrambi gli archivi che passano il filtro (file illeggibili saltati), senza cache."""
+    flt = flt or ExportFilter()
+    paths = (p for p in iter_exam_paths(qt_appdata, tk_appdata) if flt.accepts_path(p))
+    for exam in _read_ahead(paths, workers, window):
+        if exam is not None and flt.accepts(exam):
+            yield exam
+
+
+# ----- scrittura -----
+
+def exam_record(exam: Exam) -> Dict[str, Any]:
+    return {
+        "patient_id": exam.patient_id,
+        "created_at": exam.created_at.isoformat() if exam.created_at else None,
+        "device": exam.device,
+        "headphone": exam.headphone,
+        "operator": exam.operator,
+        "schema": exam.schema,
+        "path": exam.path,
+        "patient": exam.patient,
+        "thresholds": {
+            "R": {str(f): exam.right[f] for f in sorted(exam.right)},
+            "L": {str(f): exam.left[f] for f in sorted(exam.left)},
+        },
+        "masked": {"R": sorted(exam.masked["R"]), "L": sorted(exam.masked["L"])},
+        "notes": exam.notes,
+    }
+
+
+def csv_header(freqs: Sequence[int] = FREQS) -> List[str]:
+    return list(BASE_COLUMNS) + [f"{ear}_{f}" for ear in ("R", "L") for f in freqs] + ["masked", "notes"]
+
+
+def csv_row(exam: Exam, freqs: Sequence[int] = FREQS) -> List[Any]:
+    row: List[Any] = [
+        exam.patient_id,
+        exam.created_at.isoformat() if exam.created_at else "",
+        exam.device, exam.headphone, exam.operator, exam.schema, exam.path,
+    ]
+    for values in (exam.right, exam.left):
+        row.extend("" if values.get(f) is None else values[f] for f in freqs)
+    masked = [f"{ear}{f}" for ear in ("R", "L") for f in sorted(exam.masked[ear])]
+    row.append(" ".join(masked))
+    row.append(exam.notes)
+    return row
+
+
+def write_ndjson(exams: Iterable[Exam], out: IO[str]) -> int:
+    count = 0
+    dumps = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+    for exam in exams:
+        out.write(dumps(exam_record(exam)))
+        out.write("\n")
+        count += 1
+    return count
+
+
+def write_csv(exams: Iterable[Exam], out: IO[str], freqs: Sequence[int] = FREQS) -> int:
+    writer = csv.writer(out)
+    writer.writerow(csv_header(freqs))
+    count = 0
+    for exam in exams:
+        writer.writerow(csv_row(exam, freqs))
+        count += 1
+    return count
+
+
+def _open_text(path: str, compress: bool) -> IO[str]:
+    if compress:
+        return gzip.open(path, "wt", encoding="utf-8", newline="", compresslevel=6)
+    return open(path, "w", encoding="utf-8", newline="", buffering=1 << 20)
+
+
+def export(
+    out_path: str,
+    fmt: str = "ndjson",
+    qt_appdata: Optional[str] = None,
+    tk_appdata: Optional[str] = None,
+    flt: Optional[ExportFilter] = None,
+    compress: Optional[bool] = None,
+    freqs: Sequence[int] = FREQS,
+    workers: int = 4,
+) -> int:
+    """
+    Esporta gli esami filtrati in `out_path` ("-" = stdout); ritorna il numero di esami.
+    `compress=None` attiva gzip se il nome termina in .gz. Il file compare solo a esportazione completata.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Formato non supportato: {fmt}")
+    if compress is None:
+        compress = out_path.endswith(".gz")
+    exams = iter_exams(qt_appdata, tk_appdata, flt, workers=workers)
+
+    def _write(out: IO[str]) -> int:
+        return write_csv(exams, out, freqs) if fmt == "csv" else write_ndjson(exams, out)
+
+    if out_path == "-":
+        if not compress:
+            return _write(sys.stdout)
+        with gzip.open(sys.stdout.buffer, "wt", encoding="utf-8", newline="") as out:
+            return _write(out)
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    tmp = out_path + ".tmp"
+    try:
+        with _open_text(tmp, compress) as out:
+            count = _write(out)
+        os.replace(tmp, out_path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+    return count
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Esporta tutti gli esami in NDJSON o CSV")
+    parser.add_argument("--qt-appdata", default=os.getenv("APPDATA"), help="cartella che contiene Farmaudiometria/")
+    parser.add_argument("--tk-appdata", default=None, help="cartella dati dell'app Tk (contiene patients/)")
+    parser.add_argument("--format", choices=FORMATS, default="ndjson")
+    parser.add_argument("--out", default="-", help="file di uscita ('-' = stdout; .gz = compresso)")
+    parser.add_argument("--gzip", action="store_true", help="comprimi anche senza estensione .gz")
+    parser.add_argument("--from", dest="date_from", type=datetime.date.fromisoformat, default=None)
+    parser.add_argument("--to", dest="date_to", type=datetime.date.fromisoformat, default=None)
+    parser.add_argument("--patient", action="append", default=[], help="ID assistito (ripetibile)")
+    parser.add_argument("--headphone", action="append", default=[], help="ID o nome cuffia (ripetibile)")
+    parser.add_argument("--workers", type=int, default=4, help="thread di lettura (0 = sequenziale)")
+    args = parser.parse_args(argv)
+    flt = ExportFilter(args.date_from, args.date_to, frozenset(args.patient), frozenset(args.headphone))
+    count = export(
+        args.out, args.format, args.qt_appdata, args.tk_appdata, flt,
+        compress=True if args.gzip else None, workers=args.workers,
+    )
+    print(f"{count} esami esportati", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,236 @@
+"""
+Archivio delle immagini (PNG degli audiogrammi) indirizzato per contenuto.
+
+Ogni immagine e' salvata una sola volta in `objects/<aa>/<sha256>.png`; le voci
+di index.json la richiamano con `image` (percorso del blob) e `image_sha256`.
+Il conteggio dei riferimenti (`refs.json`) si aggiorna sotto il lock del file
+(piu' istanze dell'app possono salvare insieme); `rebuild_refs` lo ricalcola dagli
+indici, che restano la fonte di verita', e `gc` elimina i blob rimasti a zero.
+
+Con `recompress=True` (e Pillow disponibile) il PNG viene ricodificato senza
+perdita con compressione massima prima di calcolare l'hash.
+
+Uso: python -m results.image_store migrate|gc --tk-appdata DIR [--recompress]
+"""
+from __future__ import annotations
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+import argparse
+import hashlib
+import io
+import json
+import os
+
+from audiometer.data_store.locking import FileLock, read_json, update_json
+
+try:
+    from PIL import Image
+    _PIL_AVAILABLE = True
+except Exception:  # pragma: no cover - Pillow opzionale
+    _PIL_AVAILABLE = False
+
+IMAGE_SUFFIX = ".png"
+REFS_NAME = "refs.json"
+
+
+def recompress_png(data: bytes) -> bytes:
+    """Ricodifica senza perdita; ritorna l'originale se non si guadagna spazio o manca Pillow."""
+    if not _PIL_AVAILABLE:
+        return data
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            buf = io.BytesIO()
+            img.save(buf, format="PNG", optimize=True)
+    except Exception:
+        return data
+    out = buf.getvalue()
+    return out if len(out) < len(data) else data
+
+
+class ImageStore:
+    def __init__(self, root: str, recompress: bool = False) -> None:
+        self.root = root
+        self.recompress = recompress
+
+    # ----- blob -----
+
+    def path(self, digest: str) -> str:
+        return os.path.join(self.root, "objects", digest[:2], digest + IMAGE_SUFFIX)
+
+    def exists(self, digest: str) -> bool:
+        return os.path.isfile(self.path(digest))
+
+    def put_bytes(self, data: bytes) -> str:
+        """Salva l'immagine se non e' gia' presente; ritorna lo SHA-256 del contenuto salvato."""
+        if self.recompress:
+            data = recompress_png(data)
+        digest = hashlib.sha256(data).hexdigest()
+        target = self.path(digest)
+        if not os.path.isfile(target):
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            tmp = f"{target}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, target)
+        return digest
+
+    def put_file(self, path: str) -> str:
+        with open(path, "rb") as f:
+            return self.put_bytes(f.read())
+
+    def get_bytes(self, digest: str) -> bytes:
+        with open(self.path(digest), "rb") as f:
+            return f.read()
+
+    def iter_digests(self) -> Iterator[str]:
+        objects = os.path.join(self.root, "objects")
+        if not os.path.isdir(objects):
+            return
+        for sub in sorted(os.listdir(objects)):
+            folder = os.path.join(objects, sub)
+            if not os.path.isdir(folder):
+                continue
+            for fn in sorted(os.listdir(folder)):
+                if fn.endswith(IMAGE_SUFFIX):
+                    yield fn[: -len(IMAGE_SUFFIX)]
+
+    # ----- riferimenti -----
+
+    def _refs_path(self) -> str:
+        return os.path.join(self.root, REFS_NAME)
+
+    def _read_refs(self) -> Dict[str, int]:
+        # sempre dal disco: un'altra istanza puo' averlo aggiornato
+        try:
+            data, _rev = read_json(self._refs_path(), {})
+        except (OSError, ValueError):
+            return {}
+        return {str(k): int(v) for k, v in data.items()} if isinstance(data, dict) else {}
+
+    def refcount(self, digest: str) -> int:
+        return self._read_refs().get(digest, 0)
+
+    def incref(self, digest: str) -> int:
+        def _inc(refs: Dict[str, int]) -> Dict[str, int]:
+            refs = dict(refs) if isinstance(refs, dict) else {}
+            refs[digest] = int(refs.get(digest, 0)) + 1
+            return refs
+
+        os.makedirs(self.root, exist_ok=True)
+        refs, _rev = update_json(self._refs_path(), _inc, default={})
+        return refs[digest]
+
+    def store(self, data: bytes) -> Tuple[str, str]:
+        """put_bytes + incref: ritorna (sha256, percorso del blob)."""
+        digest = self.put_bytes(data)
+        self.incref(digest)
+        return digest, self.path(digest)
+
+    def rebuild_refs(self, digests: Iterable[str]) -> Dict[str, int]:
+        """Ricalcola i conteggi dai riferimenti effettivi (es. tutte le voci degli indici)."""
+        refs: Dict[str, int] = {}
+        for digest in digests:
+            refs[digest] = refs.get(digest, 0) + 1
+        os.makedirs(self.root, exist_ok=True)
+        update_json(self._refs_path(), lambda _old: refs, default={})
+        return dict(refs)
+
+    def gc(self) -> List[str]:
+        """Elimina i blob senza riferimenti; ritorna gli hash rimossi."""
+        if not os.path.isdir(self.root):
+            return []
+        with FileLock(self._refs_path()):  # nessun incref concorrente mentre si elimina
+            refs = self._read_refs()
+            removed = [d for d in self.iter_digests() if refs.get(d, 0) <= 0]
+            for digest in removed:
+                try:
+                    os.remove(self.path(digest))
+                except OSError:
+                    pass
+        return removed
+
+    def disk_usage(self) -> int:
+        return sum(os.path.getsize(self.path(d)) for d in self.iter_digests())
+
+
+# ----- archivio Tk: indici e migrazione -----
+
+def _index_paths(tk_appdata: str) -> Iterator[str]:
+    root = os.path.join(tk_appdata, "patients")
+    if not os.path.isdir(root):
+        return
+    for pid in sorted(os.listdir(root)):
+        path = os.path.join(root, pid, "index.json")
+        if os.path.isfile(path):
+            yield path
+
+
+def _read_index(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def indexed_digests(tk_appdata: str) -> Iterator[str]:
+    for path in _index_paths(tk_appdata):
+        idx = _read_index(path) or {}
+        for entry in idx.get("exams") or []:
+            if entry.get("image_sha256"):
+                yield entry["image_sha256"]
+
+
+def migrate_archive(tk_appdata: str, store: ImageStore) -> Dict[str, int]:
+    """
+    Sposta nel blob store le immagini ancora accanto agli esami e aggiorna gli
+    indici; i PNG identici diventano un solo blob. Ricalcola poi i riferimenti.
+    """
+    stats = {"migrated": 0, "bytes_before": 0, "bytes_after": 0}
+    for idx_path in _index_paths(tk_appdata):
+        idx = _read_index(idx_path)
+        if idx is None or all(e.get("image_sha256") or not e.get("image") for e in idx.get("exams") or []):
+            continue
+        moved: Dict[str, int] = {}
+
+        def _migrate(idx: Dict[str, Any]) -> Dict[str, Any]:
+            # puo' essere riapplicata se l'app aggiorna l'indice nel frattempo: niente effetti oltre al blob
+            moved.clear()
+            for entry in idx.get("exams") or []:
+                image = (entry.get("image") or "").replace("/", os.sep)
+                if not image or entry.get("image_sha256") or not os.path.isfile(image):
+                    continue
+                moved[image] = os.path.getsize(image)
+                digest = store.put_file(image)
+                entry["image"] = store.path(digest).replace("\\", "/")
+                entry["image_sha256"] = digest
+            return idx
+
+        update_json(idx_path, _migrate)
+        for image, size in moved.items():
+            stats["bytes_before"] += size
+            stats["migrated"] += 1
+            os.remove(image)
+    store.rebuild_refs(indexed_digests(tk_appdata))
+    stats["bytes_after"] = store.disk_usage()
+    return stats
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Archivio immagini indirizzato per contenuto")
+    parser.add_argument("command", choices=("migrate", "gc"))
+    parser.add_argument("--tk-appdata", required=True, help="cartella dati dell'app Tk (contiene patients/)")
+    parser.add_argument("--recompress", action="store_true", help="ricodifica i PNG senza perdita (richiede Pillow)")
+    args = parser.parse_args(argv)
+    store = ImageStore(os.path.join(args.tk_appdata, "images"), recompress=args.recompress)
+    if args.command == "migrate":
+        stats = migrate_archive(args.tk_appdata, store)
+        print(f"Immagini migrate: {stats['migrated']}, {stats['bytes_before']} -> {stats['bytes_after']} byte")
+    else:
+        store.rebuild_refs(indexed_digests(args.tk_appdata))
+        print(f"Blob eliminati: {len(store.gc())}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
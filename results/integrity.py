@@ -0,0 +1,366 @@
+"""
+Verifica di integrita' dell'archivio (app Tk e Qt) ed eventuale riparazione.
+
+- ogni file (profile.json, index.json, esami JSON, PNG) viene validato e
+  firmato con SHA-256 in un pool di processi;
+- il manifest dei controlli viene salvato e riusato: ai passaggi successivi si
+  ricontrollano solo i file con mtime o dimensione cambiati;
+- per ogni assistito Tk si confronta index.json con i file presenti: voci che
+  puntano a file mancanti (dangling) e file non indicizzati (orfani).
+
+Con `repair=True`: le voci dangling vengono rimosse (o perdono solo l'immagine
+mancante), gli esami validi orfani vengono reindicizzati e i file corrotti
+spostati in `<assistito>/quarantine/`. I PNG orfani vengono solo segnalati.
+
+Uso: python -m results.integrity --tk-appdata DIR [--qt-appdata DIR] [--repair]
+"""
+from __future__ import annotations
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import argparse
+import hashlib
+import json
+import os
+import shutil
+
+from audiometer.data_store.locking import VersionConflict, compare_and_swap, read_json
+from audiometry.exam_loader import parse_exam
+
+MANIFEST_VERSION = 1
+MANIFEST_NAME = "integrity_manifest.json"
+QUARANTINE_DIR = "quarantine"
+
+KIND_PROFILE = "profile"
+KIND_INDEX = "index"
+KIND_EXAM = "exam"
+KIND_IMAGE = "image"
+KIND_QT_PATIENT = "qt_patient"
+
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+_PNG_IEND = b"IEND\xaeB`\x82"
+
+
+@dataclass
+class Issue:
+    kind: str       # corrupt | dangling | missing_image | orphan_exam | orphan_image | conflict
+    path: str
+    detail: str = ""
+
+
+@dataclass
+class IntegrityReport:
+    checked: int = 0
+    reused: int = 0
+    issues: List[Issue] = field(default_factory=list)
+    repaired: List[Issue] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not self.issues
+
+    def by_kind(self, kind: str) -> List[Issue]:
+        return [i for i in self.issues if i.kind == kind]
+
+
+# ----- controllo del singolo file (eseguito nei processi worker) -----
+
+def _sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _validate_json(path: str, kind: str) -> Optional[str]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError) as exc:
+        return f"JSON non leggibile: {exc}"
+    if not isinstance(data, dict):
+        return "JSON non e' un oggetto"
+    if kind in (KIND_PROFILE, KIND_QT_PATIENT) and not data.get("id"):
+        return "profilo senza id"
+    if kind == KIND_INDEX and not isinstance(data.get("exams", []), list):
+        return "index.json: 'exams' non e' una lista"
+    if kind == KIND_EXAM:
+        if not ("soglie" in data or "OD" in data or "OS" in data or "thresholds" in data):
+            return "esame senza soglie"
+        if not parse_exam(data, path).n_points and (data.get("soglie") or data.get("OD") or data.get("OS")):
+            return "soglie non interpretabili"
+    return None
+
+
+def _validate_png(path: str) -> Optional[str]:
+    try:
+        with open(path, "rb") as f:
+            head = f.read(len(_PNG_SIGNATURE))
+            f.seek(max(0, os.path.getsize(path) - 12))
+            tail = f.read()
+    except OSError as exc:
+        return f"PNG non leggibile: {exc}"
+    if head != _PNG_SIGNATURE:
+        return "firma PNG non valida"
+    if _PNG_IEND not in tail:
+        return "PNG troncato"
+    return None
+
+
+def check_file(job: Tuple[str, str]) -> Dict[str, Any]:
+    """Valida e firma un file; ritorna la voce di manifest."""
+    path, kind = job
+    try:
+        st = os.stat(path)
+        error = _validate_png(path) if kind == KIND_IMAGE else _validate_json(path, kind)
+        digest = _sha256(path)
+    except OSError as exc:
+        return {"path": path, "kind": kind, "size": -1, "mtime_ns": 0, "sha256": "", "error": str(exc)}
+    return {
+        "path": path, "kind": kind, "size": st.st_size, "mtime_ns": st.st_mtime_ns,
+        "sha256": digest, "error": error,
+    }
+
+
+# ----- raccolta file -----
+
+def _tk_files(tk_appdata: str) -> Iterator[Tuple[str, str]]:
+    root = os.path.join(tk_appdata, "patients")
+    if not os.path.isdir(root):
+        return
+    for pid in sorted(os.listdir(root)):
+        pdir = os.path.join(root, pid)
+        if not os.path.isdir(pdir):
+            continue
+        for name, kind in (("profile.json", KIND_PROFILE), ("index.json", KIND_INDEX)):
+            path = os.path.join(pdir, name)
+            if os.path.isfile(path):
+                yield path, kind
+        sdir = os.path.join(pdir, "screenings")
+        if os.path.isdir(sdir):
+            for fn in sorted(os.listdir(sdir)):
+                low = fn.lower()
+                if low.endswith(".json"):
+                    yield os.path.join(sdir, fn), KIND_EXAM
+                elif low.endswith(".png"):
+                    yield os.path.join(sdir, fn), KIND_IMAGE
+    # blob store delle immagini (results.image_store)
+    for dirpath, _, files in os.walk(os.path.join(tk_appdata, "images", "objects")):
+        for fn in sorted(files):
+            if fn.endswith(".png"):
+                yield os.path.join(dirpath, fn), KIND_IMAGE
+
+
+def _qt_files(qt_appdata: str) -> Iterator[Tuple[str, str]]:
+    base = os.path.join(qt_appdata, "Farmaudiometria")
+    pdir = os.path.join(base, "patients")
+    if os.path.isdir(pdir):
+        for fn in sorted(os.listdir(pdir)):
+            if fn.endswith(".json"):
+                yield os.path.join(pdir, fn), KIND_QT_PATIENT
+    for dirpath, _, files in os.walk(os.path.join(base, "audiometries")):
+        for fn in sorted(files):
+            if fn.endswith(".json"):
+                yield os.path.join(dirpath, fn), KIND_EXAM
+
+
+# ----- manifest -----
+
+def load_manifest(path: str) -> Dict[str, Dict[str, Any]]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(data, dict) or data.get("version") != MANIFEST_VERSION:
+        return {}
+    files = data.get("files")
+    return files if isinstance(files, dict) else {}
+
+
+def save_manifest(path: str, files: Dict[str, Dict[str, Any]]) -> None:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"version": MANIFEST_VERSION, "files": files}, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def _unchanged(entry: Optional[Dict[str, Any]], path: str) -> bool:
+    if not entry:
+        return False
+    try:
+        st = os.stat(path)
+    except OSError:
+        return False
+    return entry.get("size") == st.st_size and entry.get("mtime_ns") == st.st_mtime_ns
+
+
+# ----- controlli incrociati index.json <-> file -----
+
+def _resolve(ref: str, sdir: str) -> str:
+    """Percorso salvato nell'indice; se l'archivio e' stato spostato si cerca il file per nome."""
+    ref = (ref or "").replace("/", os.sep)
+    if ref and os.path.exists(ref):
+        return ref
+    return os.path.join(sdir, os.path.basename(ref)) if ref else ""
+
+
+def _quarantine(path: str, pdir: str) -> str:
+    qdir = os.path.join(pdir, QUARANTINE_DIR)
+    os.makedirs(qdir, exist_ok=True)
+    target = os.path.join(qdir, os.path.basename(path))
+    shutil.move(path, target)
+    return target
+
+
+def _check_patient(pdir: str, files: Dict[str, Dict[str, Any]], report: IntegrityReport, repair: bool) -> None:
+    sdir = os.path.join(pdir, "screenings")
+    idx_path = os.path.join(pdir, "index.json")
+    idx_entry = files.get(idx_path)
+    if idx_entry is None or idx_entry.get("error"):
+        return  # indice mancante o corrotto: gia' segnalato come file
+    idx, rev = read_json(idx_path)
+
+    bad = {p for p, e in files.items() if e.get("error") and os.path.dirname(p) == sdir}
+    kept: List[Dict[str, Any]] = []
+    referenced = set()
+    changed = False
+    for entry in idx.get("exams") or []:
+        exam_path = _resolve(entry.get("path", ""), sdir)
+        if not os.path.isfile(exam_path) or exam_path in bad:
+            issue = Issue("dangling", idx_path, f"{entry.get('ts', '')}: {entry.get('path', '')}")
+            report.issues.append(issue)
+            if repair:
+                report.repaired.append(issue)
+                changed = True
+                continue
+        referenced.add(exam_path)
+        if entry.get("image"):
+            image_path = _resolve(entry["image"], sdir)
+            # i blob condivisi (image_sha256) non vanno in quarantena: basta staccarli dalla voce
+            signed = files.get(image_path) or {}
+            blob_bad = bool(entry.get("image_sha256")) and (
+                bool(signed.get("error")) or signed.get("sha256", entry["image_sha256"]) != entry["image_sha256"]
+            )
+            if not os.path.isfile(image_path) or image_path in bad or blob_bad:
+                issue = Issue("missing_image", idx_path, f"{entry.get('ts', '')}: {entry['image']}")
+                report.issues.append(issue)
+                if repair:
+                    entry = {k: v for k, v in entry.items() if k != "image"}
+                    report.repaired.append(issue)
+                    changed = True
+            else:
+                referenced.add(image_path)
+        kept.append(entry)
+
+    if os.path.isdir(sdir):
+        for fn in sorted(os.listdir(sdir)):
+            path = os.path.join(sdir, fn)
+            if path in referenced or path in bad or not os.path.isfile(path):
+                continue
+            stem, ext = os.path.splitext(fn)
+            if ext.lower() == ".json":
+                issue = Issue("orphan_exam", path)
+                report.issues.append(issue)
+                if repair:
+                    entry = {"ts": stem, "path": path.replace("\\", "/")}
+                    png = os.path.join(sdir, stem + ".png")
+                    if os.path.isfile(png) and png not in bad:
+                        entry["image"] = png.replace("\\", "/")
+                        referenced.add(png)
+                    kept.append(entry)
+                    report.repaired.append(issue)
+                    changed = True
+            elif ext.lower() == ".png" and os.path.join(sdir, stem + ".json") not in referenced:
+                report.issues.append(Issue("orphan_image", path))
+
+    if changed:
+        kept.sort(key=lambda e: str(e.get("ts", "")))
+        idx["exams"] = kept
+        try:
+            compare_and_swap(idx_path, rev, idx)
+        except VersionConflict as exc:
+            # l'app ha salvato un esame durante il controllo: si riparera' al prossimo passaggio
+            report.issues.append(Issue("conflict", idx_path, str(exc)))
+            return
+        files.pop(idx_path, None)  # riscritto: va rifirmato al prossimo passaggio
+    if repair:
+        for path in sorted(bad):
+            if os.path.isfile(path):
+                target = _quarantine(path, pdir)
+                report.repaired.append(Issue("corrupt", path, f"spostato in {target}"))
+
+
+def check_archive(
+    tk_appdata: Optional[str] = None,
+    qt_appdata: Optional[str] = None,
+    manifest_path: Optional[str] = None,
+    repair: bool = False,
+    workers: Optional[int] = None,
+) -> IntegrityReport:
+    """Controlla gli archivi indicati; `workers=0` esegue tutto nel processo corrente."""
+    if manifest_path is None:
+        base = tk_appdata or os.path.join(qt_appdata or ".", "Farmaudiometria")
+        manifest_path = os.path.join(base, MANIFEST_NAME)
+    previous = load_manifest(manifest_path)
+    jobs: List[Tuple[str, str]] = []
+    if tk_appdata:
+        jobs.extend(_tk_files(tk_appdata))
+    if qt_appdata:
+        jobs.extend(_qt_files(qt_appdata))
+
+    report = IntegrityReport()
+    files: Dict[str, Dict[str, Any]] = {}
+    todo: List[Tuple[str, str]] = []
+    for path, kind in jobs:
+        entry = previous.get(path)
+        if _unchanged(entry, path) and entry.get("kind") == kind:
+            files[path] = entry
+            report.reused += 1
+        else:
+            todo.append((path, kind))
+    if workers == 0 or len(todo) <= 1:
+        checked = [check_file(job) for job in todo]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            checked = list(pool.map(check_file, todo, chunksize=32))
+    for entry in checked:
+        files[entry["path"]] = entry
+    report.checked = len(checked)
+
+    for path, entry in sorted(files.items()):
+        if entry.get("error"):
+            report.issues.append(Issue("corrupt", path, entry["error"]))
+    if tk_appdata:
+        root = os.path.join(tk_appdata, "patients")
+        for pid in sorted(os.listdir(root)) if os.path.isdir(root) else []:
+            pdir = os.path.join(root, pid)
+            if os.path.isdir(pdir):
+                _check_patient(pdir, files, report, repair)
+    if repair:
+        files = {p: e for p, e in files.items() if os.path.exists(p)}
+    save_manifest(manifest_path, files)
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Verifica (e ripara) l'archivio esami")
+    parser.add_argument("--tk-appdata", default=None, help="cartella dati dell'app Tk (contiene patients/)")
+    parser.add_argument("--qt-appdata", default=None, help="cartella che contiene Farmaudiometria/")
+    parser.add_argument("--manifest", default=None)
+    parser.add_argument("--repair", action="store_true")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args(argv)
+    report = check_archive(args.tk_appdata, args.qt_appdata, args.manifest, args.repair, args.workers)
+    print(f"File controllati: {report.checked}, invariati dal passaggio precedente: {report.reused}")
+    for issue in report.issues:
+        print(f"{issue.kind:14s} {issue.path}  {issue.detail}".rstrip())
+    for issue in report.repaired:
+        print(f"riparato: {issue.kind} {issue.path}  {issue.detail}".rstrip())
+    return 0 if report.ok or args.repair else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
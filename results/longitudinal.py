@@ -0,0 +1,257 @@
+"""
+Andamento nel tempo delle soglie di un assistito e rilevazione di variazioni
+significative (STS, standard threshold shift): peggioramento medio >= 10 dB
+a 2-3-4 kHz rispetto all'esame di riferimento (baseline), per orecchio.
+
+- `build_series` / `detect_shifts`: analisi completa dello storico di un assistito;
+- `ShiftTracker`: stato incrementale (baseline per assistito) aggiornato a ogni salvataggio;
+- `scan_all`: passata batch parallela su tutti gli assistiti.
+
+Uso: python -m results.longitudinal --qt-appdata DIR --tk-appdata DIR
+"""
+from __future__ import annotations
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+import argparse
+import json
+import os
+import threading
+
+import numpy as np
+
+from audiometry.audiogram import FREQS, Audiogram
+from audiometry.exam_loader import Exam, read_exam
+from results.archive import exam_patient_id, qt_exam_files, tk_exam_files
+
+STS_BANDS = (2000, 3000, 4000)
+STS_MIN_SHIFT = 10.0
+EAR_LABELS = ("OD", "OS")
+
+
+@dataclass
+class ShiftEvent:
+    """Variazione significativa di un orecchio rispetto alla baseline."""
+
+    patient_id: str
+    ear: str
+    shift_db: float
+    exam_path: str
+    exam_label: str
+    baseline_path: str
+    baseline_label: str
+
+    def describe(self) -> str:
+        return (
+            f"{self.ear}: peggioramento medio {self.shift_db:.1f} dB a 2-3-4 kHz "
+            f"rispetto all'esame del {self.baseline_label}"
+        )
+
+
+@dataclass
+class PatientSeries:
+    """Serie storica delle soglie di un assistito, in ordine cronologico."""
+
+    patient_id: str
+    freqs: Tuple[int, ...]
+    thresholds: np.ndarray              # float32 (M, 2, F), NaN = non misurata
+    labels: List[str] = field(default_factory=list)
+    paths: List[str] = field(default_factory=list)
+
+    def __len__(self) -> int:
+        return int(self.thresholds.shape[0])
+
+
+def build_series(patient_id: str, exams: Iterable[Exam], freqs: Sequence[int] = FREQS) -> PatientSeries:
+    items = sorted((e for e in exams if e.n_points), key=lambda e: (e.label, e.path))
+    thr = np.full((len(items), 2, len(freqs)), np.nan, dtype=np.float32)
+    for i, exam in enumerate(items):
+        thr[i] = Audiogram.from_maps(exam.to_rl(), freqs).values
+    return PatientSeries(patient_id, tuple(freqs), thr, [e.label for e in items], [e.path for e in items])
+
+
+def band_means(thresholds: np.ndarray, freqs: Sequence[int], bands: Sequence[int] = STS_BANDS) -> np.ndarray:
+    """Media sulle bande STS per esame e orecchio (..., 2); NaN se manca anche una sola banda."""
+    cols = [list(freqs).index(f) for f in bands]
+    return np.asarray(thresholds, dtype=np.float64)[..., cols].mean(axis=-1)
+
+
+def detect_shifts(
+    series: PatientSeries,
+    bands: Sequence[int] = STS_BANDS,
+    min_shift: float = STS_MIN_SHIFT,
+) -> List[ShiftEvent]:
+    """Per ogni orecchio la baseline e' il primo esame con tutte le bande misurate."""
+    if not len(series):
+        return []
+    means = band_means(series.thresholds, series.freqs, bands)  # (M, 2)
+    events: List[ShiftEvent] = []
+    for e in range(2):
+        valid = np.flatnonzero(~np.isnan(means[:, e]))
+        if valid.size < 2:
+            continue
+        base = valid[0]
+        shift = means[valid[1:], e] - means[base, e]
+        for k in np.flatnonzero(shift >= min_shift):
+            i = valid[1 + k]
+            events.append(ShiftEvent(
+                series.patient_id, EAR_LABELS[e], float(shift[k]),
+                series.paths[i], series.labels[i], series.paths[base], series.labels[base],
+            ))
+    return events
+
+
+class ShiftTracker:
+    """
+    Baseline STS per assistito, persistita in un file JSON: ogni nuovo esame
+    viene confrontato con la baseline senza rileggere lo storico. Il confronto
+    e' O(1), ma `update` riscrive l'intero file di stato (compatto, circa 300
+    byte per assistito): il costo del salvataggio cresce con il numero di assistiti.
+    """
+
+    def __init__(self, state_path: str, bands: Sequence[int] = STS_BANDS, min_shift: float = STS_MIN_SHIFT) -> None:
+        self.state_path = state_path
+        self.bands = tuple(bands)
+        self.min_shift = min_shift
+        self._lock = threading.Lock()
+        self._state: Optional[Dict[str, Any]] = None
+
+    def _load(self) -> Dict[str, Any]:
+        if self._state is None:
+            try:
+                with open(self.state_path, "r", encoding="utf-8") as f:
+                    self._state = json.load(f)
+            except (OSError, ValueError):
+                self._state = {}
+            self._state.setdefault("patients", {})
+        return self._state
+
+    def _save(self) -> None:
+        os.makedirs(os.path.dirname(self.state_path) or ".", exist_ok=True)
+        tmp = self.state_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self._state, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp, self.state_path)
+
+    def _ear_mean(self, exam: Exam, ear: str) -> Optional[float]:
+        values = exam.ear(ear)
+        if not all(f in values for f in self.bands):
+            return None
+        return sum(values[f] for f in self.bands) / len(self.bands)
+
+    def update(self, exam: Exam) -> List[ShiftEvent]:
+        """Registra un esame appena salvato; ritorna le variazioni significative rilevate."""
+        pid = exam.patient_id
+        if not pid:
+            return []
+        events: List[ShiftEvent] = []
+        with self._lock:
+            patients = self._load()["patients"]
+            entry = patients.setdefault(pid, {"baseline": {}, "flagged": {}})
+            for ear in EAR_LABELS:
+                mean = self._ear_mean(exam, ear)
+                if mean is None:
+                    continue
+                base = entry["baseline"].get(ear)
+                if base is None or exam.label < base["label"]:
+                    # primo esame utile (o esame piu' vecchio registrato in ritardo): nuova baseline
+                    entry["baseline"][ear] = {"mean": mean, "path": exam.path, "label": exam.label}
+                    continue
+                shift = mean - base["mean"]
+                if shift >= self.min_shift:
+                    events.append(ShiftEvent(pid, ear, shift, exam.path, exam.label, base["path"], base["label"]))
+                    entry["flagged"][ear] = {"shift": shift, "path": exam.path, "label": exam.label}
+                else:
+                    entry["flagged"].pop(ear, None)
+            self._save()
+        return events
+
+    def reset_patient(self, series: PatientSeries, save: bool = True) -> None:
+        """Ricostruisce la baseline di un assistito da uno storico completo (usato dalla passata batch)."""
+        means = band_means(series.thresholds, series.freqs, self.bands) if len(series) else np.zeros((0, 2))
+        entry: Dict[str, Any] = {"baseline": {}, "flagged": {}}
+        for e, ear in enumerate(EAR_LABELS):
+            valid = np.flatnonzero(~np.isnan(means[:, e]))
+            if not valid.size:
+                continue
+            base = int(valid[0])
+            entry["baseline"][ear] = {"mean": float(means[base, e]), "path": series.paths[base], "label": series.labels[base]}
+            last = int(valid[-1])
+            shift = float(means[last, e] - means[base, e])
+            if last != base and shift >= self.min_shift:
+                entry["flagged"][ear] = {"shift": shift, "path": series.paths[last], "label": series.labels[last]}
+        with self._lock:
+            self._load()["patients"][series.patient_id] = entry
+            if save:
+                self._save()
+
+    def flush(self) -> None:
+        with self._lock:
+            self._load()
+            self._save()
+
+    def flagged_patients(self) -> List[str]:
+        with self._lock:
+            return sorted(pid for pid, entry in self._load()["patients"].items() if entry.get("flagged"))
+
+
+# ----- passata batch -----
+
+def _analyze_patient(job: Tuple[str, List[str]]) -> Tuple[PatientSeries, List[ShiftEvent]]:
+    pid, paths = job
+    exams = []
+    for path in paths:
+        try:
+            exams.append(read_exam(path))
+        except (OSError, ValueError):
+            continue
+    series = build_series(pid, exams)
+    return series, detect_shifts(series)
+
+
+def scan_all(
+    qt_appdata: Optional[str] = None,
+    tk_appdata: Optional[str] = None,
+    workers: Optional[int] = None,
+    tracker: Optional[ShiftTracker] = None,
+) -> Dict[str, List[ShiftEvent]]:
+    """Analizza lo storico di tutti gli assistiti in parallelo; ritorna {patient_id: eventi} per chi va ricontrollato."""
+    groups: Dict[str, List[str]] = {}
+    for files in ([qt_exam_files(qt_appdata)] if qt_appdata else []) + ([tk_exam_files(tk_appdata)] if tk_appdata else []):
+        for path in files:
+            groups.setdefault(exam_patient_id(path), []).append(path)
+    jobs = sorted(groups.items())
+    if workers == 0 or len(jobs) <= 1:
+        results = [_analyze_patient(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_analyze_patient, jobs, chunksize=16))
+    out: Dict[str, List[ShiftEvent]] = {}
+    for series, events in results:
+        if tracker is not None:
+            tracker.reset_patient(series, save=False)
+        if events:
+            out[series.patient_id] = events
+    if tracker is not None:
+        tracker.flush()
+    return out
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Assistiti con variazione significativa delle soglie (STS)")
+    parser.add_argument("--qt-appdata", default=os.getenv("APPDATA"))
+    parser.add_argument("--tk-appdata", default=None)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--state", default=None, help="file di stato ShiftTracker da ricostruire")
+    args = parser.parse_args(argv)
+    tracker = ShiftTracker(args.state) if args.state else None
+    flagged = scan_all(args.qt_appdata, args.tk_appdata, workers=args.workers, tracker=tracker)
+    for pid, events in sorted(flagged.items()):
+        print(pid)
+        for ev in events:
+            print(f"  {ev.exam_label}  {ev.describe()}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
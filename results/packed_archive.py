@@ -0,0 +1,253 @@
+"""
+Archivio binario compatto degli esami (un file per ambulatorio per anno).
+
+Layout (little-endian, sezioni allineate a 64 byte):
+  header      HEADER_DTYPE (1 record)
+  freqs       int32[F]          asse delle frequenze (slot)
+  thresholds  float32[N, 2, F]  soglie dB HL, orecchio 0 = destro (OD/R), 1 = sinistro (OS/L); NaN = non misurata
+  flags       uint8[N, 2, F]    FLAG_MEASURED | FLAG_MASKED
+  meta        META_DTYPE[N]     tabella a larghezza fissa, stringhe come indici nel pool
+  str_index   uint64[S + 1]     offset delle stringhe nel pool
+  str_data    uint8[...]        stringhe UTF-8 concatenate (indice 0 = "")
+
+Il lettore mappa il file in memoria e restituisce viste NumPy senza parsing.
+
+Uso: python -m results.packed_archive --qt-appdata DIR --tk-appdata DIR --out DIR --clinic NOME
+"""
+from __future__ import annotations
+from typing import Dict, Iterable, List, Optional
+import argparse
+import datetime
+import os
+
+import numpy as np
+
+from audiometry.session import FREQS
+from audiometry.exam_loader import Exam
+from results.archive import iter_archive_exams
+
+PACKED_MAGIC = b"FAUDPK\x00\x01"
+PACKED_VERSION = 1
+PACKED_SUFFIX = ".fapk"
+_ALIGN = 64
+
+FLAG_MEASURED = 1
+FLAG_MASKED = 2
+
+HEADER_DTYPE = np.dtype([
+    ("magic", "S8"),
+    ("version", "<u4"),
+    ("n_exams", "<u4"),
+    ("n_freqs", "<u4"),
+    ("n_strings", "<u4"),
+    ("off_freqs", "<u8"),
+    ("off_thresholds", "<u8"),
+    ("off_flags", "<u8"),
+    ("off_meta", "<u8"),
+    ("off_str_index", "<u8"),
+    ("off_str_data", "<u8"),
+    ("str_data_len", "<u8"),
+])
+
+META_DTYPE = np.dtype([
+    ("timestamp", "<i8"),  # secondi dall'epoch (ora registrata nel file d'esame)
+    ("patient", "<u4"),
+    ("device", "<u4"),
+    ("operator", "<u4"),
+    ("source", "<u4"),
+    ("n_points", "<u2"),
+])
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+
+
+def _epoch_seconds(value: Optional[datetime.datetime]) -> int:
+    if value is None:
+        return 0
+    if value.tzinfo is not None:
+        value = value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return int((value - _EPOCH).total_seconds())
+
+
+def _aligned(offset: int) -> int:
+    return (offset + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+class _StringPool:
+    def __init__(self) -> None:
+        self._ids: Dict[str, int] = {"": 0}
+        self.items: List[bytes] = [b""]
+
+    def add(self, value: str) -> int:
+        value = value or ""
+        idx = self._ids.get(value)
+        if idx is None:
+            idx = len(self.items)
+            self._ids[value] = idx
+            self.items.append(value.encode("utf-8"))
+        return idx
+
+
+def write_packed(path: str, exams: Iterable[Exam], freqs: Iterable[int] = FREQS) -> int:
+    """Scrive gli esami normalizzati in `path`. Ritorna il numero di esami."""
+    axis = np.asarray(list(freqs), dtype="<i4")
+    slot = {int(f): i for i, f in enumerate(axis)}
+    exams = list(exams)
+    n, n_freqs = len(exams), len(axis)
+
+    thresholds = np.full((n, 2, n_freqs), np.nan, dtype="<f4")
+    flags = np.zeros((n, 2, n_freqs), dtype="u1")
+    meta = np.zeros(n, dtype=META_DTYPE)
+    pool = _StringPool()
+    for i, exam in enumerate(exams):
+        points = 0
+        for e, ear in enumerate(("R", "L")):
+            masked = exam.masked[ear]
+            for freq, db in exam.ear(ear).items():
+                j = slot.get(int(freq))
+                if j is None:
+                    continue
+                thresholds[i, e, j] = db
+                flags[i, e, j] = FLAG_MEASURED | (FLAG_MASKED if int(freq) in masked else 0)
+                points += 1
+        meta[i] = (
+            _epoch_seconds(exam.created_at),
+            pool.add(exam.patient_id),
+            pool.add(exam.device),
+            pool.add(exam.operator),
+            pool.add(exam.path),
+            min(points, 0xFFFF),
+        )
+
+    str_index = np.zeros(len(pool.items) + 1, dtype="<u8")
+    np.cumsum([len(b) for b in pool.items], out=str_index[1:])
+    str_data = b"".join(pool.items)
+
+    header = np.zeros(1, dtype=HEADER_DTYPE)
+    sections = [axis, thresholds, flags, meta, str_index, np.frombuffer(str_data, dtype="u1")]
+    offsets = []
+    offset = HEADER_DTYPE.itemsize
+    for arr in sections:
+        offset = _aligned(offset)
+        offsets.append(offset)
+        offset += arr.nbytes
+    header[0] = (PACKED_MAGIC, PACKED_VERSION, n, n_freqs, len(pool.items), *offsets[:6], len(str_data))
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(header.tobytes())
+        for off, arr in zip(offsets, sections):
+            f.write(b"\x00" * (off - f.tell()))
+            f.write(np.ascontiguousarray(arr).tobytes())
+    os.replace(tmp, path)
+    return n
+
+
+class PackedArchive:
+    """Lettore di un archivio .fapk: tutti gli array sono viste in sola lettura sul file mappato."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._mm = np.memmap(path, dtype="u1", mode="r")
+        header = self._view(0, HEADER_DTYPE, (1,))[0]
+        if bytes(header["magic"]) != PACKED_MAGIC:
+            raise ValueError(f"{path}: non e' un archivio esami compatto")
+        if int(header["version"]) != PACKED_VERSION:
+            raise ValueError(f"{path}: versione archivio {int(header['version'])} non supportata")
+        n, n_freqs, n_strings = int(header["n_exams"]), int(header["n_freqs"]), int(header["n_strings"])
+        self.freqs = self._view(header["off_freqs"], "<i4", (n_freqs,))
+        self.thresholds = self._view(header["off_thresholds"], "<f4", (n, 2, n_freqs))
+        self.flags = self._view(header["off_flags"], "u1", (n, 2, n_freqs))
+        self.meta = self._view(header["off_meta"], META_DTYPE, (n,))
+        self._str_index = self._view(header["off_str_index"], "<u8", (n_strings + 1,))
+        self._str_data = self._view(header["off_str_data"], "u1", (int(header["str_data_len"]),))
+
+    def _view(self, offset, dtype, shape) -> np.ndarray:
+        return np.ndarray(shape, dtype=dtype, buffer=self._mm, offset=int(offset))
+
+    def __len__(self) -> int:
+        return int(self.meta.shape[0])
+
+    @property
+    def timestamps(self) -> np.ndarray:
+        return self.meta["timestamp"].view("datetime64[s]")
+
+    @property
+    def measured(self) -> np.ndarray:
+        return (self.flags & FLAG_MEASURED) != 0
+
+    @property
+    def masked(self) -> np.ndarray:
+        return (self.flags & FLAG_MASKED) != 0
+
+    def string(self, idx: int) -> str:
+        start, end = int(self._str_index[idx]), int(self._str_index[idx + 1])
+        return self._str_data[start:end].tobytes().decode("utf-8")
+
+    def column_strings(self, column: str) -> List[str]:
+        """Decodifica una colonna stringa della tabella meta ('patient', 'device', 'operator', 'source')."""
+        cache: Dict[int, str] = {}
+        out = []
+        for idx in self.meta[column].tolist():
+            if idx not in cache:
+                cache[idx] = self.string(idx)
+            out.append(cache[idx])
+        return out
+
+    def find_string(self, value: str) -> Optional[int]:
+        raw = value.encode("utf-8")
+        for idx in range(len(self._str_index) - 1):
+            if self._str_data[int(self._str_index[idx]):int(self._str_index[idx + 1])].tobytes() == raw:
+                return idx
+        return None
+
+    def rows_for_patient(self, patient_id: str) -> np.ndarray:
+        idx = self.find_string(patient_id)
+        if idx is None:
+            return np.zeros(0, dtype=np.intp)
+        return np.flatnonzero(self.meta["patient"] == idx)
+
+    def close(self) -> None:
+        mm = getattr(self._mm, "_mmap", None)
+        self.freqs = self.thresholds = self.flags = self.meta = None  # type: ignore[assignment]
+        self._str_index = self._str_data = None  # type: ignore[assignment]
+        self._mm = None
+        if mm is not None:
+            try:
+                mm.close()
+            except (BufferError, ValueError):
+                pass
+
+
+def export_archive(exams: Iterable[Exam], out_dir: str, clinic: str) -> List[str]:
+    """Raggruppa gli esami per anno e scrive un file <clinic>_<anno>.fapk per gruppo."""
+    by_year: Dict[int, List[Exam]] = {}
+    for exam in exams:
+        if exam.created_at is None:
+            continue
+        by_year.setdefault(exam.created_at.year, []).append(exam)
+    written = []
+    for year in sorted(by_year):
+        items = sorted(by_year[year], key=lambda e: (_epoch_seconds(e.created_at), e.path))
+        path = os.path.join(out_dir, f"{clinic}_{year}{PACKED_SUFFIX}")
+        write_packed(path, items)
+        written.append(path)
+    return written
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Esporta gli archivi JSON in formato binario compatto")
+    parser.add_argument("--qt-appdata", default=os.getenv("APPDATA"), help="cartella che contiene Farmaudiometria/")
+    parser.add_argument("--tk-appdata", default=None, help="cartella dati dell'app Tk (contiene patients/)")
+    parser.add_argument("--out", required=True)
+    parser.add_argument("--clinic", default="farmacia")
+    args = parser.parse_args(argv)
+    paths = export_archive(iter_archive_exams(args.qt_appdata, args.tk_appdata), args.out, args.clinic)
+    for path in paths:
+        print(path)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,320 @@
+"""
+Statistiche di popolazione sull'intero archivio esami.
+
+Gli esami vengono caricati in colonne NumPy (soglie (N, 2, F), date, eta', sesso)
+da un pool di processi; gli aggregati sono calcolati in forma vettoriale.
+
+Uso: python -m results.population --qt-appdata DIR --tk-appdata DIR
+"""
+from __future__ import annotations
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+import argparse
+import datetime
+import json
+import os
+import warnings
+
+import numpy as np
+
+from audiometry.audiogram import FREQS
+from audiometry.exam_loader import Exam, read_exam
+from results.archive import qt_exam_files, tk_exam_files
+
+SEX_UNKNOWN = 0
+SEX_MALE = 1
+SEX_FEMALE = 2
+SEX_LABELS = {SEX_UNKNOWN: "?", SEX_MALE: "M", SEX_FEMALE: "F"}
+
+AGE_BANDS = (0, 18, 40, 60, 70, 80, 200)
+PTA_BANDS = (500, 1000, 2000)
+
+
+@dataclass
+class PopulationTable:
+    """Archivio in colonne: una riga per esame."""
+
+    freqs: np.ndarray        # int32 (F,)
+    thresholds: np.ndarray   # float32 (N, 2, F), NaN = non misurata; orecchio 0 = destro
+    timestamps: np.ndarray   # datetime64[s] (N,), NaT se ignota
+    age: np.ndarray          # float32 (N,), NaN se ignota
+    sex: np.ndarray          # uint8 (N,), SEX_*
+    patient_ids: np.ndarray  # object (N,)
+
+    def __len__(self) -> int:
+        return int(self.thresholds.shape[0])
+
+    @classmethod
+    def empty(cls, freqs: Sequence[int] = FREQS) -> "PopulationTable":
+        return cls(
+            np.asarray(freqs, dtype=np.int32),
+            np.zeros((0, 2, len(freqs)), dtype=np.float32),
+            np.zeros(0, dtype="datetime64[s]"),
+            np.zeros(0, dtype=np.float32),
+            np.zeros(0, dtype=np.uint8),
+            np.zeros(0, dtype=object),
+        )
+
+    @classmethod
+    def concat(cls, parts: Sequence["PopulationTable"], freqs: Sequence[int] = FREQS) -> "PopulationTable":
+        parts = [p for p in parts if len(p)]
+        if not parts:
+            return cls.empty(freqs)
+        return cls(
+            parts[0].freqs,
+            np.concatenate([p.thresholds for p in parts]),
+            np.concatenate([p.timestamps for p in parts]),
+            np.concatenate([p.age for p in parts]),
+            np.concatenate([p.sex for p in parts]),
+            np.concatenate([p.patient_ids for p in parts]),
+        )
+
+    @classmethod
+    def from_packed(cls, archive) -> "PopulationTable":
+        """Da un results.packed_archive.PackedArchive (senza dati anagrafici)."""
+        n = len(archive)
+        return cls(
+            np.asarray(archive.freqs),
+            archive.thresholds,
+            archive.timestamps,
+            np.full(n, np.nan, dtype=np.float32),
+            np.zeros(n, dtype=np.uint8),
+            np.asarray(archive.column_strings("patient"), dtype=object),
+        )
+
+
+# ----- caricamento -----
+
+def _sex_code(value: Any) -> int:
+    v = str(value or "").strip().upper()[:1]
+    if v == "M":
+        return SEX_MALE
+    if v == "F":
+        return SEX_FEMALE
+    return SEX_UNKNOWN
+
+
+def _age_years(patient: Dict[str, Any], when: Optional[datetime.datetime]) -> float:
+    dob = patient.get("birth_date")
+    if dob:
+        try:
+            born = datetime.date.fromisoformat(str(dob)[:10])
+            ref = (when or datetime.datetime.now()).date()
+            return float(ref.year - born.year - ((ref.month, ref.day) < (born.month, born.day)))
+        except ValueError:
+            pass
+    try:
+        return float(patient.get("eta"))
+    except (TypeError, ValueError):
+        return float("nan")
+
+
+def _tk_profile(path: str, cache: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    # .../patients/<PID>/screenings/<ts>.json -> .../patients/<PID>/profile.json
+    pdir = os.path.dirname(os.path.dirname(path))
+    if pdir not in cache:
+        try:
+            with open(os.path.join(pdir, "profile.json"), "r", encoding="utf-8") as f:
+                cache[pdir] = json.load(f)
+        except (OSError, ValueError):
+            cache[pdir] = {}
+    return cache[pdir]
+
+
+def _load_chunk(paths: Sequence[str], freqs: Tuple[int, ...] = tuple(FREQS)) -> PopulationTable:
+    """Eseguita nei processi del pool: legge un blocco di file e restituisce le colonne."""
+    slot = {f: i for i, f in enumerate(freqs)}
+    thr = np.full((len(paths), 2, len(freqs)), np.nan, dtype=np.float32)
+    ts = np.full(len(paths), np.datetime64("NaT"), dtype="datetime64[s]")
+    age = np.full(len(paths), np.nan, dtype=np.float32)
+    sex = np.zeros(len(paths), dtype=np.uint8)
+    pids = np.empty(len(paths), dtype=object)
+    profiles: Dict[str, Dict[str, Any]] = {}
+    keep = np.zeros(len(paths), dtype=bool)
+    for i, path in enumerate(paths):
+        try:
+            exam: Exam = read_exam(path)
+        except (OSError, ValueError):
+            continue
+        keep[i] = True
+        for e, values in enumerate((exam.right, exam.left)):
+            for freq, db in values.items():
+                j = slot.get(freq)
+                if j is not None:
+                    thr[i, e, j] = db
+        patient = exam.patient or (_tk_profile(path, profiles) if os.path.basename(os.path.dirname(path)) == "screenings" else {})
+        if exam.created_at is not None:
+            ts[i] = np.datetime64(exam.created_at.replace(tzinfo=None, microsecond=0))
+        age[i] = _age_years(patient, exam.created_at)
+        sex[i] = _sex_code(patient.get("sex") or patient.get("sesso"))
+        pids[i] = exam.patient_id
+    return PopulationTable(np.asarray(freqs, dtype=np.int32), thr[keep], ts[keep], age[keep], sex[keep], pids[keep])
+
+
+def load_population(
+    qt_appdata: Optional[str] = None,
+    tk_appdata: Optional[str] = None,
+    workers: Optional[int] = None,
+    chunk_size: int = 512,
+) -> PopulationTable:
+    """Carica tutti gli esami dei due archivi JSON. workers=0 carica nel processo corrente."""
+    paths: List[str] = []
+    if qt_appdata:
+        paths.extend(qt_exam_files(qt_appdata))
+    if tk_appdata:
+        paths.extend(tk_exam_files(tk_appdata))
+    chunks = [paths[i:i + chunk_size] for i in range(0, len(paths), chunk_size)]
+    if workers == 0 or len(chunks) <= 1:
+        return PopulationTable.concat([_load_chunk(c) for c in chunks])
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return PopulationTable.concat(list(pool.map(_load_chunk, chunks)))
+
+
+# ----- aggregati -----
+
+def _nanmean(values: np.ndarray, axis) -> np.ndarray:
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        return np.nanmean(values, axis=axis)
+
+
+def _slots(table: PopulationTable, freqs: Iterable[int]) -> List[int]:
+    axis = table.freqs.tolist()
+    return [axis.index(f) for f in freqs if f in axis]
+
+
+def pta(table: PopulationTable, bands: Iterable[int] = PTA_BANDS) -> np.ndarray:
+    """PTA per esame e orecchio (N, 2); NaN se nessuna banda misurata."""
+    cols = _slots(table, bands)
+    return _nanmean(table.thresholds[:, :, cols].astype(np.float64), axis=2)
+
+
+def better_ear_pta(table: PopulationTable, bands: Iterable[int] = PTA_BANDS) -> np.ndarray:
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        return np.nanmin(pta(table, bands), axis=1)
+
+
+def pta_by_age_sex(
+    table: PopulationTable,
+    age_bands: Sequence[float] = AGE_BANDS,
+    bands: Iterable[int] = PTA_BANDS,
+) -> List[Dict[str, Any]]:
+    """Distribuzione del PTA (orecchio migliore) per fascia d'eta' e sesso."""
+    values = better_ear_pta(table, bands)
+    band_idx = np.digitize(table.age, age_bands) - 1  # NaN -> len(age_bands) - 1
+    valid = ~np.isnan(values) & ~np.isnan(table.age) & (band_idx >= 0) & (band_idx < len(age_bands) - 1)
+    key = band_idx * 3 + table.sex
+    out = []
+    for k in np.unique(key[valid]):
+        sel = values[valid & (key == k)]
+        b, s = divmod(int(k), 3)
+        p25, p50, p75 = np.percentile(sel, [25, 50, 75])
+        out.append({
+            "age_band": f"{age_bands[b]:g}-{age_bands[b + 1]:g}",
+            "sex": SEX_LABELS[s],
+            "n": int(sel.size),
+            "mean": float(sel.mean()),
+            "p25": float(p25),
+            "median": float(p50),
+            "p75": float(p75),
+        })
+    return out
+
+
+def frequency_percentiles(table: PopulationTable, q: Sequence[float] = (5, 25, 50, 75, 95)) -> np.ndarray:
+    """Percentili per orecchio e frequenza: forma (2, len(q), F), NaN dove non ci sono misure."""
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        res = np.nanpercentile(table.thresholds.astype(np.float64), q, axis=0)  # (len(q), 2, F)
+    return np.moveaxis(res, 1, 0)
+
+
+def asymmetry_mask(table: PopulationTable, min_diff: float = 15.0, min_consecutive: int = 3) -> np.ndarray:
+    """
+    True per gli esami con |OD - OS| >= min_diff su almeno min_consecutive frequenze
+    consecutive fra quelle misurate su entrambi gli orecchi (stessa regola dell'analisi del singolo esame).
+    """
+    both = (~np.isnan(table.thresholds)).all(axis=1)
+    with np.errstate(invalid="ignore"):
+        hit = np.abs(table.thresholds[:, 0, :] - table.thresholds[:, 1, :]) >= min_diff
+    consec = np.zeros(len(table), dtype=np.int32)
+    found = np.zeros(len(table), dtype=bool)
+    for j in range(hit.shape[1]):
+        consec = np.where(both[:, j], np.where(hit[:, j], consec + 1, 0), consec)
+        found |= consec >= min_consecutive
+    return found
+
+
+def asymmetry_prevalence(table: PopulationTable, min_diff: float = 15.0, min_consecutive: int = 3) -> Dict[str, Any]:
+    both = (~np.isnan(table.thresholds)).all(axis=1).sum(axis=1) >= min_consecutive
+    hits = asymmetry_mask(table, min_diff, min_consecutive) & both
+    eligible = int(both.sum())
+    return {
+        "eligible": eligible,
+        "asymmetric": int(hits.sum()),
+        "prevalence": float(hits.sum() / eligible) if eligible else 0.0,
+    }
+
+
+def monthly_trend(table: PopulationTable, bands: Iterable[int] = PTA_BANDS) -> List[Dict[str, Any]]:
+    """Numero di esami e PTA medio per orecchio, per mese."""
+    months = table.timestamps.astype("datetime64[M]")
+    valid = ~np.isnat(months)
+    if not valid.any():
+        return []
+    uniq, inv = np.unique(months[valid], return_inverse=True)
+    values = pta(table, bands)[valid]
+    counts = np.bincount(inv, minlength=len(uniq))
+    out_mean = []
+    for e in range(2):
+        col = values[:, e]
+        ok = ~np.isnan(col)
+        s = np.bincount(inv[ok], weights=col[ok], minlength=len(uniq))
+        n = np.bincount(inv[ok], minlength=len(uniq))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            out_mean.append(np.where(n > 0, s / np.maximum(n, 1), np.nan))
+    return [
+        {
+            "month": str(uniq[i]),
+            "n": int(counts[i]),
+            "pta_od": None if np.isnan(out_mean[0][i]) else float(out_mean[0][i]),
+            "pta_os": None if np.isnan(out_mean[1][i]) else float(out_mean[1][i]),
+        }
+        for i in range(len(uniq))
+    ]
+
+
+def summarize(table: PopulationTable) -> Dict[str, Any]:
+    q = (5, 25, 50, 75, 95)
+    pct = frequency_percentiles(table, q)
+    return {
+        "exams": len(table),
+        "patients": int(len(set(table.patient_ids.tolist()))),
+        "pta_by_age_sex": pta_by_age_sex(table),
+        "frequency_percentiles": {
+            ear: {
+                str(int(f)): {f"p{int(p)}": (None if np.isnan(pct[e, k, j]) else float(pct[e, k, j])) for k, p in enumerate(q)}
+                for j, f in enumerate(table.freqs)
+            }
+            for e, ear in enumerate(("OD", "OS"))
+        },
+        "asymmetry": asymmetry_prevalence(table),
+        "monthly": monthly_trend(table),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Statistiche di popolazione sull'archivio esami")
+    parser.add_argument("--qt-appdata", default=os.getenv("APPDATA"))
+    parser.add_argument("--tk-appdata", default=None)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args(argv)
+    table = load_population(args.qt_appdata, args.tk_appdata, workers=args.workers)
+    print(json.dumps(summarize(table), ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
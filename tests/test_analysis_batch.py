@@ -0,0 +1,24 @@
+import numpy as np
+
+from audiometer.analysis import SEVERITY, _classify, analyze_batch, classify_batch, generate_analysis_text, generate_analysis_texts
+from audiometry.audiogram import Audiogram, FREQS
+
+
+def test_classify_batch_matches_scalar_including_gaps():
+    values = np.array([-5, 0, 20, 20.5, 21, 40.2, 55, 55.5, 70, 90, 90.5, 91, 150, 2000])
+    labels = [SEVERITY[i][2] for i in classify_batch(values)]
+    assert labels == [_classify(v) for v in values]
+
+
+def test_batch_texts_match_single_exam_path():
+    rng = np.random.default_rng(1)
+    n = 400
+    thr = rng.choice(np.arange(-10, 100, 2.5), size=(n, 2, len(FREQS))).astype(np.float32)
+    thr[rng.random(thr.shape) < 0.3] = np.nan
+    thr[:5] = np.nan  # esami vuoti
+    freqs = [125, 250, 500, 1000, 2000, 3000, 4000, 6000, 8000]
+
+    texts = generate_analysis_texts(thr, FREQS, freqs)
+    for i in range(n):
+        assert texts[i] == generate_analysis_text(Audiogram(FREQS, thr[i].copy()), freqs)
+    assert analyze_batch(thr, FREQS, freqs).pta[0].tolist() == [0.0, 0.0]
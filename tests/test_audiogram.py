@@ -0,0 +1,46 @@
+import math
+
+from audiometer.analysis import generate_analysis_text
+from audiometer.screening.results import ResultsStore
+from audiometry.audiogram import Audiogram, FREQS
+from audiometry.session import AudiometrySession
+
+
+def test_audiogram_rows_and_views():
+    rows = [('P', 'N', 'R', 1000, 20), {'ear': 'L', 'freq': 500, 'dbhl': 35}, ('P', 'N', 'R', 1000, 25)]
+    ag = Audiogram.from_rows(rows)
+    assert ag.freqs == tuple(FREQS)
+    assert ag.get('OD', 1000) == 25.0 and ag.get('R', 500) is None
+    assert ag.series('L') == ([500], [35.0])
+    assert ag.table_cells('R', [500, 1000]) == ['-', 25.0]
+    # vista senza copia
+    ag.ear('L')[0] = 10
+    assert ag.get('L', 125) == 10.0
+    assert math.isnan(Audiogram().values[0, 0])
+    # frequenze fuori asse estendono l'asse
+    assert 900 in Audiogram.from_rows([('P', 'N', 'L', 900, 5)]).freqs
+
+
+def test_results_store_and_session_use_audiogram():
+    store = ResultsStore()
+    store.add_result('R', 500, 30)
+    store.add_result('L', 4000, 50)
+    assert store.to_map_by_ear() == {'R': {500: 30.0}, 'L': {4000: 50.0}}
+    store.clear()
+    assert store.to_map_by_ear() == {'R': {}, 'L': {}}
+
+    session = AudiometrySession()
+    session.add_point('OD', 2000, 15)
+    assert session.points_od == {2000: 15.0} and session.points_os == {}
+    assert session.points_od is session.points_od  # nessuna copia a ogni lettura
+    session.add_point('OD', 4000, 25)
+    assert session.points_od == {2000: 15.0, 4000: 25.0}
+
+
+def test_analysis_accepts_map_or_audiogram():
+    maps = {'R': {500: 20, 1000: 30, 2000: 40, 4000: 60}, 'L': {500: 40, 1000: 50, 2000: 60, 4000: 50}}
+    text = generate_analysis_text(maps, [500, 1000, 2000, 4000])
+    assert text.startswith('Sintesi non clinica: PTA OD 30 dB HL (lieve), PTA OS 50 dB HL (moderata).')
+    assert 'OD: andamento discendente alle alte frequenze; OS: andamento relativamente piatto.' in text
+    assert 'asimmetria significativa' in text
+    assert generate_analysis_text(Audiogram.from_maps(maps), [500, 1000, 2000, 4000]) == text
@@ -0,0 +1,49 @@
+from PySide6.QtWidgets import QApplication
+
+from ui.audiogram_view import AudiogramView
+
+
+def _exam(eid, level):
+    return {'id': eid, 'label': eid, 'OD': {500: level, 1000: level + 5}, 'OS': {'1000': level}}
+
+
+def test_overlays_are_diffed_by_id_and_pooled():
+    app = QApplication.instance() or QApplication([])
+    view = AudiogramView()
+    view.set_overlays([_exam('a', 20), _exam('b', 30)])
+    kept = view._overlays['a']['lines']['OD']
+    items_before = len(view.plot.listDataItems())
+
+    view.set_overlays([_exam('a', 20), _exam('c', 40)])
+    assert view._overlays['a']['lines']['OD'] is kept
+    assert set(view._overlays) == {'a', 'c'}
+    assert len(view.plot.listDataItems()) == items_before  # le linee di 'b' sono riusate per 'c'
+    assert list(view._overlays['c']['lines']['OS'].getData()[1]) == [40.0]
+    assert view._overlays['a']['color'] != view._overlays['c']['color']
+
+    view.clear_overlays()
+    assert len(view._overlay_pool) == 4 and not any(line.isVisible() for line in view._overlay_pool)
+    view.deleteLater()
+    app.processEvents()
+
+
+def test_density_and_band_modes_use_fixed_items():
+    app = QApplication.instance() or QApplication([])
+    view = AudiogramView()
+    exams = [_exam(f'e{i}', 10 + i) for i in range(40)]
+    view.set_overlays(exams)
+    assert view.overlay_mode() == 'density' and not view._overlays
+    x, y = view._summary_items['OD']['density'].getData()
+    assert len(x) == 80  # due punti OD per esame in un solo item
+
+    view.set_overlay_mode('band')
+    _x, median = view._summary_items['OD']['median'].getData()
+    assert list(median) == [29.5, 34.5]
+    items_before = len(view.plot.plotItem.items)
+    view.set_overlays(exams + [_exam('extra', 90)])
+    assert len(view.plot.plotItem.items) == items_before
+
+    view.set_overlay_mode('lines')
+    assert len(view._overlays) == 41 and not view._summary_items['OD']['median'].isVisible()
+    view.deleteLater()
+    app.processEvents()
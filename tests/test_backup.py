@@ -0,0 +1,49 @@
+import datetime
+import os
+
+from backup import incremental
+from backup.incremental import create_backup, list_snapshots, restore_backup, verify_backup
+
+
+def test_incremental_backup_and_verified_restore(tmp_path):
+    tk, qt, dest = tmp_path / 'tk', tmp_path / 'qt', tmp_path / 'bk'
+    os.makedirs(tk / 'patients' / 'PZ0001' / 'screenings')
+    os.makedirs(qt / 'Farmaudiometria' / 'patients')
+    (tk / 'settings.json').write_text('{"volume": 0.5}', encoding='utf-8')
+    (tk / 'patients' / 'PZ0001' / 'profile.json').write_text('{"id": "PZ0001"}', encoding='utf-8')
+    (tk / 'patients' / 'PZ0001' / 'screenings' / 'a.png').write_bytes(b'png' * 100)
+    (qt / 'Farmaudiometria' / 'patients' / 'PZ0002.json').write_text('{"id": "PZ0002"}', encoding='utf-8')
+    sources = {'tk': str(tk), 'qt': str(qt / 'Farmaudiometria')}
+
+    first = create_backup(str(dest), sources, workers=2, now=datetime.datetime(2024, 1, 1, 22))
+    assert (first.files, first.packed, len(first.chunks)) == (4, 4, 1)
+
+    (tk / 'settings.json').write_text('{"volume": 0.7}', encoding='utf-8')
+    (tk / 'patients' / 'PZ0001' / 'screenings' / 'b.png').write_bytes(b'png' * 100)  # contenuto gia' salvato
+    second = create_backup(str(dest), sources, workers=0, now=datetime.datetime(2024, 1, 2, 22))
+    assert (second.files, second.hashed, second.packed) == (5, 2, 1)
+    assert list_snapshots(str(dest)) == ['20240101_220000', '20240102_220000']
+
+    out = tmp_path / 'restore'
+    assert restore_backup(str(dest), str(out)).restored == 5
+    assert (out / 'tk' / 'settings.json').read_text(encoding='utf-8') == '{"volume": 0.7}'
+    assert (out / 'tk' / 'patients' / 'PZ0001' / 'screenings' / 'b.png').read_bytes() == b'png' * 100
+    old = tmp_path / 'old'
+    assert restore_backup(str(dest), str(old), '20240101_220000', workers=0).ok
+    assert (old / 'tk' / 'settings.json').read_text(encoding='utf-8') == '{"volume": 0.5}'
+
+    chunk = dest / 'chunks' / second.chunks[0]
+    chunk.write_bytes(chunk.read_bytes()[:20])
+    report = verify_backup(str(dest))
+    assert [key for key, _ in report.errors] == ['tk/settings.json'] and report.restored == 4
+
+
+def test_chunk_reads_are_bounded_and_streamed(monkeypatch):
+    started = []
+    monkeypatch.setattr(incremental, '_read_chunk', lambda job: started.append(job) or ({}, None))
+    files = {f'f{i}': {'chunk': f'c{i:03d}', 'sha256': f'h{i}'} for i in range(40)}
+    seen = []
+    for chunk, result in incremental._iter_chunk_contents('dest', files, workers=2):
+        assert len(started) - len(seen) <= 4  # workers*2 letture in sospeso al massimo
+        seen.append(chunk)
+    assert sorted(seen) == [f'c{i:03d}' for i in range(40)]
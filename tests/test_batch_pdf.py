@@ -0,0 +1,39 @@
+import json
+import os
+
+import matplotlib
+matplotlib.use('Agg')
+
+from audiometer.export.batch import ERRORS_NAME, _patient_for, run_batch, select_exams
+from audiometry.exam_loader import read_exam
+
+
+def _tk_exam(root, pid, ts, body):
+    folder = root / 'patients' / pid / 'screenings'
+    os.makedirs(folder, exist_ok=True)
+    (root / 'patients' / pid / 'profile.json').write_text(json.dumps({'id': pid, 'cognome': 'Rossi', 'nome': 'Anna'}), encoding='utf-8')
+    path = folder / f'{ts}.json'
+    path.write_text(body, encoding='utf-8')
+    return str(path)
+
+
+def test_batch_renders_resumes_and_isolates_errors(tmp_path):
+    tk, out = tmp_path / 'tk', tmp_path / 'pdf'
+    exam = {'screening': {'patientId': 'PZ0001', 'timestamp': '2024-03-01T09:00:00', 'operator': 'OP'},
+            'soglie': [{'ear': 'R', 'hz': 1000, 'dbhl': 25}, {'ear': 'L', 'hz': 2000, 'dbhl': 40}]}
+    good = _tk_exam(tk, 'PZ0001', '20240301_090000', json.dumps(exam))
+    _tk_exam(tk, 'PZ0002', '20240302_090000', '{"screening": {')  # troncato
+    assert _patient_for(read_exam(good))['cognome'] == 'Rossi'
+
+    paths = select_exams(tk_appdata=str(tk)) + [str(tk / 'patients' / 'PZ0002' / 'screenings' / '20240302_090000.json')]
+    seen = []
+    report = run_batch(paths, str(out), workers=0, progress=lambda done, total, src, err: seen.append((done, total)))
+    assert (report.total, report.done, report.skipped, len(report.failed)) == (2, 1, 0, 1)
+    assert seen == [(1, 2), (2, 2)]
+    pdf = out / 'PZ0001' / 'PZ0001_20240301_090000.pdf'
+    assert pdf.read_bytes().startswith(b'%PDF') and not os.path.exists(str(pdf) + '.tmp')
+    errors = [json.loads(line) for line in (out / ERRORS_NAME).read_text(encoding='utf-8').splitlines()]
+    assert [os.path.basename(e['exam']) for e in errors] == ['20240302_090000.json']
+
+    again = run_batch(paths, str(out), workers=0)
+    assert (again.done, again.skipped, len(again.failed)) == (0, 1, 1)
@@ -0,0 +1,96 @@
+import csv
+import datetime
+import gzip
+import json
+import os
+
+import pytest
+
+from results.bulk_export import ExportFilter, csv_header, export
+
+
+def _tk_exam(root, pid, ts, hp, od):
+    folder = root / 'patients' / pid / 'screenings'
+    os.makedirs(folder, exist_ok=True)
+    payload = {
+        'screening': {'patientId': pid, 'timestamp': ts.isoformat(), 'headphoneId': hp},
+        'soglie': [{'ear': 'R', 'hz': f, 'dbhl': db, 'masked': f == 1000} for f, db in od.items()],
+    }
+    (folder / f'{ts:%Y%m%d_%H%M%S}.json').write_text(json.dumps(payload), encoding='utf-8')
+
+
+def _qt_exam(root, pid, ts, od_map):
+    folder = root / 'Farmaudiometria' / 'audiometries' / pid / f'{ts:%Y}' / f'{ts:%m}'
+    os.makedirs(folder, exist_ok=True)
+    payload = {
+        'schema': 'audiometry.v1', 'created_at': ts.isoformat(), 'patient': {'id': pid},
+        'device': {'name': 'Sennheiser HD', 'wasapi_id': 'HP-QT'},
+        'OD': {str(f): db for f, db in od_map.items()}, 'OS': {'500': 30},
+    }
+    (folder / f'{ts:%Y%m%d_%H%M%S}.json').write_text(json.dumps(payload), encoding='utf-8')
+
+
+def test_export_ndjson_and_csv_with_filters(tmp_path):
+    tk, qt = tmp_path / 'tk', tmp_path / 'qt'
+    _tk_exam(tk, 'PZ0001', datetime.datetime(2023, 5, 1, 9), 'HP1', {500: 10, 1000: 20})
+    _tk_exam(tk, 'PZ0001', datetime.datetime(2024, 3, 1, 9), 'HP2', {500: 15})
+    _tk_exam(tk, 'PZ0002', datetime.datetime(2024, 4, 1, 9), 'HP1', {4000: 40})
+    _qt_exam(qt, 'PZ0003', datetime.datetime(2024, 6, 1, 9), {1000: 25})
+
+    out = tmp_path / 'all.ndjson'
+    assert export(str(out), 'ndjson', str(qt), str(tk), workers=2) == 4
+    records = [json.loads(line) for line in out.read_text(encoding='utf-8').splitlines()]
+    assert [r['patient_id'] for r in records] == ['PZ0003', 'PZ0001', 'PZ0001', 'PZ0002']
+    assert records[0]['headphone'] == 'HP-QT' and records[0]['thresholds']['L'] == {'500': 30.0}
+    assert records[1]['masked']['R'] == [1000]
+
+    flt = ExportFilter(date_from=datetime.date(2024, 1, 1), headphones=frozenset({'hp1', 'sennheiser hd'}))
+    gz = tmp_path / 'sel.csv.gz'
+    assert export(str(gz), 'csv', str(qt), str(tk), flt, workers=0) == 2
+    with gzip.open(gz, 'rt', encoding='utf-8', newline='') as f:
+        rows = list(csv.DictReader(f))
+    assert list(rows[0]) == csv_header()
+    assert [(r['patient_id'], r['R_1000'], r['R_4000']) for r in rows] == [('PZ0003', '25.0', ''), ('PZ0002', '', '40.0')]
+    assert not os.path.exists(str(gz) + '.tmp')
+
+    only = ExportFilter(patients=frozenset({'pz0001'}), date_to=datetime.date(2023, 12, 31))
+    assert export(str(tmp_path / 'one.ndjson'), 'ndjson', str(qt), str(tk), only) == 1
+
+
+def test_tk_exam_saved_with_headphone_matches_filter(tmp_path, monkeypatch):
+    from audiometer.paths import get_app_data_dir
+    from audiometer.screening.results import ResultsStore
+    from audiometer.storage import save_exam
+    from results.bulk_export import iter_exams
+
+    monkeypatch.setenv('XDG_CONFIG_HOME', str(tmp_path))
+    results = ResultsStore()
+    results.add_result('R', 1000, 25)
+    patient = {'id': 'PZ0009', 'nome': 'Anna', 'cognome': 'Rossi'}
+    save_exam(patient, results.to_payload(patient, 'HP-7'), ts='20240301_090000')
+
+    tk = get_app_data_dir()
+    hp7 = ExportFilter(headphones=frozenset({'hp-7'}))
+    assert [e.headphone for e in iter_exams(tk_appdata=tk, flt=hp7)] == ['HP-7']
+    assert not list(iter_exams(tk_appdata=tk, flt=ExportFilter(headphones=frozenset({'altra'}))))
+
+
+class _QuietUI:
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: False
+
+
+def test_controller_headphone_id_reaches_saved_payload(tmp_path, monkeypatch):
+    import sys
+    pytest.importorskip('requests')  # dipendenza dell'esportazione web del controller
+    from audiometer.app_controller import AppController
+
+    monkeypatch.setenv('XDG_CONFIG_HOME', str(tmp_path))
+    monkeypatch.setattr(sys, 'argv', ['audiometer', '--id', 'PZ0009', '--nome', 'Anna', '--cognome', 'Rossi'])
+    ctrl = AppController(_QuietUI())
+    ctrl.set_headphone_id('HP-7')
+    assert ctrl.get_headphone_id() == 'HP-7' and ctrl.settings.last_hp_id == 'HP-7'
+    ctrl._results.add_result('R', 1000, 25)
+    path, _img = ctrl.save_results_local()
+    with open(path, 'r', encoding='utf-8') as f:
+        assert json.load(f)['screening']['headphoneId'] == 'HP-7'
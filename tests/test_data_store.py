@@ -0,0 +1,36 @@
+import json
+
+from audiometer.data_store import patients_store
+from audiometer.data_store.jsonl_log import JsonlLog
+from audiometer.models.patient import Patient
+
+
+def test_patients_jsonl_index_and_compact(tmp_path, monkeypatch):
+    legacy = tmp_path / 'patients.json'
+    legacy.write_text(json.dumps([{'patient_id': 'P1', 'first_name': 'Anna', 'last_name': 'Rossi'}]), encoding='utf-8')
+    monkeypatch.setattr(patients_store, '_log', JsonlLog(str(tmp_path / 'patients.jsonl'), str(legacy)))
+    monkeypatch.setattr(patients_store, '_index', None)
+
+    assert patients_store.get_patient('P1').last_name == 'Rossi'
+    patients_store.add_or_update_patient(Patient('P2', 'Luca', 'Bianchi'))
+    patients_store.add_or_update_patient(Patient('P1', 'Anna', 'Verdi'))
+    assert patients_store.get_patient('P1').last_name == 'Verdi'
+    assert len((tmp_path / 'patients.jsonl').read_text(encoding='utf-8').splitlines()) == 3
+
+    # un nuovo processo ricostruisce lo stesso indice dal log
+    patients_store._reset()
+    assert [p.patient_id for p in patients_store.list_patients()] == ['P1', 'P2']
+    assert patients_store.compact() == 2
+    assert len((tmp_path / 'patients.jsonl').read_text(encoding='utf-8').splitlines()) == 2
+    assert patients_store.get_patient('P1').last_name == 'Verdi'
+
+
+def test_append_after_truncated_tail_keeps_new_record(tmp_path):
+    path = tmp_path / 'results.jsonl'
+    path.write_text('{"id": 1}\n{"id": 2, "trunc', encoding='utf-8')  # crash a meta' riga
+    log = JsonlLog(str(path))
+    assert log.records() == [{'id': 1}]
+    log.append({'id': 3})
+    log.append({'id': 4})
+    log.reset()
+    assert log.records() == [{'id': 1}, {'id': 3}, {'id': 4}]
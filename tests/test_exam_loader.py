@@ -0,0 +1,41 @@
+import json
+import os
+
+from audiometry.exam_loader import ExamCache, SCHEMA_APPS_SCRIPT, SCHEMA_LEGACY, SCHEMA_V1, parse_exam
+
+
+def test_parse_exam_schemas():
+    v1 = parse_exam({
+        'schema': 'audiometry.v1', 'created_at': '2024-05-02T09:30:00', 'patient': {'id': 'P1'},
+        'frequencies_hz': [250, 500], 'OD': {'500': 20}, 'OS': {'250': 15}, 'notes': 'ok',
+    })
+    assert v1.schema == SCHEMA_V1 and v1.patient_id == 'P1'
+    assert v1.right == {500: 20.0} and v1.left == {250: 15.0}
+    assert v1.frequencies == (250, 500) and v1.notes == 'ok'
+
+    apps = parse_exam({
+        'screening': {'patientId': 'PZ0001', 'timestamp': '2024-05-02T09:30:00', 'note': 'n'},
+        'soglie': [{'ear': 'R', 'hz': 1000, 'dbhl': 0, 'masked': True}, {'ear': 'L', 'hz': 1000, 'dbhl': 30}],
+    })
+    assert apps.schema == SCHEMA_APPS_SCRIPT
+    # 0 dB HL e' una soglia valida
+    assert apps.right == {1000: 0.0} and apps.masked['R'] == {1000}
+    assert apps.rows() == [(None, None, 'R', 1000, 0.0), (None, None, 'L', 1000, 30.0)]
+
+    legacy = parse_exam({'thresholds': [{'orecchio': 'SX', 'frequency': '2000', 'level': 40}]},
+                        os.path.join('x', 'PZ0009', 'screenings', '20230101_120000.json'))
+    assert legacy.schema == SCHEMA_LEGACY
+    assert legacy.left == {2000: 40.0} and legacy.patient_id == 'PZ0009'
+    assert legacy.created_at.year == 2023
+
+
+def test_exam_cache_invalidates_on_change(tmp_path):
+    path = tmp_path / 'exam.json'
+    path.write_text(json.dumps({'OD': {'1000': 10}}), encoding='utf-8')
+    cache = ExamCache(maxsize=2)
+    first = cache.get(str(path))
+    assert cache.get(str(path)) is first and cache.hits == 1
+
+    path.write_text(json.dumps({'OD': {'1000': 25, '2000': 30}}), encoding='utf-8')
+    assert cache.get(str(path)).right == {1000: 25.0, 2000: 30.0}
+    assert cache.misses == 2
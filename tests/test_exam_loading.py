@@ -0,0 +1,51 @@
+import json
+import time
+
+from PySide6.QtWidgets import QApplication
+
+from audiometry.exam_loader import shared_cache
+from ui.exam_loading import ExamLoader
+from ui.results_dialog import ResultsDialog
+
+
+def _exam(folder, name, level):
+    path = folder / f'{name}.json'
+    path.write_text(json.dumps({'schema': 'audiometry.v1', 'created_at': '2024-01-01T10:00:00',
+                                'OD': {'1000': level}, 'OS': {}}), encoding='utf-8')
+    return str(path)
+
+
+def test_stale_requests_are_dropped_and_neighbours_prefetched(tmp_path):
+    app = QApplication.instance() or QApplication([])
+    old, new, near = (_exam(tmp_path, name, lvl) for name, lvl in (('old', 10), ('new', 20), ('near', 30)))
+    loader = ExamLoader()
+    got, errors = [], []
+    loader.examLoaded.connect(lambda path, exam: got.append((path, exam.right[1000])))
+    loader.examFailed.connect(lambda path, err: errors.append(path))
+
+    loader.request([old])
+    loader.request([new, str(tmp_path / 'manca.json')], prefetch=[near])
+    loader.wait()
+    app.processEvents()
+
+    assert got == [(new, 20.0)]
+    assert errors == [str(tmp_path / 'manca.json')]
+    assert shared_cache().peek(near) is not None
+
+
+def test_results_dialog_coalesces_overlay_updates(tmp_path):
+    app = QApplication.instance() or QApplication([])
+    exams = [{'path': _exam(tmp_path, f'e{i:02d}', 10 + i), 'created_at': f'2024-01-{i + 1:02d}'} for i in range(30)]
+    dialog = ResultsDialog(str(tmp_path), {'id': 'PZ0001'}, exams=exams)
+    calls = []
+    dialog.graph.set_overlays = lambda overlays: calls.append(len(overlays))
+    dialog.list_widget.selectAll()
+    dialog._loader.wait()
+    deadline = time.monotonic() + 2
+    while calls[-1] < 30 and time.monotonic() < deadline:
+        app.processEvents()
+        time.sleep(0.01)
+    assert calls[-1] == 30
+    assert len(calls) < 10  # non uno per esame arrivato
+    dialog.deleteLater()
+    app.processEvents()
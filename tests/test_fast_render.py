@@ -0,0 +1,31 @@
+import io
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import numpy as np
+from PIL import Image
+
+from audiometer.plotting.audiogram_plot import render_audiogram_image
+from audiometer.plotting.fast_render import get_template, render_audiogram_png_fast
+
+PATIENT = {'id': 'PZ0001', 'nome': 'Mario', 'cognome': 'Rossi'}
+ROWS = [{'ear': 'R', 'freq': f, 'dbhl': 20 + 5 * i} for i, f in enumerate([250, 500, 1000, 4000])] + [{'ear': 'L', 'freq': 1000, 'dbhl': 40}]
+
+
+def test_fast_png_matches_full_render_and_reuses_template():
+    get_template.cache_clear()
+    png = render_audiogram_png_fast(ROWS, PATIENT, 'Cuffia USB')
+    render_audiogram_png_fast(ROWS[:2], dict(PATIENT, id='PZ0002'), 'Cuffia USB')
+    assert get_template.cache_info().hits == 1
+
+    fig, _ = render_audiogram_image(ROWS, PATIENT, 'Cuffia USB')
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png', dpi=150)
+    plt.close(fig)
+    fast = np.asarray(Image.open(io.BytesIO(png)).convert('RGB'), dtype=int)
+    full = np.asarray(Image.open(buf).convert('RGB'), dtype=int)
+    assert fast.shape == full.shape
+    diff = np.abs(fast - full).sum(axis=-1) > 60
+    assert diff.mean() < 0.002  # stesso layout: al piu' qualche pixel di antialiasing
+    assert not diff[:120].any()  # riga del titolo, disegnata a parte sullo sfondo in cache
@@ -0,0 +1,41 @@
+import json
+import os
+
+from results.image_store import ImageStore, migrate_archive
+from results.integrity import check_archive
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 16 + b"IEND\xaeB`\x82"
+
+
+def test_store_dedupes_and_counts_references(tmp_path):
+    store = ImageStore(str(tmp_path / 'images'))
+    d1, p1 = store.store(PNG)
+    d2, p2 = store.store(PNG)
+    assert (d1, p1) == (d2, p2) and store.refcount(d1) == 2
+    assert list(store.iter_digests()) == [d1]
+    # seconda istanza dell'app sullo stesso archivio: i conteggi si sommano, non si sovrascrivono
+    other = ImageStore(str(tmp_path / 'images'))
+    assert other.store(PNG) == (d1, p1) and store.refcount(d1) == 3
+    store.rebuild_refs([])
+    assert other.gc() == [d1] and not os.path.exists(p1)
+
+
+def test_migrate_archive_moves_images_into_store(tmp_path):
+    for pid in ('PZ0001', 'PZ0002'):
+        sdir = tmp_path / 'patients' / pid / 'screenings'
+        os.makedirs(sdir)
+        (tmp_path / 'patients' / pid / 'profile.json').write_text(json.dumps({'id': pid}), encoding='utf-8')
+        (sdir / '20240101_100000.json').write_text(json.dumps({'soglie': [{'ear': 'R', 'hz': 1000, 'dbhl': 20}]}), encoding='utf-8')
+        (sdir / '20240101_100000.png').write_bytes(PNG)
+        entry = {'ts': '20240101_100000', 'path': str(sdir / '20240101_100000.json'), 'image': str(sdir / '20240101_100000.png')}
+        (tmp_path / 'patients' / pid / 'index.json').write_text(json.dumps({'id': pid, 'exams': [entry]}), encoding='utf-8')
+    store = ImageStore(str(tmp_path / 'images'))
+    orphan = store.put_bytes(PNG + b'x')
+
+    stats = migrate_archive(str(tmp_path), store)
+    assert stats['migrated'] == 2 and stats['bytes_after'] < stats['bytes_before'] + len(PNG) + 1
+    entries = [json.loads((tmp_path / 'patients' / pid / 'index.json').read_text(encoding='utf-8'))['exams'][0] for pid in ('PZ0001', 'PZ0002')]
+    assert entries[0]['image'] == entries[1]['image'] and store.refcount(entries[0]['image_sha256']) == 2
+    assert not os.path.exists(tmp_path / 'patients' / 'PZ0001' / 'screenings' / '20240101_100000.png')
+    assert store.gc() == [orphan]
+    assert check_archive(tk_appdata=str(tmp_path), workers=0).ok
@@ -0,0 +1,52 @@
+import json
+import os
+
+from results.integrity import check_archive
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 16 + b"IEND\xaeB`\x82"
+
+
+def _patient(root, pid, exams):
+    pdir = root / 'patients' / pid
+    sdir = pdir / 'screenings'
+    os.makedirs(sdir, exist_ok=True)
+    (pdir / 'profile.json').write_text(json.dumps({'id': pid}), encoding='utf-8')
+    entries = []
+    for ts in exams:
+        path = sdir / f'{ts}.json'
+        path.write_text(json.dumps({'screening': {'patientId': pid}, 'soglie': [{'ear': 'R', 'hz': 1000, 'dbhl': 20}]}), encoding='utf-8')
+        (sdir / f'{ts}.png').write_bytes(PNG)
+        entries.append({'ts': ts, 'path': str(path), 'image': str(sdir / f'{ts}.png')})
+    (pdir / 'index.json').write_text(json.dumps({'id': pid, 'exams': entries}), encoding='utf-8')
+    return pdir
+
+
+def test_check_and_repair_archive(tmp_path):
+    pdir = _patient(tmp_path, 'PZ0001', ['20240101_100000', '20240201_100000', '20240301_100000'])
+    sdir = pdir / 'screenings'
+    os.remove(sdir / '20240101_100000.json')                      # voce dangling
+    os.remove(sdir / '20240201_100000.png')                       # immagine mancante
+    (sdir / '20240301_100000.json').write_text('{"screening": {', encoding='utf-8')  # troncato
+    (sdir / '20240401_100000.json').write_text(json.dumps({'soglie': []}), encoding='utf-8')  # orfano
+    (sdir / 'stray.png').write_bytes(PNG)                         # immagine orfana
+    (sdir / 'broken.png').write_bytes(PNG[:10])                   # troncata
+
+    report = check_archive(tk_appdata=str(tmp_path), workers=0)
+    kinds = sorted({i.kind for i in report.issues})
+    assert kinds == ['corrupt', 'dangling', 'missing_image', 'orphan_exam', 'orphan_image']
+    assert sorted(os.path.basename(i.path) for i in report.by_kind('corrupt')) == ['20240301_100000.json', 'broken.png']
+
+    again = check_archive(tk_appdata=str(tmp_path), workers=0)
+    assert again.checked == 0 and again.reused == report.checked
+
+    fixed = check_archive(tk_appdata=str(tmp_path), repair=True, workers=0)
+    assert fixed.repaired
+    idx = json.loads((pdir / 'index.json').read_text(encoding='utf-8'))
+    assert [(e['ts'], 'image' in e) for e in idx['exams']] == [('20240201_100000', False), ('20240401_100000', False)]
+    assert os.path.exists(pdir / 'quarantine' / '20240301_100000.json')
+    assert os.path.exists(pdir / 'quarantine' / 'broken.png')
+
+    final = check_archive(tk_appdata=str(tmp_path), workers=0)
+    assert {i.kind for i in final.issues} == {'orphan_image'}
+    assert 'stray.png' in {os.path.basename(i.path) for i in final.issues}
+    assert final.checked == 1  # solo index.json riscritto
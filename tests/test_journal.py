@@ -0,0 +1,43 @@
+from audiometry.journal import SessionJournal, find_pending, replay
+from audiometry.session import AudiometrySession
+from audiometer.screening.results import ResultsStore
+
+
+def test_journal_replay_survives_truncated_tail(tmp_path):
+    journal = SessionJournal.create(str(tmp_path), {'patient': {'id': 'PZ0001'}})
+    session = AudiometrySession()
+    session.journal = journal
+    session.add_point('OD', 1000, 20)
+    session.add_point('OS', 2000, 35)
+    journal.close()
+    # simula un crash durante la scrittura dell'ultima riga
+    with open(journal.path, 'a', encoding='utf-8') as fh:
+        fh.write('{"k":"pt","ear":"OD","fr')
+
+    pending = find_pending(str(tmp_path))
+    assert len(pending) == 1
+    assert pending[0].meta['patient']['id'] == 'PZ0001'
+    assert pending[0].points == [('OD', 1000, 20.0), ('OS', 2000, 35.0)]
+
+
+def test_journal_clear_and_complete(tmp_path):
+    journal = SessionJournal.create(str(tmp_path))
+    journal.append_point('R', 500, 10)
+    journal.append_clear()
+    journal.append_point('L', 500, 15)
+    assert replay(journal.path).points == [('L', 500, 15.0)]
+    journal.complete()
+    assert find_pending(str(tmp_path)) == []
+
+
+def test_results_store_discards_journal_on_patient_change(tmp_path):
+    patient = {'id': 'PZ0001'}
+    store = ResultsStore(journal_factory=lambda: SessionJournal.create(str(tmp_path), {'patient': dict(patient)}))
+    store.add_result('R', 1000, 20)
+    store.discard_journal()  # come AppController._set_patient
+    patient = {'id': 'PZ0002'}
+    store.add_result('L', 1000, 30)
+
+    pending = find_pending(str(tmp_path))
+    assert [p.meta['patient']['id'] for p in pending] == ['PZ0002']
+    assert pending[0].points == [('L', 1000, 30.0)]
@@ -0,0 +1,44 @@
+import matplotlib
+matplotlib.use('Agg')
+
+import numpy as np
+
+from audiometer.plotting.audiogram_plot import LiveAudiogram
+
+ROWS = [['PZ', '', 'R', 1000, 30.0], ['PZ', '', 'R', 2000, 45.0], ['PZ', '', 'L', 1000, 25.0]]
+
+
+def _frame(plot):
+    return np.asarray(plot.fig.canvas.buffer_rgba()).astype(int)
+
+
+def test_blit_refresh_skips_full_draws_and_matches_full_render():
+    full, fast = LiveAudiogram(), LiveAudiogram(blit=True)
+    fast.refresh()  # primo disegno completo: sfondo in cache
+
+    draws = []
+    canvas = fast.fig.canvas
+    original = canvas.draw
+    canvas.draw = lambda *a, **k: (draws.append(1), original(*a, **k))
+    for plot in (full, fast):
+        plot.update_rows(ROWS)
+        plot.set_current_freq(2000)
+        plot.set_probe('R', 2000, 50)
+        plot.set_cursor('R', 2000, 50)
+        plot.refresh()
+    assert not draws
+
+    diff = np.abs(_frame(full) - _frame(fast))
+    assert diff.mean() < 1.0  # stesso grafico, a meno dell'ordine di sovrapposizione di griglia e linea verticale
+
+
+def test_toolkit_draws_after_attach_include_animated_artists():
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    full, fast = LiveAudiogram(), LiveAudiogram(blit=True)
+    canvas = FigureCanvasAgg(fast.fig)  # come FigureCanvasTkAgg(...) nella finestra
+    fast.attach(canvas)
+    full.fig.canvas.draw()
+    canvas.draw()  # disegno del toolkit, senza alcun refresh()
+    assert np.abs(_frame(full) - _frame(fast)).mean() < 1.0
+    assert fast._background is not None
@@ -0,0 +1,37 @@
+import multiprocessing
+
+import pytest
+
+from audiometer.data_store.locking import VersionConflict, compare_and_swap, read_json, save_merged, update_json
+
+
+def _append_many(path, tag, n):
+    for i in range(n):
+        update_json(path, lambda idx: dict(idx, exams=idx['exams'] + [f'{tag}{i}']), {'exams': []})
+
+
+def test_concurrent_appends_are_merged(tmp_path):
+    path = str(tmp_path / 'index.json')
+    procs = [multiprocessing.Process(target=_append_many, args=(path, tag, 40)) for tag in 'ab']
+    for p in procs:
+        p.start()
+    _append_many(path, 'c', 40)
+    for p in procs:
+        p.join(30)
+    idx, rev = read_json(path)
+    assert sorted(idx['exams']) == sorted(f'{t}{i}' for t in 'abc' for i in range(40))
+    assert rev == 120
+    with pytest.raises(VersionConflict):
+        compare_and_swap(path, rev - 1, idx)
+
+
+def test_save_merged_keeps_other_writers_keys(tmp_path):
+    path = str(tmp_path / 'settings.json')
+    update_json(path, lambda _: {'volume': 0.5, 'hp': {'L': {'1000': 1.0}}})
+    base, _ = read_json(path)
+    other = dict(base, last_hp_id='HP2')
+    save_merged(path, base, other)                    # prima istanza
+    mine = {'volume': 0.8, 'hp': {'L': {'1000': 1.0, '2000': 3.0}}}
+    merged, rev = save_merged(path, base, mine)       # seconda istanza, copia non aggiornata
+    assert merged == {'volume': 0.8, 'last_hp_id': 'HP2', 'hp': {'L': {'1000': 1.0, '2000': 3.0}}}
+    assert read_json(path) == (merged, rev) and rev == 3
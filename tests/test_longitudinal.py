@@ -0,0 +1,37 @@
+import json
+import os
+
+from audiometry.exam_loader import read_exam
+from results.longitudinal import ShiftTracker, build_series, detect_shifts, scan_all
+
+
+def _exam(tmp_path, pid, ts, od, os_=None):
+    folder = tmp_path / 'patients' / pid / 'screenings'
+    os.makedirs(folder, exist_ok=True)
+    soglie = [{'ear': 'R', 'hz': f, 'dbhl': db} for f, db in od.items()]
+    soglie += [{'ear': 'L', 'hz': f, 'dbhl': db} for f, db in (os_ or {}).items()]
+    path = folder / f'{ts}.json'
+    path.write_text(json.dumps({'screening': {'patientId': pid, 'timestamp': ts}, 'soglie': soglie}), encoding='utf-8')
+    return str(path)
+
+
+def test_detect_and_track_shift(tmp_path):
+    base = {2000: 10, 3000: 15, 4000: 20}
+    p1 = _exam(tmp_path, 'PZ0001', '2023-01-10T10:00:00', base, base)
+    p2 = _exam(tmp_path, 'PZ0001', '2024-01-10T10:00:00', {2000: 20, 3000: 25, 4000: 35}, {2000: 15, 3000: 15, 4000: 25})
+    _exam(tmp_path, 'PZ0002', '2024-02-01T10:00:00', base)
+
+    series = build_series('PZ0001', [read_exam(p2), read_exam(p1)])
+    assert series.paths == [p1, p2]
+    events = detect_shifts(series)
+    assert [(e.ear, round(e.shift_db, 2)) for e in events] == [('OD', 11.67)]
+
+    tracker = ShiftTracker(str(tmp_path / 'longitudinal.json'))
+    assert tracker.update(read_exam(p1)) == []
+    assert [e.ear for e in tracker.update(read_exam(p2))] == ['OD']
+    assert ShiftTracker(str(tmp_path / 'longitudinal.json')).flagged_patients() == ['PZ0001']
+
+    rebuilt = ShiftTracker(str(tmp_path / 'rebuilt.json'))
+    flagged = scan_all(tk_appdata=str(tmp_path), workers=0, tracker=rebuilt)
+    assert list(flagged) == ['PZ0001']
+    assert rebuilt.flagged_patients() == ['PZ0001']
@@ -0,0 +1,49 @@
+import json
+import math
+import os
+
+from results.archive import iter_archive_exams
+from results.packed_archive import PackedArchive, export_archive
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+
+
+def test_export_and_memmap_read(tmp_path):
+    qt = tmp_path / 'qt'
+    tk = tmp_path / 'tk'
+    _write(str(qt / 'Farmaudiometria' / 'audiometries' / 'P1' / '2024' / '03' / '20240301_100000.json'), {
+        'schema': 'audiometry.v1', 'created_at': '2024-03-01T10:00:00',
+        'patient': {'id': 'P1'}, 'device': {'name': 'HD280'},
+        'OD': {'1000': 20.0, '4000': 45.0}, 'OS': {'1000': 25.0},
+    })
+    _write(str(tk / 'patients' / 'PZ0002' / 'screenings' / '20241105_090000.json'), {
+        'screening': {'patientId': 'PZ0002', 'timestamp': '2024-11-05T09:00:00', 'operator': 'Mario', 'device': 'Headphones'},
+        'soglie': [{'ear': 'L', 'hz': 500, 'dbhl': 30, 'masked': True}],
+    })
+    _write(str(tk / 'patients' / 'PZ0002' / 'screenings' / '20230105_090000.json'), {
+        'screening': {'patientId': 'PZ0002', 'timestamp': '2023-01-05T09:00:00'},
+        'soglie': [{'ear': 'R', 'hz': 2000, 'dbhl': 10}],
+    })
+
+    paths = export_archive(iter_archive_exams(str(qt), str(tk)), str(tmp_path / 'out'), 'centro')
+    assert [os.path.basename(p) for p in paths] == ['centro_2023.fapk', 'centro_2024.fapk']
+
+    arc = PackedArchive(paths[1])
+    assert len(arc) == 2
+    assert arc.thresholds.shape == (2, 2, len(arc.freqs))
+    j1000 = list(arc.freqs).index(1000)
+    j500 = list(arc.freqs).index(500)
+    assert arc.thresholds[0, 0, j1000] == 20.0 and arc.thresholds[0, 1, j1000] == 25.0
+    assert math.isnan(arc.thresholds[0, 1, j500])
+    assert arc.measured[0].sum() == 3
+    assert arc.masked[1, 1, j500]
+    assert arc.column_strings('patient') == ['P1', 'PZ0002']
+    assert arc.column_strings('operator')[1] == 'Mario'
+    assert list(arc.rows_for_patient('PZ0002')) == [1]
+    assert str(arc.timestamps[0]) == '2024-03-01T10:00:00'
+    assert not arc.thresholds.flags.writeable
+    arc.close()
@@ -0,0 +1,91 @@
+import threading
+
+from patient.repo import PatientRepo
+from patient.search import PatientSearchIndex
+
+
+PATIENTS = [
+    {"id": "PZ0001", "cognome": "Rossi", "nome": "Mario", "birth_date": "1950-03-12"},
+    {"id": "PZ0002", "cognome": "Rossini", "nome": "Anna", "birth_date": "1962-11-05"},
+    {"id": "PZ0003", "cognome": "Bianchi", "nome": "Giulia", "birth_date": "1985-06-01"},
+    {"id": "PZ0004", "cognome": "De Luca", "nome": "Nicolò", "birth_date": "1990-01-20"},
+    {"id": "PZ0005", "cognome": "Esposito", "nome": "Mario", "birth_date": "1985-09-30"},
+]
+
+
+def _ids(results):
+    return [p["id"] for p in results]
+
+
+def test_prefix_search_is_lazy_and_covers_all_fields():
+    calls = []
+    index = PatientSearchIndex(loader=lambda: calls.append(1) or PATIENTS)
+    assert not index.built and not calls
+
+    assert _ids(index.search("")) == ["PZ0003", "PZ0004", "PZ0005", "PZ0001", "PZ0002"]
+    assert _ids(index.search("ros", fuzzy=False)) == ["PZ0001", "PZ0002"]
+    assert _ids(index.search("mario", fuzzy=False)) == ["PZ0005", "PZ0001"]
+    assert _ids(index.search("pz0003", fuzzy=False)) == ["PZ0003"]
+    assert _ids(index.search("1985", fuzzy=False)) == ["PZ0003", "PZ0005"]
+    assert _ids(index.search("01/06/1985", fuzzy=False)) == ["PZ0003"]
+    assert _ids(index.search("nicolo", fuzzy=False)) == ["PZ0004"]
+    assert _ids(index.search("deluca", fuzzy=False)) == ["PZ0004"]
+    # tutte le parole devono corrispondere
+    assert _ids(index.search("mario ros", fuzzy=False)) == ["PZ0001"]
+    assert index.search("anna bianchi", fuzzy=False) == []
+    assert calls == [1]
+
+
+def test_fuzzy_matches_typos_after_exact_results():
+    index = PatientSearchIndex(loader=lambda: PATIENTS)
+    assert _ids(index.search("esposto"))[:1] == ["PZ0005"]
+    assert _ids(index.search("gulia bianchi")) == ["PZ0003"]
+    assert _ids(index.search("rossi"))[:2] == ["PZ0001", "PZ0002"]
+    assert index.search("zzzz") == []
+
+
+def test_incremental_updates_and_repo_hook(tmp_path):
+    index = PatientSearchIndex(loader=lambda: PATIENTS)
+    index.search("")
+    index.add({"id": "PZ0006", "cognome": "Zanardi", "nome": "Ugo"})
+    assert _ids(index.search("zan")) == ["PZ0006"]
+    index.update("PZ0006", cognome="Zamboni")
+    assert index.search("zanardi", fuzzy=False) == []
+    index.update("PZ0006", last_ts="20240101_100000")
+    assert index.search("zamb")[0]["last_ts"] == "20240101_100000"
+    index.remove("PZ0006")
+    assert index.search("zamb") == []
+
+    repo = PatientRepo(str(tmp_path))
+    repo.save(dict(PATIENTS[0]))
+    assert _ids(repo.search("ros")) == ["PZ0001"]
+    repo.save({"id": "PZ0002", "cognome": "Rossini", "nome": "Anna"})
+    assert _ids(repo.search("ros")) == ["PZ0001", "PZ0002"]
+
+
+def test_warm_builds_in_background_and_reports_loading():
+    release = threading.Event()
+    calls = []
+
+    def loader():
+        calls.append(1)
+        release.wait(5)
+        return PATIENTS
+
+    index = PatientSearchIndex(loader=loader)
+    thread = index.warm()
+    assert index.warm() is thread  # una sola costruzione
+    assert index.loading and not index.built
+    # salvato dopo che il loader ha letto l'elenco: attende la costruzione, non va perso
+    saver = threading.Thread(target=index.add, args=({"id": "PZ0009", "cognome": "Rosa", "nome": "Ugo"},))
+    saver.start()
+    saver.join(0.1)
+    assert saver.is_alive()
+    release.set()
+    thread.join(5)
+    saver.join(5)
+    index.update("PZ0404", last_ts="20240101_100000")  # id sconosciuto: ignorato
+    assert index.built and not index.loading
+    assert _ids(index.search("ros", fuzzy=False)) == ["PZ0009", "PZ0001", "PZ0002"]
+    assert "PZ0404" not in index.records
+    assert calls == [1]
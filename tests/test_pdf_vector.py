@@ -0,0 +1,59 @@
+import subprocess
+import sys
+
+import matplotlib
+matplotlib.use('Agg')
+
+from audiometer.plotting.audiogram_plot import render_audiogram_png
+from export.pdf import build_pdf_report_v3
+
+OD = {250: 20, 500: 25, 1000: 30, 2000: 45, 4000: 60}
+OS = {250: 15, 500: 20, 1000: 35, 2000: 50, 4000: 70}
+
+
+def _report(path, png=None):
+    build_pdf_report_v3(str(path), {'id': 'PZ0001', 'cognome': 'Rossi'}, {'name': 'Cuffia'},
+                        {'created_at': '2024-03-01'}, 'note', '', png, 'tabella', '', od_map=OD, os_map=OS)
+    return path.read_bytes()
+
+
+def test_vector_audiogram_is_smaller_than_raster(tmp_path):
+    vector = _report(tmp_path / 'vector.pdf')
+    assert vector.startswith(b'%PDF') and b'/Subtype /Image' not in vector
+
+    rows = [{'ear': 'R', 'freq': f, 'dbhl': v} for f, v in OD.items()]
+    png = tmp_path / 'graph.png'
+    png.write_bytes(render_audiogram_png(rows, {'id': 'PZ0001'}, 'Cuffia'))
+    raster = _report(tmp_path / 'raster.pdf', str(png))
+    assert len(vector) * 3 < len(raster)
+
+
+def test_vector_report_does_not_need_qt(tmp_path):
+    code = ("import sys, export.pdf; "
+            "export.pdf.build_pdf_report_v3(sys.argv[1], {}, {}, {}, '', '', None, '', '', od_map={1000: 30}); "
+            "assert 'PySide6' not in sys.modules")
+    out = tmp_path / 'headless.pdf'
+    subprocess.run([sys.executable, '-c', code, str(out)], check=True)
+    assert out.read_bytes().startswith(b'%PDF')
+
+
+def test_single_ear_history_exam_does_not_borrow_live_session(tmp_path, monkeypatch):
+    monkeypatch.setenv('APPDATA', str(tmp_path))
+    from PySide6.QtWidgets import QApplication
+    import ui.main_window as mw
+
+    app = QApplication.instance() or QApplication([])
+    win = mw.MainWindow()
+    win.session.add_point('OS', 1000, 80)  # sessione in corso, altro assistito
+    win._history_selected_exam = {'data': {'patient': {'id': 'PZ0002'}}, 'od': {1000: 30.0}, 'os': {}, 'freqs': [1000]}
+    calls = []
+    monkeypatch.setattr(mw.QFileDialog, 'getSaveFileName', lambda *a, **k: (str(tmp_path / 'r.pdf'), ''))
+    monkeypatch.setattr(mw, 'build_pdf_report_v3', lambda *a, **k: calls.append((a, k)))
+    win.create_pdf_report()
+
+    args, kwargs = calls[0]
+    assert kwargs['od_map'] == {1000: 30.0} and kwargs['os_map'] == {}
+    assert '80' not in args[7].splitlines()[2]  # riga OS della tabella
+    win.close()
+    win.deleteLater()
+    app.processEvents()
@@ -0,0 +1,28 @@
+import os
+import tempfile
+
+from PySide6.QtWidgets import QApplication
+
+from export.pdf import build_pdf_report_v3
+from ui.audiogram_view import AudiogramView
+
+
+def test_graph_png_flows_to_pdf_without_files(tmp_path, monkeypatch):
+    app = QApplication.instance() or QApplication([])
+    view = AudiogramView()
+    view.resize(600, 400)
+    view.update_points('OD', {500: 20, 1000: 35, 2000: 50})
+
+    def _no_temp(*args, **kwargs):
+        raise AssertionError('file temporaneo non previsto')
+    monkeypatch.setattr(tempfile, 'NamedTemporaryFile', _no_temp)
+    monkeypatch.setattr(tempfile, 'mkstemp', _no_temp)
+
+    png = view.export_png_bytes(hide_crosshair=True)
+    assert png.startswith(b'\x89PNG\r\n\x1a\n')
+    out = tmp_path / 'report.pdf'
+    build_pdf_report_v3(str(out), {}, {}, {}, '', '', png, '', '')
+    assert b'/Subtype /Image' in out.read_bytes()
+    assert os.listdir(tmp_path) == ['report.pdf']
+    view.deleteLater()
+    app.processEvents()
@@ -0,0 +1,61 @@
+import json
+import os
+
+import numpy as np
+
+from results.population import (
+    PopulationTable, asymmetry_prevalence, load_population, monthly_trend, pta_by_age_sex, frequency_percentiles,
+)
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+
+
+def test_load_and_aggregate(tmp_path):
+    qt = tmp_path / 'qt'
+    tk = tmp_path / 'tk'
+    _write(str(qt / 'Farmaudiometria' / 'audiometries' / 'P1' / '2024' / '01' / 'a.json'), {
+        'schema': 'audiometry.v1', 'created_at': '2024-01-10T10:00:00',
+        'patient': {'id': 'P1', 'eta': 65, 'sex': 'F'},
+        'OD': {'500': 20, '1000': 30, '2000': 40}, 'OS': {'500': 40, '1000': 50, '2000': 60},
+    })
+    _write(str(tk / 'patients' / 'PZ0002' / 'profile.json'), {'id': 'PZ0002', 'birth_date': '1990-06-01', 'sex': 'M'})
+    _write(str(tk / 'patients' / 'PZ0002' / 'screenings' / '20240215_090000.json'), {
+        'screening': {'patientId': 'PZ0002', 'timestamp': '2024-02-15T09:00:00'},
+        'soglie': [{'ear': 'R', 'hz': 1000, 'dbhl': 10}, {'ear': 'L', 'hz': 1000, 'dbhl': 15}],
+    })
+
+    table = load_population(str(qt), str(tk), workers=0)
+    assert len(table) == 2
+    assert sorted(table.patient_ids.tolist()) == ['P1', 'PZ0002']
+
+    groups = {(g['age_band'], g['sex']): g for g in pta_by_age_sex(table)}
+    assert groups[('60-70', 'F')]['mean'] == 30.0
+    assert groups[('18-40', 'M')]['n'] == 1
+
+    prev = asymmetry_prevalence(table)
+    assert prev == {'eligible': 1, 'asymmetric': 1, 'prevalence': 1.0}
+
+    months = monthly_trend(table)
+    assert [m['month'] for m in months] == ['2024-01', '2024-02']
+    assert months[1]['pta_os'] == 15.0
+
+    pct = frequency_percentiles(table, (50,))
+    j = table.freqs.tolist().index(1000)
+    assert pct[0, 0, j] == 20.0
+
+
+def test_vectorized_aggregates_on_synthetic_table():
+    rng = np.random.default_rng(0)
+    n = 20000
+    freqs = np.array([500, 1000, 2000, 4000], dtype=np.int32)
+    thr = rng.integers(0, 80, size=(n, 2, 4)).astype(np.float32)
+    table = PopulationTable(freqs, thr, np.full(n, np.datetime64('2024-03-01T00:00:00'), dtype='datetime64[s]'),
+                            rng.integers(10, 90, n).astype(np.float32), rng.integers(0, 3, n).astype(np.uint8),
+                            np.array([str(i) for i in range(n)], dtype=object))
+    assert sum(g['n'] for g in pta_by_age_sex(table)) == n
+    assert monthly_trend(table)[0]['n'] == n
+    assert 0.0 < asymmetry_prevalence(table)['prevalence'] < 1.0
@@ -0,0 +1,41 @@
+import json
+import time
+
+from config.settings_service import AudiometerSettings, SettingsService
+
+
+def test_typed_model_notifies_and_coalesces_writes(tmp_path):
+    path = tmp_path / 'settings.json'
+    path.write_text(json.dumps({'step_db': '10', 'frequencies_hz': ['500', 1000], 'custom': 'x'}), encoding='utf-8')
+    service = SettingsService(str(path), AudiometerSettings, delay=0.05)
+    settings = service.model
+    assert (settings.step_db, settings.frequencies_hz, settings.max_level_dbhl) == (10, [500, 1000], 100)
+    assert settings['custom'] == 'x' and settings.get('missing', 3) == 3
+
+    seen = []
+    service.subscribe(lambda key, value: seen.append((key, value)))
+    settings.last_hp_id = 'HP1'
+    settings['isi_ms_min'] = '900'
+    settings.last_hp_id = 'HP1'                               # invariato: nessuna notifica
+    assert seen == [('last_hp_id', 'HP1'), ('isi_ms_min', 900)]
+    assert 'last_hp_id' not in json.loads(path.read_text(encoding='utf-8'))  # scrittura differita
+
+    other = json.loads(path.read_text(encoding='utf-8'))      # altra istanza
+    other['default_output_device'] = 'USB'
+    path.write_text(json.dumps(other), encoding='utf-8')
+    time.sleep(0.3)
+    saved = json.loads(path.read_text(encoding='utf-8'))
+    assert (saved['last_hp_id'], saved['isi_ms_min'], saved['default_output_device'], saved['custom']) == ('HP1', 900, 'USB', 'x')
+    assert settings.default_output_device == 'USB'
+    assert not service.flush()
+
+
+def test_null_or_invalid_values_fall_back_to_defaults(tmp_path):
+    path = tmp_path / 'settings.json'
+    path.write_text(json.dumps({'step_db': None, 'isi_ms_min': 'abc', 'frequencies_hz': None,
+                                'default_output_device': None}), encoding='utf-8')
+    settings = SettingsService(str(path), AudiometerSettings, delay=0).model
+    assert (settings.step_db, settings.isi_ms_min) == (5, 1200)
+    assert settings.frequencies_hz[:2] == [125, 250] and settings.default_output_device is None
+    settings['max_level_dbhl'] = None
+    assert settings.max_level_dbhl == 100
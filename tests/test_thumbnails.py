@@ -0,0 +1,72 @@
+import json
+import os
+
+from PySide6.QtWidgets import QApplication
+
+from ui.status_panel import HistoryPanel
+from ui.thumbnails import ThumbnailCache, ThumbnailLoader
+
+
+def _exam(folder, name, level):
+    path = folder / f'{name}.json'
+    path.write_text(json.dumps({'schema': 'audiometry.v1', 'created_at': f'2024-01-{name[-2:]}T10:00:00',
+                                'OD': {'500': level, '1000': level + 10}, 'OS': {'1000': level}}), encoding='utf-8')
+    return str(path)
+
+
+def test_thumbnail_cache_keyed_by_path_and_mtime(tmp_path):
+    app = QApplication.instance() or QApplication([])
+    exam = _exam(tmp_path, 'esame01', 30)
+    cache = ThumbnailCache(str(tmp_path / 'cache'))
+    first = cache.cache_path(exam)
+    assert not cache.get(exam).isNull() and os.path.exists(first)
+
+    st = os.stat(exam)
+    os.utime(exam, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    assert cache.cache_path(exam) != first  # esame modificato: nuova miniatura
+    assert cache.get(str(tmp_path / 'manca.json')) is None
+    app.processEvents()
+
+
+def test_history_panel_requests_only_visible_rows(tmp_path):
+    app = QApplication.instance() or QApplication([])
+    exams = [{'path': _exam(tmp_path, f'esame{i:02d}', 20 + i), 'created_at': f'2024-01-{i:02d}'} for i in range(1, 41)]
+    loader = ThumbnailLoader(ThumbnailCache(str(tmp_path / 'cache')))
+    panel = HistoryPanel()
+    panel.resize(240, 300)
+    panel.show()
+    panel.set_thumbnail_loader(loader)
+    panel.set_exams(exams)
+    panel._request_visible_thumbnails()
+    loader.wait()
+    app.processEvents()
+
+    ready = [e['path'] for e in exams if loader.pixmap(e['path']) is not None]
+    assert ready and len(ready) < len(exams)
+    assert not panel.list_widget.item(0).icon().isNull()
+    panel.close()
+    panel.deleteLater()
+    app.processEvents()
+
+
+def test_loader_keys_on_mtime_and_remembers_failures(tmp_path):
+    app = QApplication.instance() or QApplication([])
+    loader = ThumbnailLoader(ThumbnailCache(str(tmp_path / 'cache')))
+    exam = _exam(tmp_path, 'esame01', 30)
+    loader.request(exam)
+    loader.wait()
+    app.processEvents()
+    assert loader.pixmap(exam) is not None
+
+    st = os.stat(exam)
+    os.utime(exam, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    assert loader.pixmap(exam) is None  # riscritto: la miniatura vecchia non vale piu'
+
+    broken = tmp_path / 'rotto.json'
+    broken.write_text('{non json', encoding='utf-8')
+    loader.request(str(broken))
+    loader.wait()
+    app.processEvents()
+    assert loader.failed(str(broken))
+    loader.request(str(broken))
+    assert not loader._pending  # nessun nuovo tentativo finche' il file non cambia
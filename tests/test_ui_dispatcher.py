@@ -0,0 +1,53 @@
+import threading
+
+from audiometer.ui.dispatcher import UIDispatcher
+
+
+def test_updates_coalesce_per_frame_and_repaint_runs_last():
+    scheduled, log = [], []
+    disp = UIDispatcher(lambda ms, fn: scheduled.append(fn))
+
+    def worker():
+        for level in range(0, 100, 5):
+            disp.post('level', log.append, ('level', level))
+            disp.repaint('plot', log.append, ('repaint', level))
+        disp.send(log.append, ('soglia', 95))
+
+    threads = [threading.Thread(target=worker) for _ in range(2)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(scheduled) == 1  # una sola pianificazione per frame
+    scheduled.pop()()
+
+    # stato: vince l'ultimo; eventi tutti; un solo ridisegno, dopo gli aggiornamenti
+    assert sorted(log[:3]) == [('level', 95), ('soglia', 95), ('soglia', 95)]
+    assert log[3:] == [('repaint', 95)]
+    stats = disp.stats()
+    assert stats.posted == 82 and stats.executed == 4 and stats.coalesced == 78
+    assert stats.frames == 1 and stats.depth == 0 and stats.max_depth >= 2
+    assert not scheduled
+
+
+def test_without_scheduler_updates_run_immediately():
+    log = []
+    disp = UIDispatcher(None)
+    disp.post('status', log.append, 1)
+    disp.send(log.append, 2)
+    assert log == [1, 2]
+
+
+def test_reschedule_during_shutdown_runs_directly():
+    scheduled, log = [], []
+
+    def schedule(ms, fn):
+        if scheduled:
+            raise RuntimeError('application has been destroyed')  # come TclError a finestra chiusa
+        scheduled.append(fn)
+
+    disp = UIDispatcher(schedule)
+    # un aggiornamento che ne accoda un altro mentre il frame e' in esecuzione
+    disp.post('a', lambda: (log.append('a'), disp.post('b', log.append, 'b')))
+    scheduled[0]()
+    assert log == ['a', 'b'] and disp.stats().depth == 0
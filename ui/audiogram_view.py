@@ -2,14 +2,14 @@ from __future__ import annotations
 from typing import Optional, Dict, Sequence, Any, List
 from PySide6.QtWidgets import QWidget, QVBoxLayout, QApplication
 from PySide6.QtCore import QBuffer, QIODevice, Qt
-from PySide6.QtGui import QColor, QBrush
+from PySide6.QtGui import QColor, QBrush, QImage
 from PySide6 import QtWidgets
+import numpy as np
 import pyqtgraph as pg
 from pyqtgraph.exporters import ImageExporter
-import tempfile
-import os
 
-FREQS = [125, 250, 500, 750, 1000, 1500, 2000, 3000, 4000, 6000, 8000]
+from audiometry.audiogram import FREQS
+
 FREQ_POS = {freq: idx for idx, freq in enumerate(FREQS)}
 LOSS_REGIONS = [
     (-10, 20, QColor('#e8f5e9'), 'Normale'),
@@ -26,6 +26,11 @@ BACKGROUND_COLOR = QColor('#ffffff')
 LEGEND_BRUSH_COLOR = QColor(255, 255, 255, 235)
 LOSS_REGION_OPACITY = 0.45
 GRID_ALPHA = 0.3
+# modi degli overlay: una linea per esame, tutte le linee in un solo item, mediana e IQR
+OVERLAY_MODES = ('lines', 'density', 'band')
+# in modo 'auto' oltre questa soglia si passa a 'density'
+OVERLAY_DENSITY_THRESHOLD = 12
+OVERLAY_EAR_COLORS = {'OD': (212, 63, 58), 'OS': (31, 119, 180)}
 
 
 class AudiogramView(QWidget):
@@ -39,7 +44,13 @@ class AudiogramView(QWidget):
         layout.addWidget(self.plot)
         self._data: Dict[str, Dict[int, float]] = {"OD": {}, "OS": {}}
         self._series: Dict[str, Dict[str, pg.GraphicsObject]] = {}
-        self._overlay_items: List[pg.GraphicsObject] = []
+        # overlay attivi per ID esame e linee nascoste pronte al riuso
+        self._overlays: Dict[str, Dict[str, Any]] = {}
+        self._overlay_pool: List[pg.PlotDataItem] = []
+        self._crosshair: Optional[tuple] = None
+        self._overlay_mode = 'auto'
+        self._overlay_exams: List[Dict[str, Any]] = []
+        self._summary_items: Dict[str, Dict[str, pg.GraphicsObject]] = {}
         self.legend: Optional[pg.LegendItem] = None
         self.hline: Optional[pg.InfiniteLine] = None
         self.vline: Optional[pg.InfiniteLine] = None
@@ -116,77 +127,207 @@ class AudiogramView(QWidget):
         if ear not in self._series:
             raise ValueError("ear deve essere 'OD' o 'OS'.")
         clean_data = {int(freq): float(level) for freq, level in data.items() if int(freq) in FREQS}
+        if clean_data == self._data[ear]:
+            return  # navigazione da tastiera: nessun punto cambiato
         self._data[ear] = clean_data
         ordered_freqs = [freq for freq in FREQS if freq in clean_data]
         positions = [FREQ_POS[freq] for freq in ordered_freqs]
         levels = [clean_data[freq] for freq in ordered_freqs]
         series = self._series[ear]
         series['line'].setData(positions, levels)
-        pen = series['line'].opts['pen']
-        marker_brush = series.get('brush')
-        spots = []
-        for pos, level, freq in zip(positions, levels, ordered_freqs):
-            spots.append({
-                'pos': (pos, level),
-                'brush': pg.mkBrush(marker_brush) if marker_brush is not None else pg.mkBrush(0, 0, 0, 0),
-                'pen': pen,
-                'symbol': series['symbol'],
-                'size': 12,
-                'data': {'tooltip': f"{ear} {freq} Hz\n{level:.1f} dB HL"},
-            })
-        series['scatter'].setData(spots)
+        # penna, pennello e simbolo restano quelli impostati alla creazione dello scatter
+        series['scatter'].setData(
+            x=positions,
+            y=levels,
+            data=[{'tooltip': f"{ear} {freq} Hz\n{level:.1f} dB HL"} for freq, level in zip(ordered_freqs, levels)],
+        )
 
     def update_crosshair(self, freq: int, level: float) -> None:
         pos = FREQ_POS.get(freq)
-        if pos is None:
+        if pos is None or self._crosshair == (pos, level):
             return
+        self._crosshair = (pos, level)
         if self.hline is not None:
             self.hline.setPos(level)
         if self.vline is not None:
             self.vline.setPos(pos)
 
+    def _acquire_line(self) -> pg.PlotDataItem:
+        if self._overlay_pool:
+            line = self._overlay_pool.pop()
+            line.setVisible(True)
+            return line
+        line = pg.PlotDataItem([], [])
+        self.plot.addItem(line)
+        return line
+
+    def _release_line(self, line: pg.PlotDataItem) -> None:
+        if self.legend:
+            self.legend.removeItem(line)
+        line.setData([], [])
+        line.setVisible(False)
+        self._overlay_pool.append(line)
+
+    def _release_overlay(self, key: str) -> None:
+        entry = self._overlays.pop(key)
+        for line in entry['lines'].values():
+            self._release_line(line)
+
+    def _release_overlays(self) -> None:
+        for key in list(self._overlays):
+            self._release_overlay(key)
+
     def clear_overlays(self) -> None:
-        for item in self._overlay_items:
-            try:
-                self.plot.removeItem(item)
-                if self.legend:
-                    self.legend.removeItem(item)
-            except Exception:
-                pass
-        self._overlay_items.clear()
+        self._overlay_exams = []
+        self._release_overlays()
+        self._hide_summary()
+
+    @staticmethod
+    def _overlay_key(exam: Dict[str, Any], idx: int) -> str:
+        key = exam.get('id') or exam.get('path')
+        return str(key) if key else f"{exam.get('label', '')}#{idx}"
+
+    @staticmethod
+    def _overlay_series(ear_data: Dict[Any, Any]) -> tuple:
+        pos_list: List[int] = []
+        level_list: List[float] = []
+        for freq in FREQS:
+            value = ear_data.get(freq)
+            if value is None:
+                value = ear_data.get(str(freq))
+            if value is None:
+                continue
+            pos_list.append(FREQ_POS[freq])
+            level_list.append(float(value))
+        return tuple(pos_list), tuple(level_list)
+
+    def set_overlay_mode(self, mode: str) -> None:
+        """'lines', 'density', 'band' oppure 'auto' (linee fino a OVERLAY_DENSITY_THRESHOLD esami)."""
+        if mode != 'auto' and mode not in OVERLAY_MODES:
+            raise ValueError(f"Modo overlay non valido: {mode}")
+        if mode != self._overlay_mode:
+            self._overlay_mode = mode
+            self.set_overlays(self._overlay_exams)
+
+    def overlay_mode(self) -> str:
+        """Modo effettivo per gli overlay correnti."""
+        if self._overlay_mode != 'auto':
+            return self._overlay_mode
+        return 'density' if len(self._overlay_exams) > OVERLAY_DENSITY_THRESHOLD else 'lines'
 
     def set_overlays(self, exams: Sequence[Dict[str, Any]]) -> None:
-        self.clear_overlays()
-        if not exams:
+        """Allinea gli overlay all'elenco: solo gli esami entrati o usciti toccano la scena."""
+        self._overlay_exams = list(exams or [])
+        mode = self.overlay_mode()
+        if mode != 'lines':
+            self._release_overlays()
+            self._draw_summary(mode)
             return
+        self._hide_summary()
         colors = ['#2ca02c', '#ff7f0e', '#9467bd', '#8c564b', '#17becf', '#7f7f7f']
-        for idx, exam in enumerate(exams):
-            color = colors[idx % len(colors)]
+        wanted = {self._overlay_key(exam, idx): (idx, exam) for idx, exam in enumerate(self._overlay_exams)}
+        for key in [key for key in self._overlays if key not in wanted]:
+            self._release_overlay(key)
+        for key, (idx, exam) in wanted.items():
+            entry = self._overlays.get(key)
+            if entry is None:
+                # colore stabile finche' l'esame resta selezionato
+                used = {other['color'] for other in self._overlays.values()}
+                free = [c for c in range(len(colors)) if c not in used]
+                entry = self._overlays[key] = {'color': free[0] if free else idx % len(colors), 'lines': {}, 'state': {}}
             label = exam.get('label', f"Esame {idx + 1}")
             for ear in ('OD', 'OS'):
-                ear_data = exam.get(ear, {}) or {}
-                pos_list: List[int] = []
-                level_list: List[float] = []
-                for freq in FREQS:
-                    value = ear_data.get(freq)
-                    if value is None:
-                        value = ear_data.get(str(freq))
-                    if value is None:
-                        continue
-                    pos_list.append(FREQ_POS[freq])
-                    level_list.append(float(value))
-                if not pos_list:
+                positions, levels = self._overlay_series(exam.get(ear, {}) or {})
+                line = entry['lines'].get(ear)
+                if not positions:
+                    if line is not None:
+                        self._release_line(entry['lines'].pop(ear))
+                        entry['state'].pop(ear, None)
                     continue
-                pen_style = Qt.SolidLine if ear == 'OD' else Qt.DashLine
-                pen = pg.mkPen(color=color, width=1.5, style=pen_style)
-                line = pg.PlotDataItem(pos_list, level_list, pen=pen)
-                self.plot.addItem(line)
-                legend_label = f"{label} - {ear}"
+                state = (positions, levels, label)
+                if line is not None and entry['state'].get(ear) == state:
+                    continue
+                if line is None:
+                    line = entry['lines'][ear] = self._acquire_line()
+                    pen_style = Qt.SolidLine if ear == 'OD' else Qt.DashLine
+                    line.setPen(pg.mkPen(color=colors[entry['color']], width=1.5, style=pen_style))
+                elif self.legend:
+                    self.legend.removeItem(line)
+                line.setData(list(positions), list(levels))
                 if self.legend:
-                    self.legend.addItem(line, legend_label)
-                self._overlay_items.append(line)
+                    self.legend.addItem(line, f"{label} - {ear}")
+                entry['state'][ear] = state
 
-    def save_png(self, out_path: str, hide_crosshair: bool = False, width: int | None = None) -> None:
+    @staticmethod
+    def _overlay_matrix(exams: Sequence[Dict[str, Any]], ear: str) -> np.ndarray:
+        """Soglie (esami x FREQS), NaN dove manca il valore."""
+        matrix = np.full((len(exams), len(FREQS)), np.nan)
+        for row, exam in enumerate(exams):
+            ear_data = exam.get(ear, {}) or {}
+            for freq, value in ear_data.items():
+                pos = FREQ_POS.get(int(freq))
+                if pos is not None and value is not None:
+                    matrix[row, pos] = float(value)
+        return matrix
+
+    def _summary_for(self, ear: str) -> Dict[str, pg.GraphicsObject]:
+        items = self._summary_items.get(ear)
+        if items is None:
+            r, g, b = OVERLAY_EAR_COLORS[ear]
+            style = Qt.SolidLine if ear == 'OD' else Qt.DashLine
+            density = pg.PlotDataItem([], [], pen=pg.mkPen((r, g, b, 60), width=1, style=style))
+            median = pg.PlotDataItem([], [], pen=pg.mkPen((r, g, b), width=2.5, style=style))
+            low = pg.PlotCurveItem([], [], pen=pg.mkPen(None))
+            high = pg.PlotCurveItem([], [], pen=pg.mkPen(None))
+            band = pg.FillBetweenItem(low, high, brush=pg.mkBrush(r, g, b, 50))
+            for item in (band, low, high, density, median):
+                item.setVisible(False)
+                self.plot.addItem(item)
+            items = self._summary_items[ear] = {
+                'density': density, 'median': median, 'low': low, 'high': high, 'band': band,
+            }
+        return items
+
+    def _hide_summary(self) -> None:
+        for items in self._summary_items.values():
+            for item in items.values():
+                if self.legend:
+                    self.legend.removeItem(item)
+                item.setVisible(False)
+
+    def _draw_summary(self, mode: str) -> None:
+        """Tutti gli esami in pochi item fissi: il costo non cresce con il numero di esami."""
+        self._hide_summary()
+        count = len(self._overlay_exams)
+        for ear in ('OD', 'OS'):
+            matrix = self._overlay_matrix(self._overlay_exams, ear)
+            finite = np.isfinite(matrix)
+            if not finite.any():
+                continue
+            items = self._summary_for(ear)
+            if mode == 'density':
+                rows, cols = np.nonzero(finite)
+                # connect[i] unisce il punto i al successivo solo se sono dello stesso esame
+                connect = np.append(rows[1:] == rows[:-1], False)
+                items['density'].setData(cols.astype(float), matrix[rows, cols], connect=connect)
+                shown = [items['density']]
+                label = f"{ear}: {count} esami"
+            else:
+                cols = np.nonzero(finite.any(axis=0))[0]
+                q1, med, q3 = np.nanpercentile(matrix[:, cols], [25, 50, 75], axis=0)
+                x = cols.astype(float)
+                items['low'].setData(x, q1)
+                items['high'].setData(x, q3)
+                items['median'].setData(x, med)
+                shown = [items['band'], items['low'], items['high'], items['median']]
+                label = f"{ear}: mediana e IQR ({count} esami)"
+            for item in shown:
+                item.setVisible(True)
+            if self.legend:
+                self.legend.addItem(shown[-1], label)
+
+    def render_image(self, hide_crosshair: bool = False, width: int | None = None) -> QImage:
+        """Immagine del grafico in memoria (ImageExporter senza file)."""
         to_restore = []
         if hide_crosshair:
             for line in (self.hline, self.vline):
@@ -199,23 +340,20 @@ class AudiogramView(QWidget):
             if width is None:
                 width = int(max(1, self.plot.width()))
             exporter.parameters()['width'] = width
-            exporter.export(out_path)
+            return exporter.export(toBytes=True)
         finally:
             for line, visible in to_restore:
                 line.setVisible(visible)
 
-    def export_png_bytes(self, hide_crosshair: bool = False) -> bytes:
-        tmp_path = None
+    def save_png(self, out_path: str, hide_crosshair: bool = False, width: int | None = None) -> None:
+        if not self.render_image(hide_crosshair, width).save(out_path, 'PNG'):
+            raise OSError(f"Impossibile salvare il PNG: {out_path}")
+
+    def export_png_bytes(self, hide_crosshair: bool = False, width: int | None = None) -> bytes:
+        buffer = QBuffer()
+        buffer.open(QIODevice.WriteOnly)
         try:
-            tmp = tempfile.NamedTemporaryFile(suffix='.png', delete=False)
-            tmp_path = tmp.name
-            tmp.close()
-            self.save_png(tmp_path, hide_crosshair=hide_crosshair)
-            with open(tmp_path, 'rb') as handle:
-                return handle.read()
+            self.render_image(hide_crosshair, width).save(buffer, 'PNG')
+            return bytes(buffer.data())
         finally:
-            if tmp_path:
-                try:
-                    os.remove(tmp_path)
-                except OSError:
-                    pass
+            buffer.close()
@@ -1,5 +1,5 @@
 from __future__ import annotations
-from typing import Optional, List, Dict
+from typing import Callable, Optional, List, Dict
 from PySide6.QtWidgets import (
     QDialog,
     QVBoxLayout,
@@ -12,7 +12,7 @@ from PySide6.QtWidgets import (
     QListWidgetItem,
     QLabel,
 )
-from PySide6.QtCore import Qt
+from PySide6.QtCore import Qt, QTimer
 
 
 class NewPatientDialog(QDialog):
@@ -65,20 +65,36 @@ class NewPatientDialog(QDialog):
 class OpenPatientDialog(QDialog):
     """Dialog per selezionare un assistito locale esistente."""
 
-    def __init__(self, patients: List[Dict[str, object]], parent=None) -> None:
+    def __init__(
+        self,
+        patients: Optional[List[Dict[str, object]]],
+        parent=None,
+        search: Optional[Callable[[str], List[Dict[str, object]]]] = None,
+        loading: Optional[Callable[[], bool]] = None,
+    ) -> None:
+        """`patients` None: indice ancora in costruzione, l'elenco arriva quando `loading()` e' False."""
         super().__init__(parent)
         self.setWindowTitle("Apri assistito")
         self._selected: Optional[Dict[str, object]] = None
+        self._search = search
+        self._loading = loading
+        self._query: Optional[QLineEdit] = None
+        self._wait_timer: Optional[QTimer] = None
 
         layout = QVBoxLayout(self)
-        if not patients:
+        waiting = patients is None and search is not None and loading is not None
+        if not patients and not waiting:
             layout.addWidget(QLabel("Nessun assistito salvato."))
+        elif search is not None:
+            self._query = QLineEdit()
+            self._query.setPlaceholderText("Cerca cognome, nome, ID o data di nascita")
+            self._query.textChanged.connect(self._on_query_changed)
+            layout.addWidget(self._query)
         self._list = QListWidget()
-        for patient in patients:
-            label = f"{patient.get('cognome', '')} {patient.get('nome', '')} ({patient.get('id', '')})"
-            item = QListWidgetItem(label.strip())
-            item.setData(Qt.UserRole, patient)
-            self._list.addItem(item)
+        if waiting:
+            self._show_loading()
+        else:
+            self._fill(patients or [])
         self._list.itemDoubleClicked.connect(lambda _: self._on_accept())
         layout.addWidget(self._list)
 
@@ -90,6 +106,38 @@ class OpenPatientDialog(QDialog):
 
         self._list.currentItemChanged.connect(self._on_selection_changed)
 
+    def _fill(self, patients: List[Dict[str, object]]) -> None:
+        self._list.clear()
+        for patient in patients:
+            label = f"{patient.get('cognome', '')} {patient.get('nome', '')} ({patient.get('id', '')})"
+            item = QListWidgetItem(label.strip())
+            item.setData(Qt.UserRole, patient)
+            self._list.addItem(item)
+
+    def _show_loading(self) -> None:
+        self._list.clear()
+        item = QListWidgetItem("Caricamento indice...")
+        item.setFlags(Qt.NoItemFlags)
+        self._list.addItem(item)
+        if self._wait_timer is None:
+            self._wait_timer = QTimer(self)
+            self._wait_timer.setInterval(150)
+            self._wait_timer.timeout.connect(self._check_loading)
+            self._wait_timer.start()
+
+    def _check_loading(self) -> None:
+        if self._loading():
+            return
+        self._wait_timer.stop()
+        self._on_query_changed(self._query.text())
+
+    def _on_query_changed(self, text: str) -> None:
+        if self._wait_timer is not None and self._wait_timer.isActive():
+            return  # la ricerca parte appena l'indice e' pronto, con il testo attuale
+        self._fill(self._search(text))
+        if self._list.count():
+            self._list.setCurrentRow(0)
+
     def _on_selection_changed(self, current: QListWidgetItem, _: QListWidgetItem) -> None:
         self._buttons.button(QDialogButtonBox.Ok).setEnabled(current is not None)
 
@@ -0,0 +1,115 @@
+"""
+Caricamento degli esami fuori dal thread GUI.
+
+- le letture passano per la cache LRU condivisa di audiometry.exam_loader;
+- ogni `request` apre una nuova generazione: le letture ancora in coda delle
+  generazioni precedenti vengono tolte dal pool, quelle gia' avviate finiscono
+  ma il risultato viene scartato;
+- `prefetch` carica in cache (senza notifiche) gli esami vicini alla selezione.
+"""
+from __future__ import annotations
+from typing import Iterable, List, Optional
+import threading
+
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Signal
+
+from audiometry.exam_loader import load_exam
+
+# letture su cartelle di rete: pochi thread dedicati, separati dal pool globale (miniature)
+IO_THREADS = 3
+
+_pool: Optional[QThreadPool] = None
+_pool_lock = threading.Lock()
+
+
+def exam_io_pool() -> QThreadPool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = QThreadPool()
+            _pool.setMaxThreadCount(IO_THREADS)
+        return _pool
+
+
+class _LoadSignals(QObject):
+    loaded = Signal(int, str, object)
+    failed = Signal(int, str, str)
+
+
+class _LoadJob(QRunnable):
+    def __init__(self, generation: int, path: str, signals: Optional[_LoadSignals]) -> None:
+        super().__init__()
+        self.setAutoDelete(False)  # il riferimento resta al loader, che puo' toglierlo dalla coda
+        self.generation = generation
+        self.path = path
+        self._signals = signals
+
+    def run(self) -> None:
+        try:
+            exam = load_exam(self.path)
+        except (OSError, ValueError) as exc:
+            if self._signals is not None:
+                self._signals.failed.emit(self.generation, self.path, str(exc))
+            return
+        if self._signals is not None:
+            self._signals.loaded.emit(self.generation, self.path, exam)
+
+
+class ExamLoader(QObject):
+    """Letture asincrone per un consumatore (pannello storico, dialog risultati)."""
+
+    examLoaded = Signal(str, object)
+    examFailed = Signal(str, str)
+
+    def __init__(self, pool: Optional[QThreadPool] = None, parent=None) -> None:
+        super().__init__(parent)
+        self._pool = pool or exam_io_pool()
+        self._generation = 0
+        self._queued: List[_LoadJob] = []
+        self._signals = _LoadSignals()
+        self._signals.loaded.connect(self._on_loaded)  # coda verso il thread GUI
+        self._signals.failed.connect(self._on_failed)
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def cancel(self) -> None:
+        """Scarta le richieste in corso e toglie dal pool quelle non ancora avviate."""
+        self._generation += 1
+        for job in self._queued:
+            self._pool.tryTake(job)
+        self._queued.clear()
+
+    def request(self, paths: Iterable[str], prefetch: Iterable[str] = ()) -> int:
+        """Carica `paths` (notificati con examLoaded/examFailed) e poi, in cache, `prefetch`."""
+        self.cancel()
+        wanted = [p for p in paths if p]
+        for path in wanted:
+            self._submit(_LoadJob(self._generation, path, self._signals))
+        for path in prefetch:
+            if path and path not in wanted:
+                self._submit(_LoadJob(self._generation, path, None))
+        return self._generation
+
+    def wait(self, msecs: int = -1) -> bool:
+        return self._pool.waitForDone(msecs)
+
+    def _submit(self, job: _LoadJob) -> None:
+        self._queued.append(job)
+        self._pool.start(job)
+
+    def _forget(self, path: str) -> None:
+        self._queued = [job for job in self._queued if job.path != path]
+
+    def _on_loaded(self, generation: int, path: str, exam: object) -> None:
+        if generation != self._generation:
+            return
+        self._forget(path)
+        self.examLoaded.emit(path, exam)
+
+    def _on_failed(self, generation: int, path: str, error: str) -> None:
+        if generation != self._generation:
+            return
+        self._forget(path)
+        self.examFailed.emit(path, error)
@@ -4,7 +4,6 @@ import os
 import json
 import re
 import shutil
-import tempfile
 import sys
 from datetime import datetime
 
@@ -29,6 +28,8 @@ from ui.audiogram_view import AudiogramView, FREQS
 from ui.sidebar_controls import SidebarControls
 from ui.dialogs import NewPatientDialog, OpenPatientDialog
 from ui.status_panel import HistoryPanel
+from ui.thumbnails import ThumbnailCache, ThumbnailLoader, thumbnail_cache_dir
+from ui.exam_loading import ExamLoader
 from ui.log_panel import LogPanel
 from audio.engine import AudioEngine
 from audio.devices import list_output_devices
@@ -40,7 +41,10 @@ from calibration_loader.profiles import (
 from patient.repo import PatientRepo
 from audiometry.session import AudiometrySession
 from audiometry.storage import save_exam
+from audiometry.journal import SessionJournal, PendingSession, journal_dir, find_pending
+from audiometry.exam_loader import load_exam
 from results.browser import list_patient_exams
+from results.longitudinal import ShiftTracker
 from export.png import export_graph_png
 from export.pdf import build_pdf_report_v3, _REPORTLAB_AVAILABLE
 from app_settings import load_settings, save_settings
@@ -70,6 +74,9 @@ class MainWindow(QMainWindow):
         self._cli_patient_lock = bool(cli_patient)
 
         self.patient_repo = PatientRepo(self._appdata)
+        self.patient_repo.warm()
+        self._journal_dir = journal_dir(os.path.join(self._appdata, "Farmaudiometria"))
+        self._shift_tracker = ShiftTracker(os.path.join(self._appdata, "Farmaudiometria", "longitudinal.json"))
         self.audio_engine = AudioEngine()
         self.session = AudiometrySession()
 
@@ -163,6 +170,9 @@ class MainWindow(QMainWindow):
 
         # History panel
         self.history_panel = HistoryPanel(self)
+        self.history_panel.set_thumbnail_loader(
+            ThumbnailLoader(ThumbnailCache(thumbnail_cache_dir(self._appdata)), parent=self)
+        )
         self.history_panel.hide()
         main_layout.addWidget(self.history_panel, 0)
 
@@ -185,6 +195,10 @@ class MainWindow(QMainWindow):
         self.sidebar.maskingToggled.connect(self._on_masking_toggled)
         self.sidebar.notesChanged.connect(self._on_notes_changed)
 
+        self._exam_loader = ExamLoader(parent=self)
+        self._history_pending_meta: Optional[Dict[str, Any]] = None
+        self._exam_loader.examLoaded.connect(self._on_history_exam_loaded)
+        self._exam_loader.examFailed.connect(self._on_history_exam_failed)
         self.history_panel.selectionChanged.connect(self._on_history_selection_changed)
         self.history_panel.exportPngRequested.connect(self._on_history_export_png)
         self.history_panel.exportPdfRequested.connect(self._on_history_export_pdf)
@@ -208,14 +222,57 @@ class MainWindow(QMainWindow):
     # ----- Initial workflow -----
 
     def _initial_setup(self) -> None:
-        if self._cli_patient:
+        pending = self._prompt_resume_choice()
+        if pending is not None:
+            self._activate_patient(pending.meta.get('patient') or {}, persist=False)
+            self.set_status("Ripresa esame non salvato.")
+        elif self._cli_patient:
             self._activate_patient(self._cli_patient, persist=True)
             self.set_status("Assistito caricato da riga di comando.")
         else:
             self._prompt_patient_choice()
         self._prompt_device_choice()
+        if pending is not None:
+            self._resume_pending_session(pending)
         self._update_placeholder_message()
 
+    def _prompt_resume_choice(self) -> Optional[PendingSession]:
+        pending = next(
+            (p for p in find_pending(self._journal_dir) if isinstance(p.meta.get('patient'), dict)),
+            None,
+        )
+        if pending is None:
+            return None
+        patient = pending.meta['patient']
+        cli_id = str(self._cli_patient.get('id')) if self._cli_patient else None
+        if cli_id is not None and cli_id != str(patient.get('id')):
+            return None
+        started = datetime.fromtimestamp(pending.started_us / 1_000_000).strftime('%d/%m/%Y %H:%M')
+        reply = QMessageBox.question(
+            self,
+            "Esame non salvato",
+            f"Trovato un esame non salvato del {started} per {patient.get('cognome', '')} {patient.get('nome', '')}"
+            f" ({len(pending.points)} punti). Vuoi riprenderlo?",
+            QMessageBox.Yes | QMessageBox.No,
+            QMessageBox.Yes,
+        )
+        if reply != QMessageBox.Yes:
+            pending.remove()
+            return None
+        return pending
+
+    def _resume_pending_session(self, pending: PendingSession) -> None:
+        self.start_manual_exam()
+        for ear, freq, level in pending.points:
+            try:
+                self.session.add_point(ear, freq, level)
+            except ValueError:
+                continue
+        self._refresh_graph()
+        if self.session.journal is not None:
+            pending.remove()
+            self.set_status(f"Esame ripreso: {len(pending.points)} punti recuperati.")
+
     def _prompt_patient_choice(self) -> None:
         if self.current_patient:
             return
@@ -336,6 +393,23 @@ class MainWindow(QMainWindow):
     def _has_recorded_points(self) -> bool:
         return bool(self.session.points_od or self.session.points_os)
 
+    def _new_session(self, journaled: bool = False) -> None:
+        """Sostituisce la sessione corrente; con `journaled` i punti vanno anche nel write-ahead log."""
+        previous = getattr(self, 'session', None)
+        if previous is not None and previous.journal is not None:
+            previous.journal.discard()
+        self.session = AudiometrySession()
+        self.session.notes = ''
+        if journaled:
+            meta = {
+                'patient': self.current_patient,
+                'device_id': (self.current_device or {}).get('wasapi_id'),
+            }
+            try:
+                self.session.journal = SessionJournal.create(self._journal_dir, meta)
+            except OSError as exc:
+                self.set_status(f"Log di ripristino non disponibile: {exc}")
+
 
     def _build_header_bar(self) -> QWidget:
         bar = QWidget(self)
@@ -393,8 +467,9 @@ class MainWindow(QMainWindow):
                 return f"{'-':>{col_w}}"
             return f"{int(round(mapping[freq])):>{col_w}}"
 
-        od_source = od_map or self.session.points_od
-        os_source = os_map or self.session.points_os
+        # un orecchio vuoto resta vuoto: solo None indica la sessione corrente
+        od_source = self.session.points_od if od_map is None else od_map
+        os_source = self.session.points_os if os_map is None else os_map
         od_cells = [_fmt(od_source, freq) for freq in freq_list]
         os_cells = [_fmt(os_source, freq) for freq in freq_list]
 
@@ -443,7 +518,7 @@ class MainWindow(QMainWindow):
             'generated_at': datetime.now().isoformat(),
             'patient': self.current_patient,
             'device': self.current_device,
-            'headphone_id': self.controller.get_headphone_id(),
+            'headphone_id': (self.current_device or {}).get('wasapi_id'),
             'notes': (history_exam.get('data', {}).get('notes', '') if history_exam else self.session.notes),
             'current_exam': exam,
             'results_rows': rows,
@@ -551,8 +626,7 @@ class MainWindow(QMainWindow):
                 return
         if self.current_device and current_id != new_device_id:
             self.audio_engine.stop()
-            self.session = AudiometrySession()
-            self.session.notes = ''
+            self._new_session()
             self._current_level = 30.0
             self._current_freq_index = self._freqs.index(1000) if 1000 in self._freqs else 0
             self._masking_enabled = False
@@ -623,9 +697,27 @@ class MainWindow(QMainWindow):
             return
         exam = self.session.to_dict(self.current_patient, self.current_device, self.current_profile)
         path = save_exam(self._appdata, str(self.current_patient['id']), exam)
+        if self.session.journal is not None:
+            self.session.journal.complete()
+            self.session.journal = None
         self.last_exam_path = path
         self._refresh_exam_history()
         self.set_status(f"Audiometria salvata: {os.path.basename(path)}")
+        self._check_threshold_shift(path)
+
+    def _check_threshold_shift(self, path: str) -> None:
+        try:
+            events = self._shift_tracker.update(load_exam(path))
+        except Exception as exc:
+            self.set_status(f"Confronto con esami precedenti non riuscito: {exc}")
+            return
+        if events:
+            QMessageBox.information(
+                self,
+                'Variazione soglie',
+                "Rispetto all'esame di riferimento:\n" + "\n".join(ev.describe() for ev in events)
+                + "\n\nSi consiglia un controllo.",
+            )
 
     def create_new_patient(self) -> None:
         dialog = NewPatientDialog(self)
@@ -641,8 +733,13 @@ class MainWindow(QMainWindow):
         )
 
     def open_patient_from_repo(self) -> None:
-        patients = self.patient_repo.list_all()
-        dialog = OpenPatientDialog(patients, self)
+        repo = self.patient_repo
+        patients = None if repo.index_loading else repo.search("", limit=500)
+        dialog = OpenPatientDialog(
+            patients, self,
+            search=lambda q: repo.search(q, limit=500),
+            loading=lambda: repo.index_loading,
+        )
         if dialog.exec() != QDialog.Accepted:
             return
         selected = dialog.get_selected()
@@ -668,8 +765,7 @@ class MainWindow(QMainWindow):
         self._clear_history_preview()
         self._set_mode_label('Modalit\u00e0: Esegui audiometria')
         self.audio_engine.stop()
-        self.session = AudiometrySession()
-        self.session.notes = ''
+        self._new_session(journaled=True)
         self._current_level = 30.0
         self._current_freq_index = self._freqs.index(1000) if 1000 in self._freqs else 0
         self._masking_enabled = False
@@ -685,6 +781,8 @@ class MainWindow(QMainWindow):
 
     def _on_history_selection_changed(self, exams: List[Dict[str, Any]]) -> None:
         if not exams:
+            self._exam_loader.cancel()
+            self._history_pending_meta = None
             self._history_selected_exam = None
             self.history_panel.set_details('')
             self.graph.set_overlays([])
@@ -694,23 +792,33 @@ class MainWindow(QMainWindow):
         exam_meta = exams[0]
         path = exam_meta.get('path')
         if not path:
+            self._exam_loader.cancel()
             self.history_panel.set_details('')
             return
-        try:
-            with open(path, 'r', encoding='utf-8') as handle:
-                data = json.load(handle)
-        except Exception as exc:
-            QMessageBox.warning(self, 'Risultati', f"Impossibile leggere l'esame: {exc}")
+        # lettura nel pool: la finestra resta reattiva anche con archivi su cartella di rete
+        self._history_pending_meta = exam_meta
+        prefetch = [meta.get('path') for meta in self.history_panel.adjacent_exams()]
+        self._exam_loader.request([path], prefetch=prefetch)
+        self._set_status_quick('Caricamento esame...')
+
+    def _on_history_exam_failed(self, path: str, error: str) -> None:
+        self._history_pending_meta = None
+        self.statusBar().clearMessage()
+        QMessageBox.warning(self, 'Risultati', f"Impossibile leggere l'esame: {error}")
+
+    def _on_history_exam_loaded(self, path: str, exam: Any) -> None:
+        exam_meta = self._history_pending_meta
+        if exam_meta is None or exam_meta.get('path') != path:
             return
+        self._history_pending_meta = None
+        self.statusBar().clearMessage()
 
-        try:
-            freqs = [int(f) for f in data.get('frequencies_hz', self._freqs)]
-        except Exception:
-            freqs = self._freqs
-        od_map = {int(k): float(v) for k, v in (data.get('OD') or {}).items() if str(k).isdigit()}
-        os_map = {int(k): float(v) for k, v in (data.get('OS') or {}).items() if str(k).isdigit()}
+        data = exam.raw
+        freqs = list(exam.frequencies) if data.get('frequencies_hz') else self._freqs
+        od_map = dict(exam.right)
+        os_map = dict(exam.left)
 
-        self.history_panel.set_details(data.get('notes', ''))
+        self.history_panel.set_details(exam.notes)
         self._history_selected_exam = {
             'meta': exam_meta,
             'data': data,
@@ -804,46 +912,40 @@ class MainWindow(QMainWindow):
             patient_info = self.current_patient
             device_info = self.current_device
             notes = self.session.notes
-            od_map = None
-            os_map = None
+            od_map = dict(self.session.points_od)
+            os_map = dict(self.session.points_os)
             freqs = exam_dict.get('frequencies_hz', self._freqs)
         else:
             exam_dict = history_exam.get('data', {})
             patient_info = exam_dict.get('patient') or self.current_patient or {}
             device_info = exam_dict.get('device') or self.current_device or {}
             notes = exam_dict.get('notes', '')
-            od_map = history_exam.get('od')
-            os_map = history_exam.get('os')
+            od_map = history_exam.get('od') or {}
+            os_map = history_exam.get('os') or {}
             freqs = history_exam.get('freqs', self._freqs)
         suggested = self._suggest_export_path('.pdf')
         out_pdf, _ = QFileDialog.getSaveFileName(self, 'Crea relazione PDF', suggested, 'PDF (*.pdf)')
         if not out_pdf:
             return
         self._last_export_dir = os.path.dirname(out_pdf) or self._last_export_dir
-        with tempfile.NamedTemporaryFile(suffix='.png', delete=False) as tmp:
-            tmp_path = tmp.name
-        try:
-            export_graph_png(self.graph, tmp_path)
-            table_text = self._build_results_table(od_map, os_map, freqs)
-            build_pdf_report_v3(
-                out_pdf,
-                patient_info,
-                device_info,
-                exam_dict,
-                notes,
-                '',
-                tmp_path,
-                table_text,
-                '',
-            )
-            base_no_ext, _ = os.path.splitext(out_pdf)
-            self._write_exam_snapshot(base_no_ext)
-            self.set_status(f'Relazione PDF creata in: {out_pdf}')
-        finally:
-            try:
-                os.remove(tmp_path)
-            except OSError:
-                pass
+        table_text = self._build_results_table(od_map, os_map, freqs)
+        build_pdf_report_v3(
+            out_pdf,
+            patient_info,
+            device_info,
+            exam_dict,
+            notes,
+            '',
+            None,
+            table_text,
+            '',
+            od_map=od_map,
+            os_map=os_map,
+            freqs=freqs,
+        )
+        base_no_ext, _ = os.path.splitext(out_pdf)
+        self._write_exam_snapshot(base_no_ext)
+        self.set_status(f'Relazione PDF creata in: {out_pdf}')
 
 
     def _activate_patient(self, patient: Dict[str, Any], persist: bool = True) -> None:
@@ -851,8 +953,7 @@ class MainWindow(QMainWindow):
         if persist:
             self.patient_repo.save(patient)
         self.audio_engine.stop()
-        self.session = AudiometrySession()
-        self.session.notes = ''
+        self._new_session()
         self._current_level = 30.0
         self._current_freq_index = self._freqs.index(1000) if 1000 in self._freqs else 0
         self._masking_enabled = False
@@ -1,6 +1,5 @@
 from __future__ import annotations
-from typing import Dict, Any, List, Optional
-import json
+from typing import Dict, Any, List, Optional, Set
 
 from PySide6.QtWidgets import (
     QDialog,
@@ -9,11 +8,13 @@ from PySide6.QtWidgets import (
     QListWidgetItem,
     QLabel,
     QHBoxLayout,
+    QComboBox,
 )
-from PySide6.QtCore import Qt
+from PySide6.QtCore import Qt, QTimer
 
 from ui.audiogram_view import AudiogramView
 from results.browser import list_patient_exams
+from ui.exam_loading import ExamLoader
 
 
 class ResultsDialog(QDialog):
@@ -39,6 +40,15 @@ class ResultsDialog(QDialog):
         )
         layout.addWidget(header)
 
+        mode_row = QHBoxLayout()
+        mode_row.addWidget(QLabel("Overlay:"))
+        self.cmb_mode = QComboBox()
+        for text, mode in (("Automatico", 'auto'), ("Linee per esame", 'lines'), ("Densita'", 'density'), ("Mediana e IQR", 'band')):
+            self.cmb_mode.addItem(text, mode)
+        mode_row.addWidget(self.cmb_mode)
+        mode_row.addStretch(1)
+        layout.addLayout(mode_row)
+
         body = QHBoxLayout()
         self.list_widget = QListWidget()
         self.list_widget.setSelectionMode(QListWidget.ExtendedSelection)
@@ -60,34 +70,80 @@ class ResultsDialog(QDialog):
             item.setData(Qt.UserRole, exam)
             self.list_widget.addItem(item)
 
+        self._selected_paths: List[str] = []
+        self._loaded: Dict[str, Any] = {}
+        self._failed: Set[str] = set()
+        self._loader = ExamLoader(parent=self)
+        self._loader.examLoaded.connect(self._on_exam_loaded)
+        self._loader.examFailed.connect(self._on_exam_failed)
+        # gli arrivi ravvicinati dal pool diventano un solo ridisegno degli overlay
+        self._overlay_timer = QTimer(self)
+        self._overlay_timer.setSingleShot(True)
+        self._overlay_timer.setInterval(30)
+        self._overlay_timer.timeout.connect(self._update_overlays)
         self.list_widget.itemSelectionChanged.connect(self._on_selection_changed)
+        self.cmb_mode.currentIndexChanged.connect(lambda _idx: self.graph.set_overlay_mode(self.cmb_mode.currentData()))
 
     def _on_selection_changed(self) -> None:
         selected_items = self.list_widget.selectedItems()
         if not selected_items:
+            self._loader.cancel()
+            self._loaded.clear()
+            self._selected_paths = []
             self.graph.clear_overlays()
             self.lbl_details.setText("Seleziona uno o piu esami per visualizzare l'overlay.")
             return
-        overlays: List[Dict[str, Any]] = []
-        details_lines: List[str] = []
+        self._selected_paths = []
         for item in selected_items:
             meta = item.data(Qt.UserRole)
-            if not isinstance(meta, dict):
-                continue
-            path = meta.get('path')
-            try:
-                with open(path, 'r', encoding='utf-8') as handle:
-                    data = json.load(handle)
-            except (OSError, json.JSONDecodeError):
+            if isinstance(meta, dict) and meta.get('path'):
+                self._selected_paths.append(meta['path'])
+        # gli esami gia' letti restano; gli altri arrivano dal pool e l'overlay si aggiorna a ogni arrivo
+        self._loaded = {path: exam for path, exam in self._loaded.items() if path in self._selected_paths}
+        self._failed = set()
+        rows = sorted(self.list_widget.row(item) for item in selected_items)
+        prefetch = []
+        for row in (rows[-1] + 1, rows[0] - 1):
+            if 0 <= row < self.list_widget.count():
+                meta = self.list_widget.item(row).data(Qt.UserRole)
+                if isinstance(meta, dict):
+                    prefetch.append(meta.get('path'))
+        self._loader.request([p for p in self._selected_paths if p not in self._loaded], prefetch=prefetch)
+        self._update_overlays()
+
+    def _schedule_overlays(self) -> None:
+        if not self._overlay_timer.isActive():
+            self._overlay_timer.start()  # non riavviato: al piu' un aggiornamento ogni 30 ms
+
+    def _on_exam_failed(self, path: str, _error: str) -> None:
+        self._failed.add(path)
+        self._schedule_overlays()
+
+    def _on_exam_loaded(self, path: str, exam: Any) -> None:
+        if path in self._selected_paths:
+            self._loaded[path] = exam
+            self._schedule_overlays()
+
+    def _update_overlays(self) -> None:
+        self._overlay_timer.stop()
+        overlays: List[Dict[str, Any]] = []
+        details_lines: List[str] = []
+        for path in self._selected_paths:
+            exam = self._loaded.get(path)
+            if exam is None:
                 continue
-            label = data.get('created_at', 'Esame')
+            label = exam.raw.get('created_at', 'Esame')
             overlays.append({
+                'id': path,
                 'label': label,
-                'OD': data.get('OD', {}),
-                'OS': data.get('OS', {}),
+                'OD': exam.right,
+                'OS': exam.left,
             })
-            note = data.get('notes', '')
+            note = exam.notes
             if note:
                 details_lines.append(f"{label} - Note: {note}")
         self.graph.set_overlays(overlays)
+        pending = len([p for p in self._selected_paths if p not in self._loaded and p not in self._failed])
+        if pending:
+            details_lines.append(f"Caricamento di {pending} esami...")
         self.lbl_details.setText('\n'.join(details_lines) or "Nessuna nota disponibile.")
@@ -1,8 +1,11 @@
 from __future__ import annotations
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from datetime import datetime
 from PySide6.QtWidgets import QWidget, QVBoxLayout, QLabel, QListWidget, QListWidgetItem, QTextEdit, QPushButton, QHBoxLayout
-from PySide6.QtCore import Qt, Signal
+from PySide6.QtCore import Qt, Signal, QSize, QTimer
+from PySide6.QtGui import QIcon, QPixmap
+
+from ui.thumbnails import THUMBNAIL_SIZE, ThumbnailLoader
 
 
 class HistoryPanel(QWidget):
@@ -25,6 +28,13 @@ class HistoryPanel(QWidget):
         layout.addWidget(self.list_widget, 1)
         self.list_widget.itemDoubleClicked.connect(lambda _: self.examActivated.emit())
         self.list_widget.itemSelectionChanged.connect(self._on_selection_changed)
+        self.list_widget.verticalScrollBar().valueChanged.connect(lambda _: self._schedule_thumbnails())
+        self._thumbnails: Optional[ThumbnailLoader] = None
+        self._items_by_path: Dict[str, QListWidgetItem] = {}
+        self._thumb_timer = QTimer(self)
+        self._thumb_timer.setSingleShot(True)
+        self._thumb_timer.setInterval(30)
+        self._thumb_timer.timeout.connect(self._request_visible_thumbnails)
 
         self.notes_label = QLabel("Note selezionate")
         layout.addWidget(self.notes_label)
@@ -45,8 +55,16 @@ class HistoryPanel(QWidget):
         self.btn_export_pdf.clicked.connect(self.exportPdfRequested.emit)
         self.set_export_enabled(False)
 
+    def set_thumbnail_loader(self, loader: ThumbnailLoader) -> None:
+        """Mostra le miniature degli audiogrammi, caricate solo per le righe visibili."""
+        self._thumbnails = loader
+        loader.thumbnailReady.connect(self._on_thumbnail_ready)
+        self.list_widget.setIconSize(QSize(*THUMBNAIL_SIZE))
+        self._schedule_thumbnails()
+
     def set_exams(self, exams: List[Dict[str, Any]]) -> None:
         self.list_widget.clear()
+        self._items_by_path.clear()
         for exam in exams:
             created_raw = exam.get('created_at')
             label = 'Data sconosciuta'
@@ -58,6 +76,14 @@ class HistoryPanel(QWidget):
             item = QListWidgetItem(label)
             item.setData(Qt.UserRole, exam)
             self.list_widget.addItem(item)
+            path = exam.get('path')
+            if path:
+                self._items_by_path[path] = item
+                if self._thumbnails is not None:
+                    pixmap = self._thumbnails.pixmap(path)
+                    if pixmap is not None:
+                        item.setIcon(QIcon(pixmap))
+        self._schedule_thumbnails()
         self.set_details('')
         self.set_export_enabled(False)
         self.selectionChanged.emit([])
@@ -85,9 +111,56 @@ class HistoryPanel(QWidget):
                 selected.append(data)
         return selected
 
+    def adjacent_exams(self) -> List[Dict[str, Any]]:
+        """Esami nelle righe prima e dopo la selezione (per il prefetch)."""
+        rows = sorted(self.list_widget.row(item) for item in self.list_widget.selectedItems())
+        if not rows:
+            return []
+        result: List[Dict[str, Any]] = []
+        for row in (rows[-1] + 1, rows[0] - 1):
+            if 0 <= row < self.list_widget.count():
+                data = self.list_widget.item(row).data(Qt.UserRole)
+                if isinstance(data, dict):
+                    result.append(data)
+        return result
+
     def _on_selection_changed(self) -> None:
         selected = self.selected_exams()
         self.selectionChanged.emit(selected)
         self.set_export_enabled(bool(selected))
         if not selected:
             self.set_details('')
+
+    def resizeEvent(self, event) -> None:
+        super().resizeEvent(event)
+        self._schedule_thumbnails()
+
+    def showEvent(self, event) -> None:
+        super().showEvent(event)
+        self._schedule_thumbnails()
+
+    def _schedule_thumbnails(self) -> None:
+        if self._thumbnails is not None and self._items_by_path:
+            self._thumb_timer.start()  # raggruppa gli scroll ravvicinati
+
+    def _request_visible_thumbnails(self) -> None:
+        if self._thumbnails is None or not self.list_widget.isVisible():
+            return
+        viewport = self.list_widget.viewport().rect()
+        first = self.list_widget.indexAt(viewport.topLeft()).row()
+        last = self.list_widget.indexAt(viewport.bottomLeft()).row()
+        count = self.list_widget.count()
+        if first < 0:
+            first = 0
+        if last < 0:
+            last = count - 1
+        for row in range(first, min(last + 2, count)):  # piu' la riga successiva, parzialmente visibile
+            data = self.list_widget.item(row).data(Qt.UserRole)
+            path = data.get('path') if isinstance(data, dict) else None
+            if path and self._thumbnails.pixmap(path) is None:
+                self._thumbnails.request(path)
+
+    def _on_thumbnail_ready(self, exam_path: str, pixmap: QPixmap) -> None:
+        item = self._items_by_path.get(exam_path)
+        if item is not None:
+            item.setIcon(QIcon(pixmap))
@@ -0,0 +1,195 @@
+"""
+Miniature degli audiogrammi per lo storico.
+
+- disegnate con QPainter su QImage (sicuro fuori dal thread GUI) da un pool di thread;
+- salvate in `<cache>/<sha1>.png`, con chiave path + mtime + dimensione dell'esame,
+  dimensioni della miniatura e versione: un esame modificato viene ridisegnato;
+- richieste solo per le righe visibili; il risultato arriva con `thumbnailReady`;
+- in memoria pixmap e disegni falliti hanno chiave path + mtime: un esame
+  riscritto viene ridisegnato, uno illeggibile non viene riprovato finche' non cambia.
+"""
+from __future__ import annotations
+from collections import OrderedDict
+from typing import Dict, Optional, Set, Tuple
+import hashlib
+import logging
+import os
+
+from PySide6.QtCore import QObject, QPointF, QRectF, QRunnable, QThreadPool, Qt, Signal
+from PySide6.QtGui import QColor, QImage, QPainter, QPen, QPixmap
+
+from audiometry.audiogram import FREQS
+from audiometry.exam_loader import LOADER_VERSION, load_exam
+
+# incrementare quando cambia il disegno delle miniature
+THUMBNAIL_VERSION = 1
+THUMBNAIL_SIZE = (96, 72)
+_DB_MIN, _DB_MAX = -10, 120
+_BANDS = [
+    (-10, 20, '#e8f5e9'),
+    (20, 40, '#fffde7'),
+    (40, 70, '#ffe0b2'),
+    (70, 90, '#ffcdd2'),
+    (90, 120, '#ef9a9a'),
+]
+_EAR_COLORS = {'OD': '#d43f3a', 'OS': '#1f77b4'}
+
+_log = logging.getLogger(__name__)
+
+
+def thumbnail_cache_dir(base_appdata: str) -> str:
+    return os.path.join(base_appdata, 'Farmaudiometria', 'cache', 'thumbnails')
+
+
+def render_thumbnail(od: Dict[int, float], os_map: Dict[int, float], size=THUMBNAIL_SIZE) -> QImage:
+    """Audiogramma ridotto: bande, OD/OS, nessuna etichetta."""
+    width, height = size
+    image = QImage(width, height, QImage.Format_RGB32)
+    image.fill(QColor('#ffffff'))
+    step = width / len(FREQS)
+
+    def y_of(db: float) -> float:
+        db = min(max(db, _DB_MIN), _DB_MAX)
+        return height * (db - _DB_MIN) / (_DB_MAX - _DB_MIN)
+
+    painter = QPainter(image)
+    try:
+        painter.setRenderHint(QPainter.Antialiasing)
+        for low, high, color in _BANDS:
+            painter.fillRect(QRectF(0, y_of(low), width, y_of(high) - y_of(low)), QColor(color))
+        painter.setPen(QPen(QColor('#b0bec5'), 1))
+        painter.drawRect(0, 0, width - 1, height - 1)
+        for ear, mapping in (('OD', od), ('OS', os_map)):
+            points = [QPointF((idx + 0.5) * step, y_of(mapping[freq]))
+                      for idx, freq in enumerate(FREQS) if freq in mapping]
+            if not points:
+                continue
+            painter.setPen(QPen(QColor(_EAR_COLORS[ear]), 1.5, Qt.SolidLine if ear == 'OD' else Qt.DashLine))
+            if len(points) > 1:
+                painter.drawPolyline(points)
+            for point in points:
+                painter.drawEllipse(point, 1.5, 1.5)
+    finally:
+        painter.end()
+    return image
+
+
+class ThumbnailCache:
+    """Cache su disco delle miniature; usabile da qualunque thread."""
+
+    def __init__(self, cache_dir: str, size=THUMBNAIL_SIZE) -> None:
+        self.cache_dir = cache_dir
+        self.size = tuple(size)
+
+    def cache_path(self, exam_path: str) -> Optional[str]:
+        try:
+            st = os.stat(exam_path)
+        except OSError:
+            return None
+        key = f"{os.path.abspath(exam_path)}|{st.st_mtime_ns}|{st.st_size}|{self.size}|{THUMBNAIL_VERSION}|{LOADER_VERSION}"
+        return os.path.join(self.cache_dir, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.png')
+
+    def get(self, exam_path: str) -> Optional[QImage]:
+        """Miniatura dalla cache, disegnata e salvata se manca; None se l'esame non e' leggibile."""
+        cached = self.cache_path(exam_path)
+        if cached is None:
+            return None
+        image = QImage(cached)
+        if not image.isNull():
+            return image
+        try:
+            exam = load_exam(exam_path)
+        except (OSError, ValueError) as exc:
+            _log.warning('Miniatura non disponibile per %s: %s', exam_path, exc)
+            return None
+        image = render_thumbnail(exam.right, exam.left, self.size)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp = f"{cached}.{os.getpid()}.{id(image)}.tmp"
+            if image.save(tmp, 'PNG'):
+                os.replace(tmp, cached)
+        except OSError as exc:
+            _log.warning('Impossibile salvare la miniatura %s: %s', cached, exc)
+        return image
+
+
+# (path, mtime_ns) dell'esame
+_ThumbKey = Tuple[str, int]
+
+
+def _thumb_key(exam_path: str) -> Optional[_ThumbKey]:
+    try:
+        return exam_path, os.stat(exam_path).st_mtime_ns
+    except OSError:
+        return None
+
+
+class _JobSignals(QObject):
+    done = Signal(object, QImage)
+
+
+class _ThumbnailJob(QRunnable):
+    def __init__(self, cache: ThumbnailCache, key: _ThumbKey, signals: _JobSignals) -> None:
+        super().__init__()
+        self._cache = cache
+        self._key = key
+        self._signals = signals
+
+    def run(self) -> None:
+        image = self._cache.get(self._key[0])
+        self._signals.done.emit(self._key, image if image is not None else QImage())
+
+
+class ThumbnailLoader(QObject):
+    """Distribuisce le richieste al pool e tiene in memoria le ultime pixmap."""
+
+    thumbnailReady = Signal(str, QPixmap)
+
+    def __init__(self, cache: ThumbnailCache, pool: Optional[QThreadPool] = None, max_items: int = 256, parent=None) -> None:
+        super().__init__(parent)
+        self.cache = cache
+        self._pool = pool or QThreadPool.globalInstance()
+        self._max_items = max_items
+        self._pixmaps: "OrderedDict[_ThumbKey, QPixmap]" = OrderedDict()
+        self._failed: "OrderedDict[_ThumbKey, None]" = OrderedDict()  # cache negativa
+        self._pending: Set[_ThumbKey] = set()
+        self._signals = _JobSignals()
+        self._signals.done.connect(self._on_done)  # coda verso il thread GUI
+
+    def pixmap(self, exam_path: str) -> Optional[QPixmap]:
+        key = _thumb_key(exam_path)
+        pixmap = self._pixmaps.get(key) if key is not None else None
+        if pixmap is not None:
+            self._pixmaps.move_to_end(key)
+        return pixmap
+
+    def failed(self, exam_path: str) -> bool:
+        return _thumb_key(exam_path) in self._failed
+
+    def request(self, exam_path: str) -> None:
+        """Avvia il disegno se la miniatura non e' gia' pronta, in corso o fallita per questa versione dell'esame."""
+        key = _thumb_key(exam_path) if exam_path else None
+        if key is None or key in self._pending or key in self._pixmaps or key in self._failed:
+            return
+        self._pending.add(key)
+        self._pool.start(_ThumbnailJob(self.cache, key, self._signals))
+
+    def wait(self, msecs: int = -1) -> bool:
+        return self._pool.waitForDone(msecs)
+
+    def _on_done(self, key: _ThumbKey, image: QImage) -> None:
+        self._pending.discard(key)
+        if image.isNull():
+            self._remember(self._failed, key, None)
+            return
+        pixmap = QPixmap.fromImage(image)
+        self._remember(self._pixmaps, key, pixmap)
+        self.thumbnailReady.emit(key[0], pixmap)
+
+    def _remember(self, store: "OrderedDict", key: _ThumbKey, value) -> None:
+        # le versioni precedenti dello stesso esame non servono piu'
+        for old in [k for k in store if k[0] == key[0] and k != key]:
+            del store[old]
+        store[key] = value
+        while len(store) > self._max_items:
+            store.popitem(last=False)